@@ -1,80 +1,66 @@
-import random
-import uuid
-from datetime import datetime, timedelta, UTC
-from faker import Faker
-from pymongo import MongoClient
+import argparse
+from datetime import datetime, UTC
 from dotenv import load_dotenv
 import os
 import time
 import sys
 
+# Shared batch generator lives in the project root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from telemetry_batch import (
+    STATUS_TYPES,
+    parse_reference_time,
+    generate_vehicle_batch,
+    generate_event_batch,
+    vehicle_batch_to_docs,
+    event_batch_to_docs,
+)
+from ingest_pipeline import plan_batches, iter_seeded_batches, run_pipeline, resolve_seed, batch_rng
+from backends import mongo_client
+from schema import sample_docs
+
 # --- Setup ---
 load_dotenv()
-fake = Faker()
 
 # MongoDB config
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 
-client = MongoClient(MONGO_URI)
+client = mongo_client(MONGO_URI)
 db = client[DB_NAME]
 vehicle_collection = db["vehicle_data"]
 events_collection = db["urban_events"]
 
 # --- Configurable parameters ---
-NUM_VEHICLES = 50
 NUM_VEHICLE_DOCS = 1000
 NUM_EVENT_DOCS = 1000
-VEHICLE_IDS = [f"V-{2025}-{str(i).zfill(3)}" for i in range(NUM_VEHICLES)]
-
-EVENT_TYPES = ["obstacle", "traffic_jam", "roadwork", "accident", "pedestrian_crossing"]
-STATUS_TYPES = ["OK", "WARNING", "ERROR"]
-SEVERITY_LEVELS = ["low", "medium", "high"]
-
-# --- Helper functions ---
-def generate_vehicle_data():
-    vehicle_id = random.choice(VEHICLE_IDS)
-    location = fake.local_latlng(country_code="BR", coords_only=True)
-    random_hour = random.randint(6, 10)
-    timestamp = datetime.now(UTC) - timedelta(days=random.randint(0, 6))
-    timestamp = timestamp.replace(hour=random_hour, minute=random.randint(0, 59), microsecond=0)
-    return {
-        "vehicle_id": vehicle_id,
-        "timestamp": timestamp,
-        "location": {
-            "lat": float(location[0]),
-            "lng": float(location[1])
-        },
-        "speed_kmh": round(random.uniform(0, 120), 2),
-        "battery_level": round(random.uniform(10, 100), 2),
-        "temperature_celsius": round(random.uniform(20, 90), 2),
-        "system_status": random.choices(STATUS_TYPES, weights=[0.5, 0.3, 0.2])[0]
-    }
-
-def generate_urban_event():
-    vehicle_id = random.choice(VEHICLE_IDS)
-    location = fake.local_latlng(country_code="BR", coords_only=True)
-    timestamp = datetime.now(UTC) - timedelta(days=random.randint(0, 6))
-    timestamp = timestamp.replace(microsecond=0)
-    return {
-        "event_id": str(uuid.uuid4()),
-        "vehicle_id": vehicle_id,
-        "timestamp": timestamp.isoformat(),
-        "event_type": random.choice(EVENT_TYPES),
-        "description": fake.sentence(nb_words=6),
-        "location": {
-            "lat": float(location[0]),
-            "lng": float(location[1])
-        },
-        "severity": random.choices(SEVERITY_LEVELS, weights=[0.2, 0.3, 0.5])[0]
-    }
+BATCH_SIZE = 10_000
+STATUS_WEIGHTS = [0.5, 0.3, 0.2]
+
+# Same seed and reference time -> same dataset (see generate_data.py)
+parser = argparse.ArgumentParser(description="Generate and insert fleet data into a local MongoDB.")
+parser.add_argument("--seed", type=int, default=None,
+                    help="seed of the generated data (default: fresh, printed in the log)")
+parser.add_argument("--reference-time", default=None,
+                    help="ISO 8601 instant the timestamps are generated around (default: now, printed in the log)")
+args = parser.parse_args()
+SEED = resolve_seed(args.seed)
+REFERENCE_TIME = parse_reference_time(args.reference_time) or datetime.now(UTC)
+
+# --- Batch builders ---
+def make_vehicle_docs(n, rng):
+    return vehicle_batch_to_docs(generate_vehicle_batch(n, rng=rng, now=REFERENCE_TIME, status_weights=STATUS_WEIGHTS))
+
+def make_event_docs(n, rng):
+    return event_batch_to_docs(generate_event_batch(n, rng=rng, now=REFERENCE_TIME))
 
 # --- Update Example ---
 def update_example_data(n_updates=5):
     print(f"\n🔧 Updating {n_updates} random vehicle documents...\n")
     start_update = time.time()
 
-    sample_vehicles = list(vehicle_collection.aggregate([{"$sample": {"size": n_updates}}]))
+    rng = batch_rng(SEED, "updates")
+    sample_vehicles = sample_docs(db, n_updates, rng)
 
     for doc in sample_vehicles:
         vehicle_id = doc["vehicle_id"]
@@ -82,9 +68,9 @@ def update_example_data(n_updates=5):
         old_speed = doc["speed_kmh"]
         old_status = doc["system_status"]
 
-        new_battery = round(random.uniform(10, 100), 2)
-        new_speed = round(random.uniform(0, 120), 2)
-        new_status = random.choices(STATUS_TYPES, weights=[0.6, 0.3, 0.1])[0]
+        new_battery = round(float(rng.uniform(10, 100)), 2)
+        new_speed = round(float(rng.uniform(0, 120)), 2)
+        new_status = STATUS_TYPES[rng.choice(len(STATUS_TYPES), p=[0.6, 0.3, 0.1])]
 
         vehicle_collection.update_one(
             {"_id": doc["_id"]},
@@ -112,6 +98,7 @@ try:
         sys.stdout = f
 
         print(f"📅 Execution started at: {datetime.now(UTC).isoformat()}\n")
+        print(f"🎲 Seed: {SEED} | reference time: {REFERENCE_TIME.isoformat()}\n")
 
         # --- Delete old data ---
         start_delete = time.time()
@@ -123,25 +110,22 @@ try:
         print(f"Deleted {deleted_events.deleted_count} urban event records.")
         print(f"🧹 Data deletion completed in {end_delete - start_delete:.2f} seconds.\n")
 
-        # --- Generate data ---
-        print(f"Generating {NUM_VEHICLE_DOCS} vehicle telemetry documents...")
-        vehicle_docs = [generate_vehicle_data() for _ in range(NUM_VEHICLE_DOCS)]
-
-        print(f"Generating {NUM_EVENT_DOCS} urban event documents...")
-        event_docs = [generate_urban_event() for _ in range(NUM_EVENT_DOCS)]
-
-        # --- Insert data with timing ---
-        print("Inserting vehicle data...")
-        start_vehicles = time.time()
-        vehicle_collection.insert_many(vehicle_docs)
-        end_vehicles = time.time()
-        print(f"Vehicle data inserted in {end_vehicles - start_vehicles:.2f} seconds.\n")
-
-        print("Inserting urban events...")
-        start_events = time.time()
-        events_collection.insert_many(event_docs)
-        end_events = time.time()
-        print(f"Urban event data inserted in {end_events - start_events:.2f} seconds.\n")
+        # --- Generate and insert data in streaming batches ---
+        print(f"Streaming {NUM_VEHICLE_DOCS} vehicle telemetry documents in batches of {BATCH_SIZE}...")
+        stats = run_pipeline(
+            iter_seeded_batches(plan_batches(NUM_VEHICLE_DOCS, BATCH_SIZE), make_vehicle_docs, SEED, "vehicle_data"),
+            vehicle_collection.insert_many,
+        )
+        print(f"Vehicle data inserted in {stats['elapsed']:.2f} seconds "
+              f"({stats['batches']} batches, {stats['write_seconds']:.2f}s spent writing).\n")
+
+        print(f"Streaming {NUM_EVENT_DOCS} urban event documents in batches of {BATCH_SIZE}...")
+        stats = run_pipeline(
+            iter_seeded_batches(plan_batches(NUM_EVENT_DOCS, BATCH_SIZE), make_event_docs, SEED, "urban_events"),
+            events_collection.insert_many,
+        )
+        print(f"Urban event data inserted in {stats['elapsed']:.2f} seconds "
+              f"({stats['batches']} batches, {stats['write_seconds']:.2f}s spent writing).\n")
 
         update_example_data(n_updates=5)
 
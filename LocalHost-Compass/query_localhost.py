@@ -1,11 +1,14 @@
 import time
 from datetime import datetime, timedelta, UTC
-from pymongo import MongoClient
 from collections import defaultdict
 from dotenv import load_dotenv
 import os
 import sys
 
+# Pool de conexões compartilhado (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backends import mongo_client
+
 # --- Setup ---
 load_dotenv()
 
@@ -14,7 +17,7 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 
 # Conexão com o MongoDB
-client = MongoClient(MONGO_URI)
+client = mongo_client(MONGO_URI)
 db = client["fleet_monitoring"]
 vehicle_collection = db["vehicle_data"]
 event_collection = db["urban_events"]
@@ -32,7 +35,6 @@ def critical_failures_last_24h():
     since = datetime.now(UTC) - timedelta(hours=24)
     count = vehicle_collection.count_documents({
         "timestamp": {"$gte": since},
-        #"timestamp": {"$gte": since.isoformat()},
         "system_status": "ERROR"
     })
     print(f"Total de veículos com falhas críticas nas últimas 24h: {count}")
@@ -57,7 +59,7 @@ def average_battery_morning():
     end_time = today + timedelta(hours=10)
 
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start_time.isoformat(), "$lte": end_time.isoformat()}}},
+        {"$match": {"timestamp": {"$gte": start_time, "$lte": end_time}}},
         {"$group": {"_id": None, "avg_battery": {"$avg": "$battery_level"}}}
     ]
 
@@ -71,7 +73,6 @@ def average_battery_morning():
 def avg_speed_last_7_days():
     since = datetime.now(UTC) - timedelta(days=7)
     pipeline = [
-        #{"$match": {"timestamp": {"$gte": since.isoformat()}}},
         {"$match": {"timestamp": {"$gte": since}}},
         {"$group": {"_id": "$vehicle_id", "avg_speed": {"$avg": "$speed_kmh"}}},
         {"$sort": {"avg_speed": -1}}
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Interface comum e pipeline de carga (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backends import StorageBackend
+from query_cache import WRITE_VERSIONS
+from ingest_pipeline import BATCH_SIZE, plan_batches, iter_seeded_batches, resolve_seed, run_pipeline
+from telemetry_batch import (
+    generate_vehicle_batch, generate_event_batch, vehicle_batch_to_rows, event_batch_to_rows, parse_reference_time,
+    local_time,
+)
+# Só módulos sem o driver do MySQL: o backend embutido roda sem mysql-connector instalado
+from mysql_loader import TABLE_COLUMNS
+from schema_mysql import TABLES, MANAGED_INDEXES, create_table_sql, create_write_versions_sql
+import report_queries
+
+# --- Motores embutidos ---
+# sqlite: biblioteca padrão, armazenamento por linhas, usa os mesmos índices do MySQL
+# duckdb: colunar (pip install duckdb), sem índices secundários; agregações varrem só as colunas usadas
+ENGINES = ["sqlite", "duckdb"]
+DEFAULT_PATHS = {"sqlite": "fleet_monitoring.sqlite", "duckdb": "fleet_monitoring.duckdb"}
+
+# DATETIME fica como texto 'AAAA-MM-DD HH:MM:SS' no SQLite, então comparações de texto seguem a ordem do tempo
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+# Consulta 5 no DuckDB: ASOF JOIN nativo (junção por merge ordenado) no lugar das subconsultas
+# correlacionadas. Leituras com o mesmo timestamp no mesmo veículo viram uma só, em ERROR se alguma
+# estiver, a mesma regra da consulta original (o status mais grave vence o empate).
+DUCKDB_QUERY_5 = """
+SELECT ue.vehicle_id, ue.event_type, ue.timestamp, ue.severity
+FROM urban_events ue
+ASOF JOIN (
+    SELECT vehicle_id, timestamp, bool_or(system_status = 'ERROR') AS in_error
+    FROM vehicle_data
+    GROUP BY vehicle_id, timestamp
+) vd
+  ON ue.vehicle_id = vd.vehicle_id AND ue.timestamp >= vd.timestamp
+WHERE vd.in_error
+ORDER BY ue.vehicle_id, ue.timestamp;
+"""
+
+
+def column_type(sql_type):
+    # ENUM não existe nos dois motores; os valores continuam os mesmos como texto
+    return "VARCHAR" if sql_type.startswith("ENUM") else sql_type
+
+
+def translate(sql, engine):
+    # Reescreve as funções do dialeto MySQL usadas em report_queries.py. NOW() vira o horário
+    # local do processo, como o NOW() do servidor MySQL usado pelo gerador.
+    now = datetime.now().isoformat(" ", timespec="seconds")
+    if engine == "sqlite":
+        sql = re.sub(r"NOW\(\) - INTERVAL (\d+) DAY", rf"datetime('{now}', '-\1 days')", sql)
+        sql = re.sub(r"HOUR\((\w+)\)", r"CAST(strftime('%H', \1) AS INTEGER)", sql)
+        sql = re.sub(r"LEFT\((\w+), (\d+)\)", r"substr(\1, 1, \2)", sql)
+    else:
+        sql = sql.replace("NOW()", f"TIMESTAMP '{now}'")
+    return sql
+
+
+class DictCursor:
+    # Cursor com a mesma interface usada por report_queries.py (execute/fetchall/fetchmany, linhas
+    # como dicionários), traduzindo o SQL para o motor embutido
+    def __init__(self, conn, engine):
+        self.cursor = conn.cursor()
+        self.engine = engine
+
+    def execute(self, sql, params=()):
+        if self.engine == "duckdb" and sql == report_queries.query_5:
+            sql = DUCKDB_QUERY_5
+        self.cursor.execute(translate(sql, self.engine), params)
+
+    def _rows(self, rows):
+        columns = [column[0] for column in self.cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchall(self):
+        return self._rows(self.cursor.fetchall())
+
+    def fetchmany(self, size):
+        return self._rows(self.cursor.fetchmany(size))
+
+
+class EmbeddedBackend(StorageBackend):
+    name = "embedded"
+
+    def __init__(self, path=None, engine="sqlite", cache=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        self.engine = engine
+        self.path = path or DEFAULT_PATHS[engine]
+        self.cache = cache
+        if engine == "duckdb":
+            import duckdb
+            self.conn = duckdb.connect(self.path)
+        else:
+            self.conn = sqlite3.connect(self.path)
+        self.create_schema()
+
+    def scope(self):
+        return (self.engine, os.path.abspath(self.path))
+
+    def create_schema(self):
+        cursor = self.conn.cursor()
+        for table in TABLES:
+            if self.engine == "sqlite":
+                id_column = "id INTEGER PRIMARY KEY"
+            else:
+                cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id")
+                id_column = f"id BIGINT DEFAULT nextval('{table}_id')"
+            cursor.execute(create_table_sql(table, id_column, column_type))
+            if self.engine == "sqlite":
+                # Nomes de índice são globais no SQLite, por isso o prefixo com a tabela
+                for name, columns in MANAGED_INDEXES[table].items():
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} {columns}")
+        cursor.execute(create_write_versions_sql())
+        self.conn.commit()
+
+    def delete_data(self):
+        for table in TABLES:
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.commit()
+        self.mark_written(*TABLES)
+
+    def cursor(self):
+        return DictCursor(self.conn, self.engine)
+
+    def insert_batch(self, table, records, ordered=False):
+        columns = TABLE_COLUMNS[table]
+        if self.engine == "duckdb":
+            # Carga em massa pelo COPY (como o LOAD DATA INFILE do MySQL): inserts linha a
+            # linha são lentos em um motor colunar
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False,
+                                             encoding="utf-8", newline="") as tmp:
+                csv.writer(tmp).writerows(records)
+            try:
+                self.conn.execute(f"COPY {table} ({', '.join(columns)}) FROM '{tmp.name}' (HEADER false)")
+            finally:
+                os.remove(tmp.name)
+        else:
+            placeholders = ", ".join(["?"] * len(columns))
+            self.conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", records)
+        self.conn.commit()
+        self.written(table)
+        return len(records)
+
+    def bulk_update(self, table, changes):
+        groups = {}
+        for record_id, values in changes:
+            groups.setdefault(tuple(values), []).append((*values.values(), record_id))
+        for columns, params in groups.items():
+            assignments = ", ".join(f"{column}=?" for column in columns)
+            self.conn.executemany(f"UPDATE {table} SET {assignments} WHERE id=?", params)
+        self.conn.commit()
+        self.written(table)
+        return len(changes)
+
+    # Contadores de escrita no próprio arquivo: outros processos que abrem o mesmo banco veem as escritas
+    def bump_write_versions(self, tables):
+        for table in sorted(tables):
+            self.conn.execute(f"INSERT INTO {WRITE_VERSIONS} (table_name, version) VALUES (?, 1) "
+                              "ON CONFLICT (table_name) DO UPDATE SET version = version + 1", (table,))
+        self.conn.commit()
+
+    def write_versions(self, tables):
+        placeholders = ", ".join(["?"] * len(tables))
+        versions = dict(self.conn.execute(
+            f"SELECT table_name, version FROM {WRITE_VERSIONS} WHERE table_name IN ({placeholders})", list(tables)
+        ).fetchall())
+        return tuple(versions.get(table, 0) for table in tables)
+
+    def execute_query(self, name, **params):
+        return report_queries.fetch_results(self.cursor(), report_queries.NAMED_QUERIES[name], **params)
+
+    def close(self):
+        self.conn.close()
+
+
+# Mesmos lotes do generate_data_mysql.py (make_vehicle_rows/make_event_rows): com a mesma semente e
+# instante, os mesmos dados do MySQL
+def make_vehicle_rows(n, rng, now):
+    return vehicle_batch_to_rows(generate_vehicle_batch(n, rng=rng, now=now))
+
+def make_event_rows(n, rng, now):
+    return event_batch_to_rows(generate_event_batch(n, rng=rng, now=now))
+
+def load_generated_data(backend, n_vehicle_rows, n_event_rows, seed=None, now=None):
+    now = now or datetime.now()
+    vehicle_stats = run_pipeline(
+        iter_seeded_batches(plan_batches(n_vehicle_rows, BATCH_SIZE), lambda n, rng: make_vehicle_rows(n, rng, now),
+                            seed, "vehicle_data"),
+        lambda rows: backend.insert_batch("vehicle_data", rows),
+    )
+    event_stats = run_pipeline(
+        iter_seeded_batches(plan_batches(n_event_rows, BATCH_SIZE), lambda n, rng: make_event_rows(n, rng, now),
+                            seed, "urban_events"),
+        lambda rows: backend.insert_batch("urban_events", rows),
+    )
+    backend.mark_written("vehicle_data", "urban_events")
+    return vehicle_stats, event_stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Executa o relatório de query_Mysql.py em um banco embutido (SQLite ou DuckDB), sem servidor.")
+    parser.add_argument("--engine", choices=ENGINES, default="sqlite",
+                        help="sqlite (linhas, com índices) ou duckdb (colunar) (padrão: %(default)s)")
+    parser.add_argument("--path", default=None,
+                        help="arquivo do banco (padrão: fleet_monitoring.sqlite / fleet_monitoring.duckdb)")
+    parser.add_argument("--load", type=int, default=0,
+                        help="apaga os dados e gera N leituras e N eventos antes do relatório")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="semente dos dados gerados por --load (padrão: nova, registrada no relatório)")
+    parser.add_argument("--reference-time", default=None,
+                        help="instante ISO 8601 de referência dos timestamps de --load (padrão: agora)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    backend = EmbeddedBackend(args.path, args.engine)
+    report_filename = f"relatorio_consultas_{args.engine}.txt"
+
+    with open(report_filename, "w", encoding="utf-8") as f:
+        original_stdout = sys.stdout
+        sys.stdout = f
+
+        print(f"📅 Relatório gerado em: {datetime.now().isoformat()} ({args.engine}: {backend.path})")
+        if args.load:
+            backend.delete_data()
+            seed = resolve_seed(args.seed)
+            now = local_time(parse_reference_time(args.reference_time)) or datetime.now()
+            print(f"🎲 Semente: {seed} | instante de referência: {now.isoformat()}")
+            vehicle_stats, event_stats = load_generated_data(backend, args.load, args.load, seed, now)
+            print(f"📥 {vehicle_stats['rows']} leituras em {vehicle_stats['elapsed']:.2f} segundos, "
+                  f"{event_stats['rows']} eventos em {event_stats['elapsed']:.2f} segundos.")
+
+        cursor = backend.cursor()
+        start_report = time.time()
+        elapsed_per_query = [
+            report_queries.run_query(cursor, title, query, formatter)
+            for title, query, formatter in report_queries.REPORT_QUERIES
+        ]
+        end_report = time.time()
+        print(f"\n⏱ Tempo total do relatório: {end_report - start_report:.4f} segundos "
+              f"(soma das consultas: {sum(elapsed_per_query):.4f} segundos)")
+
+        sys.stdout = original_stdout
+    backend.close()
+    print(f"📄 Relatório salvo em '{report_filename}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,164 +1,458 @@
-import mysql.connector
-from faker import Faker
-import uuid
-import random
-from datetime import datetime, timedelta
+import argparse
+from datetime import datetime
 from dotenv import load_dotenv
+import numpy as np
 import os
 import time
 import sys
 
+# Gerador em lote compartilhado (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from telemetry_batch import (
+    STATUS_TYPES,
+    STATUS_WEIGHTS,
+    parse_reference_time,
+    local_time,
+    generated_days,
+    generate_vehicle_batch,
+    generate_event_batch,
+    vehicle_batch_to_rows,
+    event_batch_to_rows,
+)
+from ingest_pipeline import (
+    run_pipeline,
+    run_sharded,
+    merge_stats,
+    batch_latency_summary,
+    plan_batches,
+    iter_seeded_batches,
+    resolve_seed,
+    batch_rng,
+)
+# Conexões do pool compartilhado (MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD e MYSQL_POOL_SIZE no .env)
+from mysql_backend import connect, mark_written, update_rows
+from schema_mysql import (
+    INDEX_MODES,
+    PARTITIONED_TABLES,
+    ROLLUP_TABLE,
+    STATE_TABLE,
+    ALERT_TABLE,
+    create_table_sql,
+    create_partitioned_table_sql,
+    create_rollup_table_sql,
+    create_state_table_sql,
+    create_write_versions_sql,
+    day_partitions,
+    partition_table,
+    ensure_partitions,
+    expired_partitions,
+    drop_partitions,
+    upcoming_days,
+    ensure_indexes,
+    drop_indexes,
+)
+from mysql_loader import (
+    BulkLoader,
+    STRATEGIES,
+    ROWS_PER_STATEMENT,
+    COMMIT_EVERY,
+    VEHICLE_COLUMNS,
+    EVENT_COLUMNS,
+    ALERT_COLUMNS,
+)
+from vehicle_state_mysql import latest_rows, state_rows, upsert_state, sync_state
+from anomaly_detector import STORED_FIELDS, alert_batch_to_rows, detect_stored
+
 # --- Setup ---
 load_dotenv()
-fake = Faker()
 
-# MySQL config
-conn = mysql.connector.connect(
-    host=os.getenv("MYSQL_HOST", "localhost"),
-    user=os.getenv("MYSQL_USER", "root"),
-    password=os.getenv("MYSQL_PASSWORD", "root")
-)
-cursor = conn.cursor()
-
-# --- Redirecionar saída para arquivo ---
-log_filename = "log_insercao_mysql.txt"
-original_stdout = sys.stdout
-
-try:
-    with open(log_filename, "w", encoding="utf-8") as f:
-        sys.stdout = f
-
-        print(f"📅 Execution started at: {datetime.now().isoformat()}\n")
-
-        # --- Criar banco e tabelas ---
-        cursor.execute("CREATE DATABASE IF NOT EXISTS fleet_monitoring")
-        conn.commit()
-        cursor.execute("USE fleet_monitoring")
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS vehicle_data (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            vehicle_id VARCHAR(20),
-            timestamp DATETIME,
-            lat DOUBLE,
-            lng DOUBLE,
-            speed_kmh DOUBLE,
-            battery_level DOUBLE,
-            temperature_celsius DOUBLE,
-            system_status ENUM('OK', 'WARNING', 'ERROR')
-        )
-        """)
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS urban_events (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            event_id VARCHAR(36),
-            vehicle_id VARCHAR(20),
-            timestamp DATETIME,
-            event_type VARCHAR(50),
-            description TEXT,
-            lat DOUBLE,
-            lng DOUBLE,
-            severity ENUM('low', 'medium', 'high')
+# --- Parâmetros ---
+NUM_VEHICLE_DOCS = 1000
+NUM_EVENT_DOCS = 1000
+BATCH_SIZE = 10_000
+
+# --- Criar banco e tabelas ---
+# Tabelas particionadas por dia (schema_mysql.py), com partições para `days` (padrão: hoje e os
+# próximos dias). Tabelas de versões anteriores, sem partições, são convertidas uma vez.
+def create_schema(conn, cursor, days=None):
+    cursor.execute("CREATE DATABASE IF NOT EXISTS fleet_monitoring")
+    conn.commit()
+    cursor.execute("USE fleet_monitoring")
+
+    days = days or upcoming_days()
+    for table in PARTITIONED_TABLES:
+        cursor.execute(create_partitioned_table_sql(table, days))
+        if not day_partitions(cursor, table):
+            partition_table(conn, cursor, table, days)
+    cursor.execute(create_rollup_table_sql())
+    cursor.execute(create_state_table_sql())
+    cursor.execute(create_table_sql(ALERT_TABLE))
+    cursor.execute(create_write_versions_sql())
+    add_geohash_column(conn, cursor)
+    ensure_partitions(conn, cursor, days)
+
+# Tabelas criadas por versões anteriores não têm a coluna geohash: adiciona e preenche com
+# ST_GeoHash (mesma codificação do geo.py usado na geração dos lotes)
+def add_geohash_column(conn, cursor):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'urban_events' AND column_name = 'geohash'
+    """)
+    if cursor.fetchone()[0]:
+        return
+    cursor.execute("ALTER TABLE urban_events ADD COLUMN geohash CHAR(12)")
+    cursor.execute("UPDATE urban_events SET geohash = ST_GeoHash(lng, lat, 12)")
+    conn.commit()
+
+# --- Funções ---
+# Timestamps locais (DATETIME sem fuso), como no gerador original. `now` é o instante de
+# referência da execução (fixado uma vez, para todos os lotes e workers gerarem os mesmos dias).
+def make_vehicle_rows(n, rng=None, now=None):
+    return vehicle_batch_to_rows(generate_vehicle_batch(n, rng=rng, now=now or datetime.now()))
+
+# Lotes de telemetria da carga viajam como (linhas, estado): a última leitura de cada veículo é
+# separada nos arrays colunares, antes de virarem tuplas
+def make_vehicle_items(n, rng=None, now=None):
+    batch = generate_vehicle_batch(n, rng=rng, now=now or datetime.now())
+    return vehicle_batch_to_rows(batch), state_rows(batch)
+
+def count_vehicle_rows(item):
+    return len(item[0])
+
+def write_vehicle_items(loader):
+    # O upsert do estado é a última instrução antes de cada COMMIT do BulkLoader: as linhas de
+    # vehicle_state (poucas e disputadas por todos os workers) ficam travadas só entre o upsert e
+    # o COMMIT, não durante a inserção dos lotes
+    pending = []
+
+    def upsert_pending(cursor):
+        upsert_state(cursor, latest_rows(pending))
+        pending.clear()
+
+    loader.before_commit = upsert_pending
+
+    def write(item):
+        rows, latest = item
+        pending.extend(latest)
+        loader.write(rows)
+    return write
+
+def make_event_rows(n, rng=None, now=None):
+    return event_batch_to_rows(generate_event_batch(n, rng=rng, now=now or datetime.now()))
+
+# Gera e insere os lotes [(índice do lote, linhas)] de cada tabela; cada lote tem o seu gerador
+# derivado da semente e do índice (ingest_pipeline.iter_seeded_batches)
+def stream_rows(conn, vehicle_batches, event_batches, seed, now=None, load_options=None):
+    load_options = load_options or {}
+    vehicle_loader = BulkLoader(conn, "vehicle_data", VEHICLE_COLUMNS, **load_options)
+    event_loader = BulkLoader(conn, "urban_events", EVENT_COLUMNS, **load_options)
+
+    vehicle_stats = run_pipeline(
+        iter_seeded_batches(vehicle_batches, lambda n, rng: make_vehicle_items(n, rng, now), seed, "vehicle_data"),
+        write_vehicle_items(vehicle_loader),
+        count_rows=count_vehicle_rows,
+    )
+    vehicle_loader.flush()
+    # Escritas fora do MySQLBackend também invalidam os caches de consultas (deste e dos outros processos)
+    mark_written(conn, "vehicle_data")
+    event_stats = run_pipeline(
+        iter_seeded_batches(event_batches, lambda n, rng: make_event_rows(n, rng, now), seed, "urban_events"),
+        event_loader.write,
+    )
+    event_loader.flush()
+    mark_written(conn, "urban_events")
+    return vehicle_stats, event_stats
+
+# --- Workers paralelos ---
+def insert_shard(worker_id, seed, vehicle_batches, event_batches, now, load_options=None):
+    # Executa em outro processo, com conexão própria; os lotes trazem os seus geradores
+    load_options = load_options or {}
+    worker_conn = connect(database="fleet_monitoring",
+                          allow_local_infile=load_options.get("strategy") == "infile")
+    try:
+        vehicle_stats, event_stats = stream_rows(
+            worker_conn, vehicle_batches, event_batches, seed, now, load_options
         )
-        """)
-
-        # --- Parâmetros ---
-        NUM_VEHICLES = 50
-        NUM_VEHICLE_DOCS = 1000
-        NUM_EVENT_DOCS = 1000
-        VEHICLE_IDS = [f"V-2025-{str(i).zfill(3)}" for i in range(NUM_VEHICLES)]
-        EVENT_TYPES = ["obstacle", "traffic_jam", "roadwork", "accident", "pedestrian_crossing"]
-        STATUS_TYPES = ["OK", "WARNING", "ERROR"]
-        SEVERITY_LEVELS = ["low", "medium", "high"]
-
-        # --- Funções ---
-        def generate_vehicle_data():
-            vehicle_id = random.choice(VEHICLE_IDS)
-            location = fake.local_latlng(country_code="BR", coords_only=True)
-            timestamp = datetime.now() - timedelta(days=random.randint(0, 6), hours=random.randint(6, 10))
-            return (
-                vehicle_id,
-                timestamp,
-                float(location[0]),
-                float(location[1]),
-                round(random.uniform(0, 120), 2),
-                round(random.uniform(10, 100), 2),
-                round(random.uniform(20, 90), 2),
-                random.choices(STATUS_TYPES, weights=[0.6, 0.3, 0.1])[0]
-            )
-
-        def generate_urban_event():
-            vehicle_id = random.choice(VEHICLE_IDS)
-            location = fake.local_latlng(country_code="BR", coords_only=True)
-            timestamp = datetime.now() - timedelta(days=random.randint(0, 6))
-            return (
-                str(uuid.uuid4()),
-                vehicle_id,
-                timestamp,
-                random.choice(EVENT_TYPES),
-                fake.sentence(nb_words=6),
-                float(location[0]),
-                float(location[1]),
-                random.choices(SEVERITY_LEVELS, weights=[0.2, 0.3, 0.5])[0]
-            )
-
-        # --- Delete old data ---
-        print("🧹 Deleting old data...")
-        start_delete = time.time()
-        cursor.execute("DELETE FROM vehicle_data")
-        cursor.execute("DELETE FROM urban_events")
-        conn.commit()
-        end_delete = time.time()
-        print(f"\n🗑️ Data deletion completed in {end_delete - start_delete:.2f} seconds.\n")
-
-        # --- Insert new data ---
-        print(f"Generating {NUM_VEHICLE_DOCS} vehicle telemetry records...")
-        vehicle_data = [generate_vehicle_data() for _ in range(NUM_VEHICLE_DOCS)]
-
-        print(f"Generating {NUM_EVENT_DOCS} urban event records...")
-        event_data = [generate_urban_event() for _ in range(NUM_EVENT_DOCS)]
-
-        print("🚗 Inserting vehicle data...")
-        start_insert = time.time()
-        cursor.executemany("""
-            INSERT INTO vehicle_data (vehicle_id, timestamp, lat, lng, speed_kmh, battery_level, temperature_celsius, system_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, vehicle_data)
-
-        print("🌆 Inserting urban event data...")
-        cursor.executemany("""
-            INSERT INTO urban_events (event_id, vehicle_id, timestamp, event_type, description, lat, lng, severity)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, event_data)
-        conn.commit()
-        end_insert = time.time()
-        print(f"\n📥 Data insertion completed in {end_insert - start_insert:.2f} seconds.\n")
-
-        # --- Update example ---
-        print("🔧 Updating 5 random vehicle records...\n")
-        start_update = time.time()
-        cursor.execute("SELECT id, battery_level, speed_kmh, system_status FROM vehicle_data ORDER BY RAND() LIMIT 5")
-        rows = cursor.fetchall()
-
-        for row in rows:
-            vid, old_battery, old_speed, old_status = row
-            new_battery = round(random.uniform(10, 100), 2)
-            new_speed = round(random.uniform(0, 120), 2)
-            new_status = random.choice(STATUS_TYPES)
-            print(f"ID {vid}: Battery {old_battery} → {new_battery}, Speed {old_speed} → {new_speed}, Status {old_status} → {new_status}")
-            cursor.execute("""
-                UPDATE vehicle_data
-                SET battery_level=%s, speed_kmh=%s, system_status=%s
-                WHERE id=%s
-            """, (new_battery, new_speed, new_status, vid))
-
-        conn.commit()
-        end_update = time.time()
-        print(f"\n✅ Update completed in {end_update - start_update:.2f} seconds.")
-        print("📌 All operations finished.")
-
-finally:
-    conn.close()
-    sys.stdout = original_stdout
-    print(f"📄 Logs saved to '{log_filename}'")
+    finally:
+        worker_conn.close()
+    return {"worker": worker_id, "vehicles": vehicle_stats, "events": event_stats}
+
+def print_insert_stats(label, stats):
+    summary = batch_latency_summary(stats)
+    print(f"{label} inserted in {stats['elapsed']:.2f} seconds "
+          f"({stats['batches']} batches, {stats['write_seconds']:.2f}s spent writing, "
+          f"{summary['rows_per_second']:,.0f} rows/s).")
+    print(f"  Batch latency: avg {summary['avg_ms']:.1f} ms | p95 {summary['p95_ms']:.1f} ms | "
+          f"max {summary['max_ms']:.1f} ms")
+
+def insert_data(conn, workers=1, load_options=None, seed=None, now=None):
+    load_options = load_options or {}
+    seed = resolve_seed(seed)
+    now = now or datetime.now()
+    strategy = load_options.get("strategy", "multirow")
+    if workers == 1:
+        print(f"🚗🌆 Streaming {NUM_VEHICLE_DOCS} vehicle and {NUM_EVENT_DOCS} event records "
+              f"in batches of {BATCH_SIZE} (strategy: {strategy})...")
+        vehicle_stats, event_stats = stream_rows(conn, plan_batches(NUM_VEHICLE_DOCS, BATCH_SIZE),
+                                                 plan_batches(NUM_EVENT_DOCS, BATCH_SIZE), seed, now, load_options)
+    else:
+        print(f"⚙️ Sharding {NUM_VEHICLE_DOCS} vehicle and {NUM_EVENT_DOCS} event records "
+              f"across {workers} worker processes (batches of {BATCH_SIZE}, strategy: {strategy})...")
+        results = run_sharded(insert_shard, workers, [NUM_VEHICLE_DOCS, NUM_EVENT_DOCS], seed,
+                              args=(now, load_options), batch_size=BATCH_SIZE)
+        for result in results:
+            print(f"  Worker {result['worker']}: "
+                  f"{result['vehicles']['rows']} vehicle rows in {result['vehicles']['elapsed']:.2f}s, "
+                  f"{result['events']['rows']} events in {result['events']['elapsed']:.2f}s")
+        vehicle_stats = merge_stats([r["vehicles"] for r in results])
+        event_stats = merge_stats([r["events"] for r in results])
+
+    print_insert_stats("Vehicle data", vehicle_stats)
+    print_insert_stats("Urban event data", event_stats)
+    return vehicle_stats, event_stats
+
+# TRUNCATE recria as partições vazias (custo proporcional às partições, não às linhas). Com
+# `days`, as partições de dias anteriores ao primeiro deles também são descartadas.
+def delete_data(conn, cursor, days=None):
+    print("🧹 Deleting old data...")
+    start_delete = time.time()
+    for table in PARTITIONED_TABLES + [ROLLUP_TABLE, STATE_TABLE, ALERT_TABLE]:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    dropped = drop_partitions(conn, cursor, expired_partitions(cursor, days[0])) if days else []
+    mark_written(conn, "vehicle_data", "urban_events")
+    end_delete = time.time()
+    if dropped:
+        print(f"🗓️ Dropped {len(dropped)} stale day partitions.")
+    print(f"\n🗑️ Data deletion completed in {end_delete - start_delete:.2f} seconds.\n")
+
+# --- Amostragem ---
+# ORDER BY RAND() lê e ordena a tabela inteira. Aqui os ids são sorteados em [MIN(id), MAX(id)] da
+# chave AUTO_INCREMENT e lidos pela chave primária, então o custo acompanha o tamanho da amostra e
+# não o da tabela. Ids que não existem mais (partições descartadas, lacunas do AUTO_INCREMENT) são
+# sorteados de novo, por até SAMPLE_ROUNDS rodadas, sorteando a mais conforme a fração de ids
+# encontrados até ali; cada linha existente tem a mesma chance.
+SAMPLE_ROUNDS = 8
+SAMPLE_COLUMNS = ("id", "battery_level", "speed_kmh", "system_status")
+
+def sample_rows(cursor, n, rng, columns=SAMPLE_COLUMNS):
+    cursor.execute("SELECT MIN(id), MAX(id) FROM vehicle_data")
+    low, high = cursor.fetchone()
+    if low is None or n <= 0:
+        return []
+    span = high - low + 1
+    rows = {}
+    tried = np.empty(0, dtype=np.int64)
+    for _ in range(SAMPLE_ROUNDS):
+        missing = n - len(rows)
+        if missing <= 0 or len(tried) >= span:
+            break
+        hit_rate = len(rows) / len(tried) if len(rows) else 0.5
+        draws = min(int(np.ceil(missing / max(hit_rate, 0.01) * 1.2)), span)
+        candidates = np.setdiff1d(rng.integers(low, high + 1, draws), tried)
+        if not len(candidates):
+            continue
+        tried = np.union1d(tried, candidates)
+        placeholders = ", ".join(["%s"] * len(candidates))
+        cursor.execute(f"SELECT {', '.join(columns)} FROM vehicle_data WHERE id IN ({placeholders})",
+                       candidates.tolist())
+        for row in cursor.fetchall():
+            rows[row[0]] = row
+    sample = list(rows.values())
+    if len(sample) > n:
+        sample = [sample[i] for i in np.sort(rng.choice(len(sample), n, replace=False))]
+    return sample
+
+# --- Atualização de exemplo ---
+# Sorteia n linhas e reescreve bateria, velocidade e status com um único UPDATE ... JOIN
+# (mysql_backend.update_rows); o estado dos veículos cuja leitura mais recente mudou acompanha.
+# Retorna [(linha antiga, novos valores)].
+UPDATE_COLUMNS = ("battery_level", "speed_kmh", "system_status")
+
+def apply_random_updates(conn, cursor, n_updates=5, rng=None):
+    rng = rng if rng is not None else np.random.default_rng()
+    rows = sample_rows(cursor, n_updates, rng)
+
+    n = len(rows)
+    batteries = np.round(rng.uniform(10, 100, n), 2).tolist()
+    speeds = np.round(rng.uniform(0, 120, n), 2).tolist()
+    statuses = [STATUS_TYPES[i] for i in rng.choice(len(STATUS_TYPES), n, p=STATUS_WEIGHTS)]
+    changes = [(row, new_values) for row, new_values in zip(rows, zip(batteries, speeds, statuses))]
+
+    update_rows(cursor, "vehicle_data", UPDATE_COLUMNS, [(row[0], *new_values) for row, new_values in changes])
+    sync_state(cursor, [row[0] for row in rows])
+    conn.commit()
+    mark_written(conn, "vehicle_data")
+    return changes
+
+# Carga de atualizações: `rounds` rodadas de n_updates alterações (amostragem + UPDATE ... JOIN +
+# COMMIT cada), com as mesmas estatísticas das inserções (alterações/s e latência por rodada)
+def run_update_workload(conn, cursor, n_updates, rounds, rng):
+    stats = {"batches": 0, "rows": 0, "write_seconds": 0.0, "elapsed": 0.0, "batch_seconds": []}
+    changes = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        start_round = time.perf_counter()
+        changes = apply_random_updates(conn, cursor, n_updates, rng)
+        latency = time.perf_counter() - start_round
+        stats["batch_seconds"].append(latency)
+        stats["write_seconds"] += latency
+        stats["batches"] += 1
+        stats["rows"] += len(changes)
+    stats["elapsed"] = time.perf_counter() - start
+    return stats, changes
+
+# --- Detecção de anomalias (--detect) ---
+def stored_reading_chunks(chunk_size=BATCH_SIZE):
+    # vehicle_data em ordem de tempo, em uma conexão própria com cursor sem buffer: as linhas vêm
+    # do servidor aos poucos
+    read_conn = connect()
+    try:
+        cursor = read_conn.cursor()
+        cursor.execute(f"SELECT {', '.join(STORED_FIELDS)} FROM vehicle_data ORDER BY timestamp")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+    finally:
+        read_conn.close()
+
+def detect_anomalies(conn):
+    print("🚨 Replaying vehicle_data in time order through the anomaly detector...")
+    loader = BulkLoader(conn, ALERT_TABLE, ALERT_COLUMNS)
+    detector, stats = detect_stored(stored_reading_chunks(), lambda alerts: loader.write(alert_batch_to_rows(alerts)))
+    loader.flush()
+    mark_written(conn, ALERT_TABLE)
+    print(f"Stored {detector.stats['alerts']} alerts in '{ALERT_TABLE}' from {stats['rows']} readings "
+          f"in {stats['elapsed']:.2f} seconds ({detector.stats['seconds']:.2f}s spent detecting).\n")
+
+def compare_strategies(conn, cursor, workers, load_options, seed=None, now=None):
+    # Carrega o mesmo volume com cada estratégia e registra rows/s de cada uma
+    results = []
+    for strategy in STRATEGIES:
+        if strategy != STRATEGIES[0]:
+            delete_data(conn, cursor)
+        options = dict(load_options, strategy=strategy)
+        vehicle_stats, event_stats = insert_data(conn, workers=workers, load_options=options, seed=seed, now=now)
+        rows = vehicle_stats["rows"] + event_stats["rows"]
+        elapsed = vehicle_stats["elapsed"] + event_stats["elapsed"]
+        results.append((strategy, rows, elapsed))
+        print()
+
+    print("📊 Load strategy comparison (vehicle + event rows):")
+    print(f"{'Strategy':<12} | {'Rows':>10} | {'Seconds':>8} | {'Rows/s':>12}")
+    for strategy, rows, elapsed in results:
+        rate = rows / elapsed if elapsed else 0.0
+        print(f"{strategy:<12} | {rows:>10} | {elapsed:>8.2f} | {rate:>12,.0f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera e insere dados da frota no MySQL.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="número de processos, cada um com sua própria conexão (padrão: 1)")
+    parser.add_argument("--strategy", choices=STRATEGIES + ["compare"], default="multirow",
+                        help="estratégia de carga; 'compare' executa todas e mostra rows/s de cada uma")
+    parser.add_argument("--rows-per-statement", type=int, default=ROWS_PER_STATEMENT,
+                        help="linhas por INSERT multi-row (padrão: %(default)s)")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY,
+                        help="número de lotes entre cada COMMIT (padrão: %(default)s)")
+    parser.add_argument("--indexes", choices=INDEX_MODES, default="before",
+                        help="cria os índices antes da carga, depois dela (carga em massa mais rápida) ou não cria")
+    parser.add_argument("--updates", type=int, default=5,
+                        help="linhas sorteadas e alteradas por rodada de atualização (padrão: %(default)s)")
+    parser.add_argument("--update-rounds", type=int, default=1,
+                        help="rodadas de atualização, para simular uma carga contínua de mudanças de status (padrão: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="semente dos dados gerados (padrão: nova, registrada no log)")
+    parser.add_argument("--reference-time", default=None,
+                        help="instante ISO 8601 de referência dos timestamps (padrão: agora, registrado no log)")
+    parser.add_argument("--detect", action="store_true",
+                        help=f"depois da carga, repassa vehicle_data em ordem de tempo pelo detector de anomalias "
+                             f"e grava os alertas em '{ALERT_TABLE}'")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    load_options = {
+        "strategy": args.strategy,
+        "rows_per_statement": args.rows_per_statement,
+        "commit_every": args.commit_every,
+    }
+    conn = connect(database=None, allow_local_infile=args.strategy in ("infile", "compare"))
+    cursor = conn.cursor()
+
+    # --- Redirecionar saída para arquivo ---
+    log_filename = "log_insercao_mysql.txt"
+    original_stdout = sys.stdout
+
+    try:
+        with open(log_filename, "w", encoding="utf-8") as f:
+            sys.stdout = f
+
+            print(f"📅 Execution started at: {datetime.now().isoformat()}\n")
+
+            # Mesma semente e instante de referência -> mesmos dados, com qualquer número de workers
+            seed = resolve_seed(args.seed)
+            # Instantes com fuso (p. ex. +00:00) viram a hora local das tabelas
+            now = local_time(parse_reference_time(args.reference_time)) or datetime.now()
+            print(f"🎲 Seed: {seed} | reference time: {now.isoformat()}")
+            print(f"   Reproduce with --seed {seed} --reference-time {now.isoformat()}\n")
+
+            # Uma partição por dia gerado (e pelos próximos, para escritas em tempo real)
+            days = sorted(set(generated_days(now)) | set(upcoming_days()))
+            create_schema(conn, cursor, days)
+
+            # --- Delete old data ---
+            delete_data(conn, cursor, days)
+
+            # --- Índices (idempotente) ---
+            if args.indexes == "before":
+                print(f"📇 Indexes ensured: {', '.join(ensure_indexes(conn, cursor))}\n")
+            elif args.indexes == "after":
+                print(f"📇 Indexes dropped until the load finishes: {', '.join(drop_indexes(conn, cursor)) or 'none'}\n")
+
+            # --- Insert new data (streaming, COMMIT a cada --commit-every lotes) ---
+            start_insert = time.time()
+            if args.strategy == "compare":
+                compare_strategies(conn, cursor, args.workers, load_options, seed, now)
+            else:
+                insert_data(conn, workers=args.workers, load_options=load_options, seed=seed, now=now)
+            end_insert = time.time()
+            print(f"\n📥 Data insertion completed in {end_insert - start_insert:.2f} seconds.\n")
+
+            if args.indexes == "after":
+                start_index = time.time()
+                created = ensure_indexes(conn, cursor)
+                end_index = time.time()
+                print(f"📇 Indexes built in {end_index - start_index:.2f} seconds: {', '.join(created)}\n")
+
+            # --- Update example / workload ---
+            print(f"🔧 Updating {args.updates} random vehicle records x {args.update_rounds} round(s)...\n")
+            start_update = time.time()
+            stats, changes = run_update_workload(conn, cursor, args.updates, args.update_rounds,
+                                                 batch_rng(seed, "updates"))
+            if args.update_rounds == 1:
+                for (vid, old_battery, old_speed, old_status), (new_battery, new_speed, new_status) in changes:
+                    print(f"ID {vid}: Battery {old_battery} → {new_battery}, Speed {old_speed} → {new_speed}, Status {old_status} → {new_status}")
+                print()
+            summary = batch_latency_summary(stats)
+            print(f"Updated {stats['rows']} rows in {stats['elapsed']:.2f} seconds ({stats['batches']} rounds, "
+                  f"{summary['rows_per_second']:,.0f} rows/s).")
+            print(f"  Round latency: avg {summary['avg_ms']:.1f} ms | p95 {summary['p95_ms']:.1f} ms | "
+                  f"max {summary['max_ms']:.1f} ms")
+            end_update = time.time()
+            print(f"\n✅ Update completed in {end_update - start_update:.2f} seconds.")
+
+            if args.detect:
+                print()
+                detect_anomalies(conn)
+            print("📌 All operations finished.")
+
+    finally:
+        conn.close()
+        sys.stdout = original_stdout
+        print(f"📄 Logs saved to '{log_filename}'")
+
+if __name__ == "__main__":
+    main()
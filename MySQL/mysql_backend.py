@@ -0,0 +1,186 @@
+import os
+import sys
+from mysql.connector import errorcode, errors, pooling
+
+# Interface e tamanhos de pool compartilhados (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backends import StorageBackend, MYSQL_POOL_SIZE, pool_size
+from query_cache import WRITE_VERSIONS, invalidate_tables
+from mysql_loader import BulkLoader, ROWS_PER_STATEMENT, TABLE_COLUMNS
+from schema_mysql import TABLES
+
+DATABASE = "fleet_monitoring"
+
+# --- Pool de conexões ---
+# Um MySQLConnectionPool por processo, banco e opção LOCAL INFILE. Credenciais no .env
+# (MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD) e tamanho em MYSQL_POOL_SIZE. Com o pool
+# esgotado, get_connection() falha em vez de esperar: o tamanho deve cobrir as threads.
+_pools = {}
+
+
+def connection_config(database=DATABASE, allow_local_infile=False):
+    return {
+        "host": os.getenv("MYSQL_HOST", "localhost"),
+        "user": os.getenv("MYSQL_USER", "root"),
+        "password": os.getenv("MYSQL_PASSWORD", "root"),
+        "database": database,
+        "allow_local_infile": allow_local_infile,
+    }
+
+
+def mysql_pool(database=DATABASE, allow_local_infile=False):
+    key = (os.getpid(), database, allow_local_infile)
+    if key not in _pools:
+        _pools[key] = pooling.MySQLConnectionPool(
+            pool_name=f"fleet_{os.getpid()}_{database or 'server'}_{int(allow_local_infile)}",
+            pool_size=min(pool_size("MYSQL_POOL_SIZE", MYSQL_POOL_SIZE), pooling.CNX_POOL_MAXSIZE),
+            **connection_config(database, allow_local_infile)
+        )
+    return _pools[key]
+
+
+def connect(database=DATABASE, allow_local_infile=False):
+    # Conexão emprestada do pool: close() a devolve em vez de fechar o socket
+    return mysql_pool(database, allow_local_infile).get_connection()
+
+
+def mysql_scope(database=DATABASE):
+    # Identifica o banco nos caches de consultas (query_cache.py)
+    return ("mysql", os.getenv("MYSQL_HOST", "localhost"), database)
+
+
+# --- Contadores de escrita (query_cache.WRITE_VERSIONS, criada por generate_data_mysql.create_schema) ---
+# O incremento roda depois do COMMIT dos dados e é confirmado na hora: a linha do contador, a
+# mesma para todos os workers, fica travada só por essa instrução curta.
+def bump_write_versions(conn, tables):
+    cursor = conn.cursor()
+    for table in sorted(tables):
+        cursor.execute(f"INSERT INTO {WRITE_VERSIONS} (table_name, version) VALUES (%s, 1) "
+                       "ON DUPLICATE KEY UPDATE version = version + 1", (table,))
+    conn.commit()
+
+
+def read_write_versions(conn, tables):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT table_name, version FROM {WRITE_VERSIONS} WHERE table_name IN "
+                       f"({', '.join(['%s'] * len(tables))})", list(tables))
+    except errors.ProgrammingError as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        # Banco criado antes dos contadores: vale só o TTL do cache
+        return None
+    versions = dict(cursor.fetchall())
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+def mark_written(conn, *tables, database=DATABASE):
+    # Escritas feitas fora do MySQLBackend (carga, atualizações, retenção): contador no banco e
+    # caches de consultas deste processo
+    if not tables:
+        return
+    bump_write_versions(conn, tables)
+    invalidate_tables(mysql_scope(database), *tables)
+
+
+# --- Atualizações em lote (set-based) ---
+# Os novos valores vão para uma tabela temporária (INSERTs multi-row) e um único UPDATE ... JOIN
+# aplica todos pela chave primária, em vez de um UPDATE ... WHERE id=%s (uma ida ao servidor) por
+# linha. A tabela temporária usa os tipos das colunas de destino (schema_mysql.TABLES).
+def update_rows(cursor, table, columns, rows, rows_per_statement=ROWS_PER_STATEMENT):
+    # rows: [(id, *novos valores na ordem de columns)], ids sem repetição. Retorna as linhas alteradas.
+    if not rows:
+        return 0
+    types = dict(TABLES[table])
+    temp = f"tmp_{table}_updates"
+    definitions = ", ".join(f"{column} {types[column]}" for column in columns)
+    cursor.execute(f"CREATE TEMPORARY TABLE {temp} (id INT PRIMARY KEY, {definitions})")
+    try:
+        placeholders = ", ".join(["%s"] * (len(columns) + 1))
+        insert = f"INSERT INTO {temp} (id, {', '.join(columns)}) VALUES ({placeholders})"
+        for start in range(0, len(rows), rows_per_statement):
+            cursor.executemany(insert, rows[start:start + rows_per_statement])
+        assignments = ", ".join(f"t.{column} = u.{column}" for column in columns)
+        cursor.execute(f"UPDATE {table} AS t JOIN {temp} AS u ON t.id = u.id SET {assignments}")
+        return cursor.rowcount
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE {temp}")
+
+
+# --- Backend MySQL ---
+class MySQLBackend(StorageBackend):
+    name = "mysql"
+
+    def __init__(self, database=DATABASE, load_options=None, cache=None):
+        self.database = database
+        self.load_options = load_options or {}
+        self.allow_local_infile = self.load_options.get("strategy") == "infile"
+        self.cache = cache
+
+    def scope(self):
+        return mysql_scope(self.database)
+
+    def connection(self):
+        return connect(self.database, self.allow_local_infile)
+
+    def insert_batch(self, table, records, ordered=False):
+        # Lotes MySQL são sempre aplicados em ordem; `ordered` existe pela interface comum
+        before_commit = None
+        if table == "vehicle_data":
+            # Estado atual de cada veículo do lote (upsert condicional, logo antes do COMMIT).
+            # Importado aqui: vehicle_state_mysql importa este módulo
+            from vehicle_state_mysql import latest_rows, upsert_state
+            before_commit = lambda cursor: upsert_state(cursor, latest_rows(records))
+        conn = self.connection()
+        try:
+            loader = BulkLoader(conn, table, TABLE_COLUMNS[table], before_commit=before_commit, **self.load_options)
+            loader.write(records)
+            loader.flush()
+        finally:
+            conn.close()
+        self.written(table)
+        return len(records)
+
+    def bulk_update(self, table, changes):
+        # Agrupa as alterações pelas colunas modificadas: um UPDATE ... JOIN por grupo (update_rows),
+        # um COMMIT no fim. Para um mesmo id, vale a última alteração.
+        groups = {}
+        for record_id, values in changes:
+            groups.setdefault(tuple(values), {})[record_id] = tuple(values.values())
+        if not groups:
+            return 0
+
+        conn = self.connection()
+        try:
+            cursor = conn.cursor()
+            modified = 0
+            for columns, rows in groups.items():
+                modified += update_rows(cursor, table, columns, [(record_id, *values) for record_id, values in rows.items()])
+            conn.commit()
+        finally:
+            conn.close()
+        self.written(table)
+        return modified
+
+    def bump_write_versions(self, tables):
+        conn = self.connection()
+        try:
+            bump_write_versions(conn, tables)
+        finally:
+            conn.close()
+
+    def write_versions(self, tables):
+        conn = self.connection()
+        try:
+            return read_write_versions(conn, tables)
+        finally:
+            conn.close()
+
+    def execute_query(self, name, **params):
+        import report_queries
+        conn = self.connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            return report_queries.fetch_results(cursor, report_queries.NAMED_QUERIES[name], **params)
+        finally:
+            conn.close()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+# --- Colunas das tabelas (mesma ordem das tuplas de telemetry_batch) ---
+VEHICLE_COLUMNS = (
+    "vehicle_id", "timestamp", "lat", "lng",
+    "speed_kmh", "battery_level", "temperature_celsius", "system_status",
+)
+EVENT_COLUMNS = (
+    "event_id", "vehicle_id", "timestamp", "event_type",
+    "description", "lat", "lng", "severity", "geohash",
+)
+# Alertas do detector de anomalias (mesma ordem de anomaly_detector.alert_batch_to_rows)
+ALERT_COLUMNS = (
+    "vehicle_id", "timestamp", "alert_type", "value", "threshold",
+    "readings", "temperature_mean", "battery_mean", "speed_mean", "errors",
+)
+TABLE_COLUMNS = {
+    "vehicle_data": VEHICLE_COLUMNS,
+    "urban_events": EVENT_COLUMNS,
+    "vehicle_alerts": ALERT_COLUMNS,
+}
+
+STRATEGIES = ["executemany", "multirow", "infile"]
+ROWS_PER_STATEMENT = 1000
+COMMIT_EVERY = 1  # batches per COMMIT
+
+
+def _tsv_value(value):
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+class BulkLoader:
+    # Writes row batches into one table using a single strategy:
+    #   executemany -> cursor.executemany (connector-side batching)
+    #   multirow    -> INSERT ... VALUES (...),(...) with rows_per_statement rows each
+    #   infile      -> rows streamed to a temporary TSV and loaded with LOAD DATA LOCAL INFILE
+    def __init__(self, conn, table, columns, strategy="multirow",
+                 rows_per_statement=ROWS_PER_STATEMENT, commit_every=COMMIT_EVERY, before_commit=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.table = table
+        self.columns = columns
+        self.strategy = strategy
+        self.rows_per_statement = rows_per_statement
+        self.commit_every = commit_every
+        # Chamado com o cursor logo antes de cada COMMIT (última instrução da transação)
+        self.before_commit = before_commit
+        self.pending_batches = 0
+
+        column_list = ", ".join(columns)
+        self.row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        self.insert_prefix = f"INSERT INTO {table} ({column_list}) VALUES "
+        self.infile_sql = (
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})"
+        )
+
+    def write(self, rows):
+        if self.strategy == "executemany":
+            self.cursor.executemany(self.insert_prefix + self.row_placeholder, rows)
+        elif self.strategy == "multirow":
+            self._write_multirow(rows)
+        else:
+            self._write_infile(rows)
+
+        self.pending_batches += 1
+        if self.pending_batches >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending_batches:
+            if self.before_commit is not None:
+                self.before_commit(self.cursor)
+            self.conn.commit()
+            self.pending_batches = 0
+
+    def _write_multirow(self, rows):
+        for start in range(0, len(rows), self.rows_per_statement):
+            chunk = rows[start:start + self.rows_per_statement]
+            sql = self.insert_prefix + ", ".join([self.row_placeholder] * len(chunk))
+            self.cursor.execute(sql, [value for row in chunk for value in row])
+
+    def _write_infile(self, rows):
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False,
+                                         encoding="utf-8", newline="") as tmp:
+            for row in rows:
+                tmp.write("\t".join(_tsv_value(value) for value in row))
+                tmp.write("\n")
+        try:
+            self.cursor.execute(self.infile_sql, (tmp.name,))
+        finally:
+            os.remove(tmp.name)
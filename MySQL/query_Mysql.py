@@ -1,111 +1,179 @@
-import mysql.connector
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
+from dotenv import load_dotenv
+import os
 import sys
 import time
 
-# Conectar ao banco de dados
-conn = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="root",
-    database="fleet_monitoring"
+# Células geohash compartilhadas (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from geo import HOTSPOT_PRECISION
+from query_cache import CACHE_TTL, QueryCache
+from query_plans import MySQLProfiler, PlanLog
+# Conexões emprestadas do pool compartilhado; credenciais e tamanho do pool vêm do .env
+from mysql_backend import MySQLBackend, connect
+from schema_mysql import STATE_TABLE
+# SQL e formatação das consultas, compartilhados com o backend embutido
+from report_queries import (
+    EXPLAIN_SQL,
+    FLEET_STATUS_QUERIES,
+    REPORT_QUERIES,
+    fetch_results,
+    most_severe_event_areas,
+    run_query,
+    with_hotspot_precision,
 )
-cursor = conn.cursor(dictionary=True)
 
-def run_query(title, query, formatter):
+# --- Setup ---
+load_dotenv()
+
+# Modo de instrumentação: além do tempo, registra o EXPLAIN ANALYZE de cada consulta no log
+# estruturado PLAN_LOG, uma linha JSON por consulta e execução (requer MySQL 8.0.18+)
+PLAN_LOG = "query_plans_mysql.jsonl"
+
+def print_plan(record):
+    print(f"🧭 Plano: {record.get('examined', 0):,} linhas examinadas / {record['returned']:,} retornadas | "
+          f"índices: {', '.join(record.get('indexes', [])) or 'nenhum'}")
+    print(f"   Servidor {record.get('server_ms', 0):.1f} ms | cliente {record['client_ms']:.1f} ms | "
+          f"{record['transfer_bytes'] / 1024:.1f} KB")
+    if record.get("full_scan"):
+        print("   ⚠️ Varredura completa da tabela (Table scan / Index scan)")
+
+def run_query_explained(cursor, title, query, formatter, profiler, plan_log):
     print(f"\n🔍 {title}")
-    start_time = time.time()
-    cursor.execute(query)
-    results = cursor.fetchall()
-    end_time = time.time()
+    # Consultas em função são explicadas pelo SQL que executam
+    sql = query if isinstance(query, str) else EXPLAIN_SQL.get(query)
+    results, record = profiler.profile(formatter.__name__, lambda: fetch_results(cursor, query), sql)
     formatter(results)
-    print(f"⏱ Tempo de execução: {end_time - start_time:.4f} segundos")
-
-# 1. Veículos com falhas críticas nas últimas 24 horas
-def critical_failures_last_24h(results):
-    if results:
-        for row in results:
-            print(f"Vehicle: {row['vehicle_id']} | Timestamp: {row['timestamp']}")
-    else:
-        print("Nenhum veículo com falha crítica nas últimas 24h.")
-
-# 2. Regiões com mais eventos severos
-def most_severe_event_areas(results):
-    for row in results:
-        print(f"Location: ({row['lat']}, {row['lng']}) | Total High Severity Events: {row['total']}")
-
-# 3. Nível médio de bateria entre 6h e 10h
-def average_battery_morning(results):
-    if results and results[0]['avg_battery'] is not None:
-        print(f"Nível médio de bateria entre 06h e 10h: {results[0]['avg_battery']:.2f}%")
-    else:
-        print("Nenhum dado de bateria encontrado entre 06h e 10h.")
-
-# 4. Velocidade média por veículo nos últimos 7 dias
-def avg_speed_last_7_days(results):
-    for row in results:
-        print(f"Vehicle: {row['vehicle_id']} | Velocidade média: {row['avg_speed']:.2f} km/h")
-
-# 5. Eventos enquanto veículo estava com sistema em 'ERROR'
-def events_while_system_error(results):
-    for row in results:
-        print(f"Vehicle: {row['vehicle_id']} | Event: {row['event_type']} | Timestamp: {row['timestamp']} | Severity: {row['severity']}")
-
-# Consultas SQL
-query_1 = """
-SELECT vehicle_id, timestamp
-FROM vehicle_data
-WHERE system_status = 'ERROR'
-  AND timestamp >= NOW() - INTERVAL 1 DAY;
-"""
-
-query_2 = """
-SELECT lat, lng, COUNT(*) AS total
-FROM urban_events
-WHERE severity = 'high'
-GROUP BY lat, lng
-ORDER BY total DESC
-LIMIT 5;
-"""
-
-query_3 = """
-SELECT AVG(battery_level) AS avg_battery
-FROM vehicle_data
-WHERE HOUR(timestamp) BETWEEN 6 AND 10;
-"""
-
-query_4 = """
-SELECT vehicle_id, AVG(speed_kmh) AS avg_speed
-FROM vehicle_data
-WHERE timestamp >= NOW() - INTERVAL 7 DAY
-GROUP BY vehicle_id
-ORDER BY avg_speed DESC;
-"""
-
-query_5 = """
-SELECT ue.vehicle_id, ue.event_type, ue.timestamp, ue.severity
-FROM urban_events ue
-JOIN (
-    SELECT DISTINCT vehicle_id
-    FROM vehicle_data
-    WHERE system_status = 'ERROR'
-) err_vehicles
-ON ue.vehicle_id = err_vehicles.vehicle_id;
-"""
+    print_plan(record)
+    plan_log.write(dict(record, title=title))
+    print(f"⏱ Tempo de execução: {record['client_ms'] / 1000:.4f} segundos")
+    return record["client_ms"] / 1000
+
+# Conexões MySQL não são thread-safe: cada consulta concorrente usa a sua
+def fetch_with_own_connection(query):
+    conn = connect()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        start_time = time.time()
+        results = fetch_results(cursor, query)
+        return results, time.time() - start_time
+    finally:
+        conn.close()
+
+# Consultas do cache usam as conexões do MySQLBackend, então não abrem uma aqui
+def fetch_cached(query):
+    start_time = time.time()
+    results = query(None)
+    return results, time.time() - start_time
+
+# Dispara todas as consultas ao mesmo tempo e imprime na ordem original do relatório
+def run_queries_concurrently(queries, max_workers=None, fetch=fetch_with_own_connection):
+    with ThreadPoolExecutor(max_workers=max_workers or len(queries)) as pool:
+        futures = [pool.submit(fetch, query) for _, query, _ in queries]
+        elapsed_per_query = []
+        for (title, _, formatter), future in zip(queries, futures):
+            results, elapsed = future.result()
+            print(f"\n🔍 {title}")
+            formatter(results)
+            print(f"⏱ Tempo de execução: {elapsed:.4f} segundos")
+            elapsed_per_query.append(elapsed)
+    return elapsed_per_query
+
+# Consultas servidas pelo cache do MySQLBackend (chave: nome da consulta + parâmetros). O nome
+# vem do formatador, que tem o mesmo nome da consulta nomeada. O cursor recebido não é usado.
+def cached_query(backend, name, params, cursor):
+    return backend.run_query(name, **params)
+
+def through_cache(queries, backend, hotspot_precision=HOTSPOT_PRECISION):
+    cached = []
+    for title, query, formatter in queries:
+        params = {"precision": hotspot_precision} if formatter is most_severe_event_areas else {}
+        cached.append((title, partial(cached_query, backend, formatter.__name__, params), formatter))
+    return cached
+
+def print_cache_stats(cache):
+    stats = cache.summary()
+    print(f"🗃️ Cache: {stats['hits']} acertos, {stats['misses']} faltas (taxa de acerto {stats['hit_rate']:.0%}) | "
+          f"acerto médio {stats['avg_hit_us']:.1f} µs, falta média {stats['avg_miss_ms']:.1f} ms | "
+          f"{stats['expired']} expiradas, {stats['evicted']} removidas (LRU), {stats['invalidated']} invalidadas, "
+          f"{stats['version_checks']} leituras dos contadores de escrita")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Executa as consultas analíticas no MySQL e gera o relatório.")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="envia todas as consultas ao mesmo tempo, uma conexão do pool por thread")
+    parser.add_argument("--fleet-status", action="store_true",
+                        help=f"acrescenta o status atual de cada veículo, lido de '{STATE_TABLE}'")
+    parser.add_argument("--hotspot-precision", type=int, default=HOTSPOT_PRECISION,
+                        help=f"caracteres de geohash por célula na consulta de hotspots (padrão: {HOTSPOT_PRECISION}, ~4,9 km)")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve consultas repetidas do cache de resultados (LRU + TTL)")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL,
+                        help="segundos que um resultado fica no cache (padrão: %(default)s)")
+    parser.add_argument("--refreshes", type=int, default=0,
+                        help="repete as consultas N vezes após o relatório, como um painel atualizando")
+    parser.add_argument("--explain", action="store_true",
+                        help=f"registra o EXPLAIN ANALYZE de cada consulta em '{PLAN_LOG}'")
+    args = parser.parse_args()
+    if args.explain and (args.concurrent or args.cache):
+        parser.error("--explain executa as consultas em sequência e sem cache")
+    return args
 
 # --- Salvar resultados no arquivo ---
 if __name__ == "__main__":
+    args = parse_args()
+
     with open("relatorio_consultas_mysql.txt", "w", encoding="utf-8") as f:
         original_stdout = sys.stdout
         sys.stdout = f
 
         print(f"📅 Relatório gerado em: {datetime.now().isoformat()}")
 
-        run_query("1. Veículos com falhas críticas nas últimas 24h", query_1, critical_failures_last_24h)
-        run_query("2. Regiões com mais eventos severos", query_2, most_severe_event_areas)
-        run_query("3. Nível médio de bateria entre 6h e 10h", query_3, average_battery_morning)
-        run_query("4. Velocidade média por veículo nos últimos 7 dias", query_4, avg_speed_last_7_days)
-        run_query("5. Eventos ocorridos enquanto o sistema estava em 'ERROR'", query_5, events_while_system_error)
+        queries = REPORT_QUERIES + FLEET_STATUS_QUERIES if args.fleet_status else REPORT_QUERIES
+        queries = with_hotspot_precision(queries, args.hotspot_precision)
+        backend = None
+        if args.cache:
+            backend = MySQLBackend(cache=QueryCache(ttl=args.cache_ttl))
+            queries = through_cache(queries, backend, args.hotspot_precision)
+        start_report = time.time()
+        if args.concurrent:
+            elapsed_per_query = run_queries_concurrently(
+                queries, fetch=fetch_cached if args.cache else fetch_with_own_connection)
+        elif args.explain:
+            conn = connect()
+            cursor = conn.cursor(dictionary=True)
+            profiler = MySQLProfiler(conn)
+            plan_log = PlanLog(PLAN_LOG, "mysql")
+            elapsed_per_query = [run_query_explained(cursor, title, query, formatter, profiler, plan_log)
+                                 for title, query, formatter in queries]
+            conn.close()
+        else:
+            conn = connect()
+            cursor = conn.cursor(dictionary=True)
+            elapsed_per_query = [run_query(cursor, title, query, formatter) for title, query, formatter in queries]
+            conn.close()
+        end_report = time.time()
+
+        mode = "concorrente" if args.concurrent else "sequencial"
+        if args.explain:
+            print(f"\n🧭 Planos registrados em '{PLAN_LOG}' (execução {plan_log.run_id})")
+        print(f"\n⏱ Tempo total do relatório ({mode}): {end_report - start_report:.4f} segundos "
+              f"(soma das consultas: {sum(elapsed_per_query):.4f} segundos)")
+
+        # Atualizações do painel: as mesmas consultas de novo, sem imprimir os resultados
+        for refresh in range(1, args.refreshes + 1):
+            conn = connect()
+            cursor = conn.cursor(dictionary=True)
+            start_refresh = time.time()
+            for _, query, _ in queries:
+                fetch_results(cursor, query)
+            print(f"🔁 Atualização {refresh}: {time.time() - start_refresh:.4f} segundos")
+            conn.close()
+        if backend is not None:
+            print_cache_stats(backend.cache)
 
         sys.stdout = original_stdout
     print("📄 Relatório salvo em 'relatorio_consultas_mysql.txt'")
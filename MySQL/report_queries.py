@@ -0,0 +1,206 @@
+import os
+import sys
+import time
+
+# Consultas do relatório em SQL (dialeto MySQL) e a formatação dos resultados, sem o driver do
+# MySQL: query_Mysql.py as executa no servidor e embedded_backend.py, traduzidas, no SQLite/DuckDB
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from geo import HOTSPOT_PRECISION, geohash_center
+from schema_mysql import STATE_TABLE
+
+# Consultas são SQL (executado com fetchall) ou funções que recebem o cursor (e parâmetros
+# opcionais) e leem o resultado como preferirem, p. ex. em páginas
+def fetch_results(cursor, query, **params):
+    if callable(query):
+        return query(cursor, **params)
+    cursor.execute(query)
+    return cursor.fetchall()
+
+def run_query(cursor, title, query, formatter):
+    print(f"\n🔍 {title}")
+    start_time = time.time()
+    results = fetch_results(cursor, query)
+    end_time = time.time()
+    formatter(results)
+    print(f"⏱ Tempo de execução: {end_time - start_time:.4f} segundos")
+    return end_time - start_time
+
+# 1. Veículos com falhas críticas nas últimas 24 horas
+def critical_failures_last_24h(results):
+    if results:
+        for row in results:
+            print(f"Vehicle: {row['vehicle_id']} | Timestamp: {row['timestamp']}")
+    else:
+        print("Nenhum veículo com falha crítica nas últimas 24h.")
+
+# 2. Regiões com mais eventos severos
+def most_severe_event_areas(results):
+    for row in results:
+        lat, lng = geohash_center(row['cell'])
+        print(f"Cell: {row['cell']} ({lat:.4f}, {lng:.4f}) | Total High Severity Events: {row['total']}")
+
+# 3. Nível médio de bateria entre 6h e 10h
+def average_battery_morning(results):
+    if results and results[0]['avg_battery'] is not None:
+        print(f"Nível médio de bateria entre 06h e 10h: {results[0]['avg_battery']:.2f}%")
+    else:
+        print("Nenhum dado de bateria encontrado entre 06h e 10h.")
+
+# 4. Velocidade média por veículo nos últimos 7 dias
+def avg_speed_last_7_days(results):
+    for row in results:
+        print(f"Vehicle: {row['vehicle_id']} | Velocidade média: {row['avg_speed']:.2f} km/h")
+
+# 5. Eventos enquanto veículo estava com sistema em 'ERROR'
+def events_while_system_error(results):
+    print(f"Total de eventos ocorridos com o veículo em 'ERROR': {results['total']}")
+    for row in results["sample"]:
+        print(f"Vehicle: {row['vehicle_id']} | Event: {row['event_type']} | Timestamp: {row['timestamp']} | Severity: {row['severity']}")
+    if results["total"] > len(results["sample"]):
+        print(f"... (mostrando {len(results['sample'])} de {results['total']})")
+
+# 6. Status atual da frota
+def fleet_status_counts(results):
+    print("Veículos por status agora: " + " | ".join(f"{row['system_status']}: {row['total']}" for row in results))
+
+# 7. Veículos em 'ERROR' agora
+def vehicles_in_error(results):
+    if not results:
+        print("Nenhum veículo em 'ERROR' agora.")
+    for row in results:
+        print(f"Vehicle: {row['vehicle_id']} | Última leitura: {row['timestamp']} | "
+              f"Bateria: {row['battery_level']:.2f}% | Temperatura: {row['temperature_celsius']:.2f} °C")
+
+# Consultas SQL
+query_1 = """
+SELECT vehicle_id, timestamp
+FROM vehicle_data
+WHERE system_status = 'ERROR'
+  AND timestamp >= NOW() - INTERVAL 1 DAY;
+"""
+
+# Agrupa por prefixo do geohash: a resolução da célula é escolhida na consulta e o índice
+# (severity, geohash) cobre o filtro e o agrupamento
+def hotspot_query(precision=HOTSPOT_PRECISION):
+    return f"""
+SELECT LEFT(geohash, {int(precision)}) AS cell, COUNT(*) AS total
+FROM urban_events
+WHERE severity = 'high'
+GROUP BY cell
+ORDER BY total DESC
+LIMIT 5;
+"""
+
+query_2 = hotspot_query()
+
+query_3 = """
+SELECT AVG(battery_level) AS avg_battery
+FROM vehicle_data
+WHERE HOUR(timestamp) BETWEEN 6 AND 10;
+"""
+
+query_4 = """
+SELECT vehicle_id, AVG(speed_kmh) AS avg_speed
+FROM vehicle_data
+WHERE timestamp >= NOW() - INTERVAL 7 DAY
+GROUP BY vehicle_id
+ORDER BY avg_speed DESC;
+"""
+
+# Junção "as-of": o status de cada evento é o do veículo no último instante com leituras até o
+# instante do evento. Leituras do mesmo veículo no mesmo instante valem pelo status mais grave
+# (ERROR vence), regra que só depende dos dados. Duas buscas no índice idx_vehicle_timestamp por
+# evento: o MAX(timestamp) (uma descida no índice) e as leituras desse instante (igualdade)
+query_5 = """
+SELECT ue.vehicle_id, ue.event_type, ue.timestamp, ue.severity
+FROM urban_events ue
+WHERE EXISTS (
+    SELECT 1
+    FROM vehicle_data vd
+    WHERE vd.vehicle_id = ue.vehicle_id
+      AND vd.system_status = 'ERROR'
+      AND vd.timestamp = (
+          SELECT MAX(lv.timestamp)
+          FROM vehicle_data lv
+          WHERE lv.vehicle_id = ue.vehicle_id
+            AND lv.timestamp <= ue.timestamp
+      )
+)
+ORDER BY ue.vehicle_id, ue.timestamp;
+"""
+
+# Estado atual (vehicle_state_mysql.py): uma linha por veículo, mantida pela carga, então o
+# custo depende do tamanho da frota e não do histórico em vehicle_data
+query_6 = f"""
+SELECT system_status, COUNT(*) AS total
+FROM {STATE_TABLE}
+GROUP BY system_status
+ORDER BY system_status;
+"""
+
+query_7 = f"""
+SELECT vehicle_id, timestamp, battery_level, temperature_celsius
+FROM {STATE_TABLE}
+WHERE system_status = 'ERROR'
+ORDER BY vehicle_id;
+"""
+
+PAGE_SIZE = 1000
+SAMPLE_SIZE = 10
+
+# Lê o resultado em páginas com fetchmany: o cursor padrão do conector não é bufferizado, então
+# as linhas vêm do servidor conforme são consumidas e a memória não cresce com o volume
+def iter_events_while_system_error(cursor, page_size=PAGE_SIZE):
+    cursor.execute(query_5)
+    while True:
+        page = cursor.fetchmany(page_size)
+        if not page:
+            return
+        yield page
+
+def fetch_events_while_system_error(cursor, page_size=PAGE_SIZE):
+    total, sample = 0, []
+    for page in iter_events_while_system_error(cursor, page_size):
+        total += len(page)
+        sample.extend(page[:SAMPLE_SIZE - len(sample)])
+    return {"total": total, "sample": sample}
+
+# Consultas do relatório, na ordem em que aparecem no arquivo
+REPORT_QUERIES = [
+    ("1. Veículos com falhas críticas nas últimas 24h", query_1, critical_failures_last_24h),
+    ("2. Regiões com mais eventos severos", query_2, most_severe_event_areas),
+    ("3. Nível médio de bateria entre 6h e 10h", query_3, average_battery_morning),
+    ("4. Velocidade média por veículo nos últimos 7 dias", query_4, avg_speed_last_7_days),
+    ("5. Eventos ocorridos enquanto o sistema estava em 'ERROR'", fetch_events_while_system_error, events_while_system_error),
+]
+
+FLEET_STATUS_QUERIES = [
+    ("6. Status atual da frota", query_6, fleet_status_counts),
+    ("7. Veículos em 'ERROR' agora", query_7, vehicles_in_error),
+]
+
+# SQL executado pelas consultas em função, para o EXPLAIN ANALYZE
+EXPLAIN_SQL = {
+    fetch_events_while_system_error: query_5,
+}
+
+def fetch_most_severe_event_areas(cursor, precision=HOTSPOT_PRECISION):
+    return fetch_results(cursor, hotspot_query(precision))
+
+# Consultas nomeadas (mesmos nomes de query.py), executadas por MySQLBackend.run_query(nome, **parâmetros)
+NAMED_QUERIES = {
+    "critical_failures_last_24h": query_1,
+    "most_severe_event_areas": fetch_most_severe_event_areas,
+    "average_battery_morning": query_3,
+    "avg_speed_last_7_days": query_4,
+    "events_while_system_error": fetch_events_while_system_error,
+    "fleet_status_counts": query_6,
+    "vehicles_in_error": query_7,
+}
+
+# Troca a resolução das células da consulta de hotspots
+def with_hotspot_precision(queries, precision):
+    return [
+        (title, hotspot_query(precision) if query is query_2 else query, formatter)
+        for title, query, formatter in queries
+    ]
@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+
+# Módulos compartilhados (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mysql_backend import connect, mark_written
+from generate_data_mysql import create_schema
+from schema_mysql import (
+    PARTITIONS_AHEAD,
+    ROLLUP_TABLE,
+    upcoming_days,
+    expired_partitions,
+    drop_partitions,
+    downsample_partitions,
+)
+
+# --- Setup ---
+load_dotenv()
+
+# --- Retenção ---
+# Mantém RETENTION_DAYS dias de telemetria e eventos: as partições de dias mais antigos são
+# descartadas inteiras (DROP PARTITION). Com --downsample, as leituras dessas partições viram
+# antes buckets por hora em vehicle_hourly, que não expiram. Feito para rodar uma vez por dia
+# (cron), o que também cria as partições dos próximos dias.
+RETENTION_DAYS = 30
+
+
+def partition_rows(cursor, partitions):
+    # Linhas estimadas (information_schema) das partições que serão descartadas
+    total = 0
+    for table, names in partitions.items():
+        if not names:
+            continue
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(f"""
+            SELECT COALESCE(SUM(table_rows), 0)
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IN ({placeholders})
+        """, (table, *names))
+        total += int(cursor.fetchone()[0])
+    return total
+
+
+def run_retention(conn, cursor, days=RETENTION_DAYS, downsample=False, ahead=PARTITIONS_AHEAD, today=None):
+    today = today or date.today()
+    cutoff = today - timedelta(days=days)
+    create_schema(conn, cursor, upcoming_days(ahead, today))
+
+    expired = expired_partitions(cursor, cutoff)
+    stats = {"cutoff": cutoff, "rows": partition_rows(cursor, expired), "buckets": 0,
+             "downsample_seconds": 0.0}
+    if downsample:
+        start = time.perf_counter()
+        stats["buckets"] = downsample_partitions(conn, cursor, expired["vehicle_data"], cutoff)
+        stats["downsample_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats["dropped"] = drop_partitions(conn, cursor, expired)
+    stats["drop_seconds"] = time.perf_counter() - start
+    mark_written(conn, *[table for table, names in expired.items() if names])
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expira telemetria e eventos antigos descartando partições diárias.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS,
+                        help="dias mantidos; partições de dias anteriores são descartadas (padrão: %(default)s)")
+    parser.add_argument("--downsample", action="store_true",
+                        help=f"agrega as leituras expiradas por veículo e hora em '{ROLLUP_TABLE}' antes de descartá-las")
+    parser.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD,
+                        help="dias futuros com partição já criada (padrão: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect(database=None)
+    cursor = conn.cursor()
+    try:
+        print(f"📅 Retenção iniciada em: {datetime.now().isoformat()} (mantendo {args.days} dias)")
+        stats = run_retention(conn, cursor, args.days, args.downsample, args.ahead)
+        if args.downsample:
+            print(f"📊 Leituras agregadas em '{ROLLUP_TABLE}' em {stats['downsample_seconds']:.2f} segundos "
+                  f"({stats['buckets']} buckets anteriores a {stats['cutoff']}).")
+        if stats["dropped"]:
+            print(f"🗑️ {len(stats['dropped'])} partições anteriores a {stats['cutoff']} descartadas "
+                  f"(~{stats['rows']} linhas) em {stats['drop_seconds']:.2f} segundos: {', '.join(stats['dropped'])}")
+        else:
+            print(f"✅ Nenhuma partição anterior a {stats['cutoff']}.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Nome da tabela de contadores de escrita, compartilhado com o cache de consultas (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from query_cache import WRITE_VERSIONS
+
+# --- Tabelas (colunas além do id, na ordem de mysql_loader) ---
+# Também usadas pelo backend embutido (embedded_backend.py), que traduz os tipos
+TABLES = {
+    "vehicle_data": [
+        ("vehicle_id", "VARCHAR(20)"),
+        ("timestamp", "DATETIME"),
+        ("lat", "DOUBLE"),
+        ("lng", "DOUBLE"),
+        ("speed_kmh", "DOUBLE"),
+        ("battery_level", "DOUBLE"),
+        ("temperature_celsius", "DOUBLE"),
+        ("system_status", "ENUM('OK', 'WARNING', 'ERROR')"),
+    ],
+    "urban_events": [
+        ("event_id", "VARCHAR(36)"),
+        ("vehicle_id", "VARCHAR(20)"),
+        ("timestamp", "DATETIME"),
+        ("event_type", "VARCHAR(50)"),
+        ("description", "TEXT"),
+        ("lat", "DOUBLE"),
+        ("lng", "DOUBLE"),
+        ("severity", "ENUM('low', 'medium', 'high')"),
+        ("geohash", "CHAR(12)"),
+    ],
+    "vehicle_alerts": [
+        ("vehicle_id", "VARCHAR(20)"),
+        ("timestamp", "DATETIME"),
+        ("alert_type", "ENUM('overheating', 'battery_drain', 'error_burst')"),
+        ("value", "DOUBLE"),
+        ("threshold", "DOUBLE"),
+        ("readings", "INT"),
+        ("temperature_mean", "DOUBLE"),
+        ("battery_mean", "DOUBLE"),
+        ("speed_mean", "DOUBLE"),
+        ("errors", "INT"),
+    ],
+}
+# Alertas do detector de anomalias (anomaly_detector.py), sem partições
+ALERT_TABLE = "vehicle_alerts"
+
+
+def create_table_sql(table, id_column="id INT AUTO_INCREMENT PRIMARY KEY", column_type=None, keys=(), options=""):
+    column_type = column_type or (lambda sql_type: sql_type)
+    columns = [id_column] + [f"{name} {column_type(sql_type)}" for name, sql_type in TABLES[table]] + list(keys)
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(columns) + "\n)" + options
+
+
+# --- Partições diárias (PARTITION BY RANGE COLUMNS em timestamp) ---
+# Cada dia fica na partição pAAAAMMDD e o que passar do último dia criado cai em pmax. Expirar ou
+# apagar dados vira DROP/TRUNCATE de partições (custo proporcional ao número de partições, não
+# de linhas). O MySQL exige a coluna de partição em toda chave única, por isso a chave primária
+# das tabelas particionadas é (id, timestamp).
+PARTITIONED_TABLES = ["vehicle_data", "urban_events"]
+MAX_PARTITION = "pmax"
+PARTITIONS_AHEAD = 3  # dias futuros já criados, para as escritas em tempo real não caírem em pmax
+
+
+def upcoming_days(ahead=PARTITIONS_AHEAD, today=None):
+    today = today or date.today()
+    return [today + timedelta(days=i) for i in range(ahead + 1)]
+
+
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def partition_day(name):
+    return datetime.strptime(name[1:], "%Y%m%d").date()
+
+
+def partition_definitions(days, include_max=True):
+    parts = [f"PARTITION {partition_name(day)} VALUES LESS THAN ('{day + timedelta(days=1)}')" for day in sorted(days)]
+    if include_max:
+        parts.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return "(\n    " + ",\n    ".join(parts) + "\n)"
+
+
+def partition_by_sql(days):
+    return "\nPARTITION BY RANGE COLUMNS(timestamp) " + partition_definitions(days)
+
+
+def create_partitioned_table_sql(table, days):
+    return create_table_sql(table, "id INT AUTO_INCREMENT", keys=["PRIMARY KEY (id, timestamp)"],
+                            options=partition_by_sql(days))
+
+
+def day_partitions(cursor, table):
+    # [(dia, nome)] das partições diárias da tabela, em ordem; [] se ela não é particionada
+    cursor.execute("""
+        SELECT partition_name
+        FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (table,))
+    return [(partition_day(name), name) for (name,) in cursor.fetchall() if name != MAX_PARTITION]
+
+
+def partition_table(conn, cursor, table, days):
+    # Migração única de uma tabela criada sem partições (reescreve as linhas): um dia por
+    # partição entre o primeiro e o último timestamp gravados, mais os dias pedidos
+    cursor.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {table}")
+    first, last = cursor.fetchone()
+    days = set(days)
+    if first is not None:
+        days |= {first.date() + timedelta(days=i) for i in range((last.date() - first.date()).days + 1)}
+    cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)" + partition_by_sql(days))
+    conn.commit()
+    return len(days)
+
+
+def ensure_partitions(conn, cursor, days):
+    # Cria as partições que faltam dividindo a que hoje guarda cada dia (REORGANIZE PARTITION:
+    # só as linhas da partição dividida são movidas). Retorna ["tabela.pAAAAMMDD"] criadas.
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = day_partitions(cursor, table)
+        if not existing:
+            continue
+        known = {day for day, _ in existing}
+        splits = {}
+        for day in sorted(set(days) - known):
+            holder = next((name for existing_day, name in existing if existing_day > day), MAX_PARTITION)
+            splits.setdefault(holder, []).append(day)
+        for holder, new_days in splits.items():
+            if holder == MAX_PARTITION:
+                definitions = partition_definitions(new_days)
+            else:
+                definitions = partition_definitions(new_days + [partition_day(holder)], include_max=False)
+            cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION {holder} INTO {definitions}")
+            created.extend(f"{table}.{partition_name(day)}" for day in new_days)
+    conn.commit()
+    return created
+
+
+def expired_partitions(cursor, cutoff):
+    # {tabela: [nomes]} das partições de dias anteriores a cutoff
+    return {
+        table: [name for day, name in day_partitions(cursor, table) if day < cutoff]
+        for table in PARTITIONED_TABLES
+    }
+
+
+def drop_partitions(conn, cursor, partitions):
+    # DROP PARTITION descarta os arquivos das partições: não passa linha a linha como um DELETE
+    dropped = []
+    for table, names in partitions.items():
+        if names:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(names)}")
+            dropped.extend(f"{table}.{name}" for name in names)
+    conn.commit()
+    return dropped
+
+
+# --- Agregados por hora (downsampling antes de expirar a telemetria) ---
+# Mesmos campos dos buckets vehicle_hourly do MongoDB (rollups.py)
+ROLLUP_TABLE = "vehicle_hourly"
+ROLLUP_MEASURES = {
+    "speed_kmh": "speed",
+    "battery_level": "battery",
+    "temperature_celsius": "temperature",
+}
+STATUS_COLUMNS = {"OK": "status_ok", "WARNING": "status_warning", "ERROR": "status_error"}
+
+
+def create_rollup_table_sql():
+    columns = ["vehicle_id VARCHAR(20) NOT NULL", "hour DATETIME NOT NULL", "count INT"]
+    columns += [f"{name}_{suffix} DOUBLE" for name in ROLLUP_MEASURES.values() for suffix in ("sum", "min", "max")]
+    columns += [f"{column} INT" for column in STATUS_COLUMNS.values()]
+    columns.append("PRIMARY KEY (hour, vehicle_id)")
+    return f"CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (\n    " + ",\n    ".join(columns) + "\n)"
+
+
+def downsample_partitions(conn, cursor, names, cutoff):
+    # Agrega as leituras das partições por (veículo, hora) em vehicle_hourly. As partições são
+    # dias inteiros, então cada bucket é recalculado por completo (REPLACE substitui o anterior).
+    # Retorna quantos buckets guardam o histórico anterior a cutoff.
+    if not names:
+        return 0
+    aggregates = ["COUNT(*)"]
+    for column in ROLLUP_MEASURES:
+        aggregates += [f"SUM({column})", f"MIN({column})", f"MAX({column})"]
+    aggregates += [f"SUM(system_status = '{status}')" for status in STATUS_COLUMNS]
+    cursor.execute(f"""
+        REPLACE INTO {ROLLUP_TABLE}
+        SELECT vehicle_id, DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00') AS hour, {', '.join(aggregates)}
+        FROM vehicle_data PARTITION ({', '.join(names)})
+        GROUP BY vehicle_id, hour
+    """)
+    conn.commit()
+    cursor.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE} WHERE hour < %s", (cutoff,))
+    return cursor.fetchone()[0]
+
+
+# --- Estado atual de cada veículo ---
+# Uma linha por veículo com a leitura mais recente (mesmos campos de vehicle_data), mantida pela
+# carga com upserts condicionais (vehicle_state_mysql.py). Painéis da frota leem no máximo uma
+# linha por veículo, qualquer que seja o histórico guardado.
+STATE_TABLE = "vehicle_state"
+
+
+def create_state_table_sql():
+    columns = ["vehicle_id VARCHAR(20) NOT NULL PRIMARY KEY"]
+    columns += [f"{name} {sql_type}" for name, sql_type in TABLES["vehicle_data"] if name != "vehicle_id"]
+    columns.append("KEY idx_status (system_status)")
+    return f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (\n    " + ",\n    ".join(columns) + "\n)"
+
+
+# Contadores de escrita por tabela (query_cache.WRITE_VERSIONS): incrementados uma vez por carga, de
+# qualquer processo, para os caches de consultas dos outros processos saberem que a tabela mudou
+def create_write_versions_sql():
+    return (f"CREATE TABLE IF NOT EXISTS {WRITE_VERSIONS} (\n"
+            "    table_name VARCHAR(64) NOT NULL PRIMARY KEY,\n"
+            "    version BIGINT NOT NULL\n)")
+
+
+# --- Índices secundários alinhados às consultas de query_Mysql.py ---
+# vehicle_data: filtro por system_status + timestamp, intervalos de tempo e agrupamento por vehicle_id
+# urban_events: filtro por severity agrupando por célula geohash e junção por vehicle_id
+# vehicle_alerts: alertas de um veículo por período
+VEHICLE_INDEXES = {
+    "idx_status_timestamp": "(system_status, timestamp)",
+    "idx_vehicle_timestamp": "(vehicle_id, timestamp)",
+    "idx_timestamp": "(timestamp)",
+}
+EVENT_INDEXES = {
+    "idx_severity_geohash": "(severity, geohash)",
+    "idx_vehicle_timestamp": "(vehicle_id, timestamp)",
+}
+ALERT_INDEXES = {
+    "idx_vehicle_timestamp": "(vehicle_id, timestamp)",
+}
+MANAGED_INDEXES = {
+    "vehicle_data": VEHICLE_INDEXES,
+    "urban_events": EVENT_INDEXES,
+    ALERT_TABLE: ALERT_INDEXES,
+}
+INDEX_MODES = ["before", "after", "none"]
+
+
+def existing_indexes(cursor, table):
+    cursor.execute("""
+        SELECT DISTINCT index_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_indexes(conn, cursor):
+    # MySQL não tem CREATE INDEX IF NOT EXISTS: consulta o information_schema antes
+    created = []
+    for table, indexes in MANAGED_INDEXES.items():
+        existing = existing_indexes(cursor, table)
+        for name, columns in indexes.items():
+            if name not in existing:
+                cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+            created.append(f"{table}.{name}")
+    conn.commit()
+    return created
+
+
+def drop_indexes(conn, cursor):
+    # Usado antes de uma carga em massa quando os índices só devem ser criados depois
+    dropped = []
+    for table, indexes in MANAGED_INDEXES.items():
+        existing = existing_indexes(cursor, table)
+        for name in indexes:
+            if name in existing:
+                cursor.execute(f"DROP INDEX {name} ON {table}")
+                dropped.append(f"{table}.{name}")
+    conn.commit()
+    return dropped
+
+
+def time_report_queries(cursor, queries):
+    timings = []
+    for title, query in queries:
+        start = time.perf_counter()
+        if callable(query):
+            query(cursor)
+        else:
+            cursor.execute(query)
+            cursor.fetchall()
+        timings.append((title, time.perf_counter() - start))
+    return timings
+
+
+def print_timings(before, after):
+    print(f"{'Consulta':<55} | {'Antes (s)':>10} | {'Depois (s)':>10}")
+    for (title, seconds_before), (_, seconds_after) in zip(before, after):
+        print(f"{title:<55} | {seconds_before:>10.4f} | {seconds_after:>10.4f}")
+
+
+def main():
+    import query_Mysql
+
+    parser = argparse.ArgumentParser(description="Cria os índices usados por query_Mysql.py.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="remove os índices antes, para medir o 'antes' sem eles")
+    args = parser.parse_args()
+
+    conn = query_Mysql.connect()
+    cursor = conn.cursor()
+    queries = [(title, query) for title, query, _ in query_Mysql.REPORT_QUERIES]
+
+    if args.rebuild:
+        print(f"🗑️ Índices removidos: {', '.join(drop_indexes(conn, cursor)) or 'nenhum'}")
+
+    before = time_report_queries(cursor, queries)
+
+    start = time.perf_counter()
+    created = ensure_indexes(conn, cursor)
+    print(f"📇 Índices garantidos em {time.perf_counter() - start:.2f} segundos: {', '.join(created)}\n")
+
+    after = time_report_queries(cursor, queries)
+    print_timings(before, after)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
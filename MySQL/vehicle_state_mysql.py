@@ -0,0 +1,185 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Lotes colunares compartilhados (raiz do projeto)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from telemetry_batch import STATUS_TYPES, TIE_FIELDS, latest_readings, reading_key, vehicle_batch_to_rows
+from mysql_loader import VEHICLE_COLUMNS
+from mysql_backend import connect
+from schema_mysql import STATE_TABLE
+
+# --- Setup ---
+load_dotenv()
+
+# --- Upserts condicionais ---
+# Cada lote de telemetria grava a última leitura de cada veículo com INSERT ... ON DUPLICATE KEY
+# UPDATE: uma coluna só muda se a leitura do lote vier depois da guardada na ordem
+# (timestamp, gravidade do status, valores) de telemetry_batch.reading_key, então lotes fora de
+# ordem e workers concorrentes nunca fazem um veículo voltar no tempo, e leituras com o mesmo
+# timestamp dão o mesmo estado em qualquer ordem de escrita. O MySQL aplica as atribuições da
+# esquerda para a direita, cada uma vendo as anteriores: as colunas vão da menos para a mais
+# significativa da chave (timestamp por último), e a comparação continua decidida pela primeira
+# coluna diferente, ainda não atribuída. As linhas vão em ordem de vehicle_id, então transações
+# concorrentes travam as linhas de estado na mesma ordem e não entram em deadlock.
+STATE_COLUMNS = VEHICLE_COLUMNS
+KEY_COLUMNS = ["timestamp", "system_status"] + TIE_FIELDS
+STATUS_RANK_SQL = "FIELD({}, " + ", ".join(f"'{status}'" for status in STATUS_TYPES) + ")"
+
+
+def _key(column_sql):
+    # Chave de reading_key em SQL, uma expressão por coluna; column_sql("x") dá a expressão da coluna x
+    return [STATUS_RANK_SQL.format(column_sql(column)) if column == "system_status" else column_sql(column)
+            for column in KEY_COLUMNS]
+
+
+NEWER = f"({', '.join(_key(lambda column: f'VALUES({column})'))}) > ({', '.join(_key(lambda column: column))})"
+
+
+def _newer(column):
+    return f"{column} = IF({NEWER}, VALUES({column}), {column})"
+
+
+UPSERT_ASSIGNMENTS = ", ".join(_newer(column) for column in reversed(KEY_COLUMNS))
+
+
+def state_rows(batch):
+    # Última leitura de cada veículo de um lote colunar (telemetry_batch), como tuplas de vehicle_data
+    return vehicle_batch_to_rows(latest_readings(batch))
+
+
+def latest_rows(rows):
+    # Mesma seleção para tuplas de vehicle_data (vehicle_id, timestamp, ...): a última leitura
+    # de cada veículo (reading_key), em ordem de vehicle_id
+    latest = {}
+    for row in rows:
+        current = latest.get(row[0])
+        if current is None or reading_key(row) > reading_key(current):
+            latest[row[0]] = row
+    return [latest[vehicle_id] for vehicle_id in sorted(latest)]
+
+
+def upsert_state(cursor, rows):
+    if not rows:
+        return 0
+    placeholder = "(" + ", ".join(["%s"] * len(STATE_COLUMNS)) + ")"
+    cursor.execute(
+        f"INSERT INTO {STATE_TABLE} ({', '.join(STATE_COLUMNS)}) VALUES "
+        + ", ".join([placeholder] * len(rows))
+        + f" ON DUPLICATE KEY UPDATE {UPSERT_ASSIGNMENTS}",
+        [value for row in rows for value in row],
+    )
+    return len(rows)
+
+
+def latest_state_sql(where=""):
+    # Última leitura (reading_key) de cada veículo em vehicle_data, gravada no estado. O MAX(timestamp)
+    # por veículo vem do índice idx_vehicle_timestamp; só as leituras empatadas nele são ordenadas.
+    # `where` restringe os veículos (condição sobre vehicle_data)
+    order = ", ".join(f"{expression} DESC" for expression in _key(lambda column: f"vd.{column}")[1:])
+    return f"""
+        REPLACE INTO {STATE_TABLE} ({', '.join(STATE_COLUMNS)})
+        SELECT {', '.join(STATE_COLUMNS)}
+        FROM (
+            SELECT vd.*, ROW_NUMBER() OVER (PARTITION BY vd.vehicle_id ORDER BY {order}) AS position
+            FROM vehicle_data vd
+            JOIN (
+                SELECT vehicle_id, MAX(timestamp) AS timestamp
+                FROM vehicle_data
+                {where}
+                GROUP BY vehicle_id
+            ) latest ON latest.vehicle_id = vd.vehicle_id AND latest.timestamp = vd.timestamp
+        ) ranked
+        WHERE position = 1
+    """
+
+
+def sync_state(cursor, ids):
+    # Leituras de vehicle_data reescritas (ids): recalcula o estado dos seus veículos, já que um novo
+    # status pode mudar qual das leituras empatadas no último timestamp vale
+    if not ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(latest_state_sql(
+        f"WHERE vehicle_id IN (SELECT vehicle_id FROM vehicle_data WHERE id IN ({placeholders}))"
+    ), list(ids))
+    return cursor.rowcount
+
+
+def rebuild_state(conn, cursor):
+    # Recalcula o estado a partir da telemetria bruta (p. ex. após uma carga feita por fora do
+    # gerador)
+    cursor.execute(f"TRUNCATE TABLE {STATE_TABLE}")
+    cursor.execute(latest_state_sql())
+    conn.commit()
+    cursor.execute(f"SELECT COUNT(*) FROM {STATE_TABLE}")
+    return cursor.fetchone()[0]
+
+
+# --- Leituras (custo proporcional à frota, não ao histórico) ---
+# Cursores com dictionary=True, como os de query_Mysql.py
+def current_state(cursor, vehicle_id):
+    cursor.execute(f"SELECT * FROM {STATE_TABLE} WHERE vehicle_id = %s", (vehicle_id,))
+    return cursor.fetchone()
+
+
+def vehicles_in_status(cursor, status="ERROR"):
+    cursor.execute(f"SELECT * FROM {STATE_TABLE} WHERE system_status = %s ORDER BY vehicle_id", (status,))
+    return cursor.fetchall()
+
+
+def status_counts(cursor):
+    counts = {status: 0 for status in STATUS_TYPES}
+    cursor.execute(f"SELECT system_status, COUNT(*) AS total FROM {STATE_TABLE} GROUP BY system_status")
+    for row in cursor.fetchall():
+        counts[row["system_status"]] = row["total"]
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mostra o estado atual da frota a partir de vehicle_state.")
+    parser.add_argument("--vehicle", default=None,
+                        help="mostra o estado atual de um veículo (p. ex. V-2025-017)")
+    parser.add_argument("--status", choices=STATUS_TYPES, default="ERROR",
+                        help="lista os veículos que estão neste status agora (padrão: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recalcula o estado a partir de vehicle_data antes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect()
+    try:
+        if args.rebuild:
+            print(f"📅 Recálculo do estado iniciado em: {datetime.now().isoformat()}")
+            start = time.time()
+            vehicles = rebuild_state(conn, conn.cursor())
+            print(f"✅ Estado de {vehicles} veículos recalculado em {time.time() - start:.2f} segundos.")
+
+        cursor = conn.cursor(dictionary=True)
+        start = time.perf_counter()
+        if args.vehicle:
+            state = current_state(cursor, args.vehicle)
+            if state is None:
+                print(f"Nenhum estado gravado para {args.vehicle}.")
+            else:
+                print(f"🚗 {args.vehicle} em {state['timestamp']}: {state['system_status']} | "
+                      f"bateria {state['battery_level']:.2f}% | {state['speed_kmh']:.2f} km/h | "
+                      f"{state['temperature_celsius']:.2f} °C | ({state['lat']:.4f}, {state['lng']:.4f})")
+        else:
+            counts = status_counts(cursor)
+            print("📊 Frota agora: " + " | ".join(f"{status} {count}" for status, count in counts.items()))
+            for state in vehicles_in_status(cursor, args.status):
+                print(f"  {state['vehicle_id']}: última leitura {state['timestamp']} | "
+                      f"bateria {state['battery_level']:.2f}% | {state['temperature_celsius']:.2f} °C")
+        print(f"⏱ Lido em {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
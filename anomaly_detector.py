@@ -0,0 +1,306 @@
+import argparse
+import threading
+import time
+from datetime import datetime, UTC
+import numpy as np
+
+from telemetry_batch import VEHICLE_IDS, STATUS_TYPES
+from ingest_pipeline import run_pipeline
+
+# --- Detector parameters ---
+# Every vehicle keeps a sliding window of its last WINDOW readings. Alerts fire when a condition
+# starts to hold for a vehicle (not on every reading while it lasts).
+WINDOW = 30                 # readings per vehicle in the window
+MIN_READINGS = 10           # readings a window needs before its means and drain rate count
+OVERHEAT_CELSIUS = 75.0     # window mean of temperature_celsius
+DRAIN_PCT_PER_HOUR = 20.0   # battery % lost per hour between the oldest and the newest reading of the window
+ERROR_BURST = 8             # ERROR readings in the window
+
+ALERT_TYPES = ["overheating", "battery_drain", "error_burst"]
+ALERT_COLLECTION = "vehicle_alerts"
+MEASURES = {
+    "temperature_celsius": "temperature_mean",
+    "battery_level": "battery_mean",
+    "speed_kmh": "speed_mean",
+}
+ERROR_IDX = STATUS_TYPES.index("ERROR")
+
+
+# --- Streaming detector ---
+class AnomalyDetector:
+    # Consumes columnar telemetry batches (telemetry_batch / stream_simulator) and returns the
+    # alerts they raise as a columnar batch. Each vehicle's window lives in a (vehicles x WINDOW)
+    # array per column. A batch is laid out as [window, new readings] per vehicle and the window
+    # sums at every new reading come from one integer cumulative sum (sum at i = cs[i] - cs[i - WINDOW]), so
+    # each reading costs O(1) whatever the window size (plus one window copy per vehicle and batch),
+    # with no Python loop over readings.
+    # Readings of a vehicle are expected in time order across batches; a batch is sorted first.
+    def __init__(self, n_vehicles=len(VEHICLE_IDS), window=WINDOW, min_readings=MIN_READINGS,
+                 overheat_celsius=OVERHEAT_CELSIUS, drain_pct_per_hour=DRAIN_PCT_PER_HOUR,
+                 error_burst=ERROR_BURST):
+        self.window = window
+        self.min_readings = min_readings
+        self.thresholds = np.array([overheat_celsius, drain_pct_per_hour, error_burst], dtype=np.float64)
+        self.history = {column: np.zeros((n_vehicles, window)) for column in MEASURES}
+        self.history["timestamp"] = np.zeros((n_vehicles, window), dtype="datetime64[ms]")
+        self.history["status_idx"] = np.zeros((n_vehicles, window), dtype=np.uint8)
+        self.filled = np.zeros(n_vehicles, dtype=np.int64)
+        self.active = np.zeros((n_vehicles, len(ALERT_TYPES)), dtype=bool)
+        # process() may be called from several threads; batches must still come in time order
+        self.lock = threading.Lock()
+        self.stats = {"batches": 0, "readings": 0, "alerts": 0, "seconds": 0.0}
+
+    def process(self, batch):
+        with self.lock:
+            start = time.perf_counter()
+            alerts = self._process(batch) if len(batch["vehicle_idx"]) else empty_alerts()
+            self.stats["seconds"] += time.perf_counter() - start
+            self.stats["batches"] += 1
+            self.stats["readings"] += len(batch["vehicle_idx"])
+            self.stats["alerts"] += len(alerts["vehicle_idx"])
+        return alerts
+
+    def _process(self, batch):
+        w = self.window
+        timestamps = batch["timestamp"].astype("datetime64[ms]")
+        order = np.lexsort((timestamps, batch["vehicle_idx"]))
+        vehicles = batch["vehicle_idx"][order].astype(np.intp)
+        present, first, counts = np.unique(vehicles, return_index=True, return_counts=True)
+
+        # Positions in the extended layout: w window slots, then the new readings of the vehicle
+        sizes = w + counts
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        group = np.repeat(np.arange(len(present)), counts)
+        new_pos = starts[group] + w + np.arange(len(vehicles)) - first[group]
+        window_pos = (starts[:, None] + np.arange(w)).ravel()
+        filled = self.filled[present]
+
+        def extend(column, values):
+            ext = np.empty(sizes.sum(), dtype=self.history[column].dtype)
+            ext[window_pos] = self.history[column][present].ravel()
+            ext[new_pos] = values
+            return ext
+
+        ext = {column: extend(column, batch[column][order]) for column in MEASURES}
+        ext["status_idx"] = extend("status_idx", batch["status_idx"][order])
+        ext["timestamp"] = extend("timestamp", timestamps[order])
+        valid = np.zeros(len(ext["timestamp"]), dtype=bool)
+        valid[window_pos] = (np.arange(w) >= (w - filled)[:, None]).ravel()
+        valid[new_pos] = True
+
+        def window_sum(values):
+            # Sum over the last w slots up to each new reading (never crosses into another vehicle).
+            # Integer sums, so a difference of the running sum is exact and the result does not
+            # depend on how the stream was split into batches.
+            cs = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+            return cs[new_pos + 1] - cs[new_pos + 1 - w]
+
+        def window_mean(column):
+            # Measures carry 2 decimals (telemetry_batch / stream_simulator): summed in hundredths
+            hundredths = np.rint(np.where(valid, ext[column], 0.0) * 100).astype(np.int64)
+            return window_sum(hundredths) / (readings * 100)
+
+        readings = window_sum(valid)
+        means = {name: window_mean(column) for column, name in MEASURES.items()}
+        errors = window_sum(valid & (ext["status_idx"] == ERROR_IDX))
+
+        oldest = np.maximum(new_pos + 1 - w, (starts + w - filled)[group])
+        hours = (ext["timestamp"][new_pos] - ext["timestamp"][oldest]) / np.timedelta64(1, "h")
+        drop = ext["battery_level"][oldest] - ext["battery_level"][new_pos]
+        drain = np.divide(drop, hours, out=np.zeros_like(drop), where=hours > 0)
+
+        enough = readings >= self.min_readings
+        values = np.column_stack([means["temperature_mean"], drain, errors])
+        conditions = values >= self.thresholds
+        conditions[:, :2] &= enough[:, None]
+
+        # Rising edges: the condition holds now but not at the vehicle's previous reading
+        previous = np.empty_like(conditions)
+        previous[1:] = conditions[:-1]
+        previous[first] = self.active[present]
+        rows, types = np.nonzero(conditions & ~previous)
+        self.active[present] = conditions[first + counts - 1]
+
+        # The window of each vehicle becomes the last w slots of its extended layout
+        last_pos = (starts + counts)[:, None] + np.arange(w)
+        for column in self.history:
+            self.history[column][present] = ext[column][last_pos]
+        self.filled[present] = np.minimum(filled + counts, w)
+
+        alerts = {
+            "vehicle_idx": vehicles[rows].astype(np.int16),
+            "timestamp": ext["timestamp"][new_pos[rows]],
+            "alert_type_idx": types.astype(np.uint8),
+            "value": np.round(values[rows, types], 2),
+            "threshold": self.thresholds[types],
+            "readings": readings[rows],
+            "errors": errors[rows],
+        }
+        for name, mean in means.items():
+            alerts[name] = np.round(mean[rows], 2)
+        return alerts
+
+
+def empty_alerts():
+    alerts = {
+        "vehicle_idx": np.empty(0, dtype=np.int16),
+        "timestamp": np.empty(0, dtype="datetime64[ms]"),
+        "alert_type_idx": np.empty(0, dtype=np.uint8),
+        "value": np.empty(0),
+        "threshold": np.empty(0),
+        "readings": np.empty(0, dtype=np.int64),
+        "errors": np.empty(0, dtype=np.int64),
+    }
+    for name in MEASURES.values():
+        alerts[name] = np.empty(0)
+    return alerts
+
+
+# --- Materialization (vehicle_alerts collection / table) ---
+def _labels(values, codes):
+    return np.array(values, dtype=object)[codes].tolist()
+
+
+def alert_batch_to_rows(alerts):
+    # Same order as mysql_loader.ALERT_COLUMNS
+    return list(zip(
+        _labels(VEHICLE_IDS, alerts["vehicle_idx"]),
+        alerts["timestamp"].astype("datetime64[us]").tolist(),
+        _labels(ALERT_TYPES, alerts["alert_type_idx"]),
+        alerts["value"].tolist(),
+        alerts["threshold"].tolist(),
+        alerts["readings"].tolist(),
+        alerts["temperature_mean"].tolist(),
+        alerts["battery_mean"].tolist(),
+        alerts["speed_mean"].tolist(),
+        alerts["errors"].tolist(),
+    ))
+
+
+def alert_batch_to_docs(alerts):
+    return [
+        {
+            "vehicle_id": vehicle_id,
+            "timestamp": timestamp,
+            "alert_type": alert_type,
+            "value": value,
+            "threshold": threshold,
+            "window": {
+                "readings": readings,
+                "temperature_mean": temperature,
+                "battery_mean": battery,
+                "speed_mean": speed,
+                "errors": errors,
+            },
+        }
+        for vehicle_id, timestamp, alert_type, value, threshold, readings, temperature, battery, speed, errors
+        in alert_batch_to_rows(alerts)
+    ]
+
+
+# --- Stored readings (generate_data.py / generate_data_mysql.py --detect) ---
+# Bulk loads write each batch over the whole generated period, so their batches are not in time
+# order per vehicle and cannot go through the detector as they are written. --detect replays the
+# stored readings afterwards, read back in timestamp order, as rows of STORED_FIELDS.
+STORED_FIELDS = ["vehicle_id", "timestamp", "temperature_celsius", "battery_level", "speed_kmh", "system_status"]
+VEHICLE_INDEX = {vehicle_id: i for i, vehicle_id in enumerate(VEHICLE_IDS)}
+STATUS_INDEX = {status: i for i, status in enumerate(STATUS_TYPES)}
+
+
+def rows_to_batch(rows):
+    vehicle_ids, timestamps, temperatures, batteries, speeds, statuses = zip(*rows)
+    return {
+        "vehicle_idx": np.array([VEHICLE_INDEX[vehicle_id] for vehicle_id in vehicle_ids], dtype=np.int16),
+        "timestamp": np.array(timestamps, dtype="datetime64[ms]"),
+        "temperature_celsius": np.array(temperatures, dtype=np.float64),
+        "battery_level": np.array(batteries, dtype=np.float64),
+        "speed_kmh": np.array(speeds, dtype=np.float64),
+        "status_idx": np.array([STATUS_INDEX[status] for status in statuses], dtype=np.uint8),
+    }
+
+
+def detect_stored(chunks, write_alerts, detector=None):
+    # chunks: non-empty lists of STORED_FIELDS rows in timestamp order. Reading the next chunk
+    # overlaps with detecting and storing the alerts of the current one (ingest_pipeline).
+    detector = detector or AnomalyDetector()
+
+    def detect(rows):
+        alerts = detector.process(rows_to_batch(rows))
+        if len(alerts["vehicle_idx"]):
+            write_alerts(alerts)
+
+    return detector, run_pipeline(chunks, detect)
+
+
+# --- Throughput benchmark ---
+BENCHMARK_READINGS = 2_000_000
+BENCHMARK_BATCH_SIZES = [1_000, 10_000, 100_000]
+
+
+def simulated_stream(n_readings, seed=None):
+    # Continuous trips of the stream simulator in arrival (time) order, generated up front so
+    # only the detector is timed
+    from stream_simulator import HZ, SimulatedVehicle, merge_batches
+    rng = np.random.default_rng(seed)
+    start_time = np.datetime64(datetime.now(UTC).replace(tzinfo=None), "ms")
+    vehicles = [SimulatedVehicle(i, HZ, start_time, rng) for i in range(len(VEHICLE_IDS))]
+    per_vehicle = max(n_readings // len(vehicles), 1)
+    stream = merge_batches([vehicle.readings(0, per_vehicle) for vehicle in vehicles])
+    order = np.argsort(stream["timestamp"], kind="stable")
+    return {key: values[order] for key, values in stream.items()}
+
+
+def benchmark(stream, batch_size, **thresholds):
+    # Same stream for every batch size: the alerts do not depend on how it is split
+    n = len(stream["vehicle_idx"])
+    batches = [{key: values[start:start + batch_size] for key, values in stream.items()}
+               for start in range(0, n, batch_size)]
+    detector = AnomalyDetector(**thresholds)
+    latencies = []
+    by_type = np.zeros(len(ALERT_TYPES), dtype=np.int64)
+    for batch in batches:
+        start = time.perf_counter()
+        alerts = detector.process(batch)
+        latencies.append(time.perf_counter() - start)
+        by_type += np.bincount(alerts["alert_type_idx"], minlength=len(ALERT_TYPES))
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "batch_size": batch_size,
+        "readings": detector.stats["readings"],
+        "rate": detector.stats["readings"] / sum(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "max_ms": float(latencies_ms.max()),
+        "alerts": dict(zip(ALERT_TYPES, by_type.tolist())),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Throughput of the streaming anomaly detector on simulated telemetry (one core).")
+    parser.add_argument("--readings", type=int, default=BENCHMARK_READINGS,
+                        help="readings per run (default: %(default)s)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BENCHMARK_BATCH_SIZES,
+                        help="readings per batch, one run each (default: %(default)s)")
+    parser.add_argument("--window", type=int, default=WINDOW,
+                        help="readings per vehicle in the sliding window (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the simulated trips")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"📅 Anomaly detector benchmark started at: {datetime.now(UTC).isoformat()}")
+    print(f"🚗 {len(VEHICLE_IDS)} vehicles, window of {args.window} readings, {args.readings:,} readings per run\n")
+    print(f"{'Batch':>8} | {'Readings/s':>12} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'max (ms)':>9} | Alerts")
+    stream = simulated_stream(args.readings, args.seed)
+    for batch_size in args.batch_sizes:
+        result = benchmark(stream, batch_size, window=args.window)
+        alerts = ", ".join(f"{name} {count}" for name, count in result["alerts"].items())
+        print(f"{batch_size:>8} | {result['rate']:>12,.0f} | {result['p50_ms']:>9.2f} | "
+              f"{result['p95_ms']:>9.2f} | {result['max_ms']:>9.2f} | {alerts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+from pymongo import MongoClient, UpdateOne
+from query_cache import WRITE_VERSIONS, invalidate_tables
+
+# --- Connection pools ---
+# MONGO_POOL_SIZE is the maxPoolSize of the shared MongoClient; MYSQL_POOL_SIZE the size of
+# the MySQLConnectionPool (see MySQL/mysql_backend.py, at most 32 connections). Both can be
+# overridden in .env; they are read when the pool is created, after the script's load_dotenv().
+MONGO_POOL_SIZE = 50
+MYSQL_POOL_SIZE = 8
+
+
+def pool_size(variable, default):
+    return int(os.getenv(variable, default))
+
+
+# Report queries every backend answers by name (query.py / MySQL/query_Mysql.py)
+REPORT_QUERY_NAMES = [
+    "critical_failures_last_24h",
+    "most_severe_event_areas",
+    "average_battery_morning",
+    "avg_speed_last_7_days",
+    "events_while_system_error",
+]
+
+# Clients are cached per process: a pool must not be reused across fork, so worker
+# processes (ingest_pipeline.run_sharded) open their own on first use.
+_mongo_clients = {}
+
+
+def mongo_client(uri=None):
+    uri = uri or os.getenv("MONGO_URI")
+    key = (os.getpid(), uri)
+    if key not in _mongo_clients:
+        _mongo_clients[key] = MongoClient(uri, maxPoolSize=pool_size("MONGO_POOL_SIZE", MONGO_POOL_SIZE))
+    return _mongo_clients[key]
+
+
+# --- Write counters (query_cache.WRITE_VERSIONS) ---
+# One document per table, {_id: table, version: n}
+def bump_write_versions(db, tables):
+    for table in tables:
+        db[WRITE_VERSIONS].update_one({"_id": table}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def read_write_versions(db, tables):
+    versions = {doc["_id"]: doc["version"] for doc in db[WRITE_VERSIONS].find({"_id": {"$in": list(tables)}})}
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+# --- Backend interface ---
+class StorageBackend:
+    # insert_batch(table, records, ordered) -> records written
+    # bulk_update(table, changes) -> records modified; changes = [(record id, {field: new value})]
+    # run_query(name, **params) -> results of a named report query (REPORT_QUERY_NAMES)
+    # With a cache (query_cache.QueryCache), run_query serves repeated calls from it; every
+    # write through a backend of the same scope() drops the entries that read the table.
+    # mark_written, called once per load by the writers (generators, update and restore jobs),
+    # bumps the tables' write counters in the database, which outdates them in other processes.
+    name = None
+    cache = None
+
+    def scope(self):
+        # Identifies the database, so caches only drop entries of the one that was written
+        return (self.name,)
+
+    def insert_batch(self, table, records, ordered=False):
+        raise NotImplementedError
+
+    def bulk_update(self, table, changes):
+        raise NotImplementedError
+
+    def execute_query(self, name, **params):
+        raise NotImplementedError
+
+    def run_query(self, name, **params):
+        if self.cache is None:
+            return self.execute_query(name, **params)
+        return self.cache.fetch(self.scope(), name, params, lambda: self.execute_query(name, **params),
+                                self.write_versions)
+
+    def written(self, *tables):
+        # After every write: caches of this process
+        invalidate_tables(self.scope(), *tables)
+
+    def mark_written(self, *tables):
+        # Once per load: caches of this process and, through the write counters, of the others
+        if not tables:
+            return
+        self.bump_write_versions(tables)
+        invalidate_tables(self.scope(), *tables)
+
+    def bump_write_versions(self, tables):
+        # Backends without write counters: other processes only see the writes once the TTL runs out
+        pass
+
+    def write_versions(self, tables):
+        # Write counters of `tables` (query_cache.WRITE_VERSIONS) as a tuple, in the same order
+        return None
+
+    def close(self):
+        pass
+
+
+class MongoBackend(StorageBackend):
+    name = "mongodb"
+
+    def __init__(self, uri=None, db_name=None, cache=None):
+        self.uri = uri or os.getenv("MONGO_URI")
+        self.client = mongo_client(self.uri)
+        self.db = self.client[db_name or os.getenv("DB_NAME")]
+        self.cache = cache
+
+    def scope(self):
+        return (self.name, self.uri, self.db.name)
+
+    def insert_batch(self, table, records, ordered=False):
+        # Unordered inserts let the server apply the whole batch without stopping at the first error
+        self.db[table].insert_many(records, ordered=ordered)
+        self.written(table)
+        return len(records)
+
+    def bulk_update(self, table, changes):
+        # One round trip for all updates instead of one update_one per document
+        if not changes:
+            return 0
+        operations = [UpdateOne({"_id": record_id}, {"$set": values}) for record_id, values in changes]
+        modified = self.db[table].bulk_write(operations, ordered=False).modified_count
+        self.written(table)
+        return modified
+
+    def bump_write_versions(self, tables):
+        bump_write_versions(self.db, tables)
+
+    def write_versions(self, tables):
+        return read_write_versions(self.db, tables)
+
+    def execute_query(self, name, **params):
+        import query
+        return query.NAMED_QUERIES[name](self.db, **params)
@@ -0,0 +1,300 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, UTC
+from dotenv import load_dotenv
+import numpy as np
+
+from backends import MongoBackend, REPORT_QUERY_NAMES
+from generate_data import stream_docs, apply_random_updates
+from ingest_pipeline import BATCH_SIZE, plan_batches, resolve_seed, batch_rng
+from telemetry_batch import parse_reference_time, generated_days, local_time
+from rollups import ROLLUP_COLLECTION, ensure_rollup_indexes
+from vehicle_state import STATE_COLLECTION, ensure_state_indexes
+from schema import INDEX_MODES, ensure_indexes, drop_indexes
+
+# --- Setup ---
+load_dotenv()
+
+# --- Benchmark parameters ---
+# Every backend runs the same workloads: streaming ingest, a bulk update of random
+# documents and the five report queries. Sizes are documents per collection.
+BACKENDS = ["atlas", "local", "mysql"]
+SIZES = [10_000, 1_000_000, 10_000_000]
+WARMUP_RUNS = 2
+REPEAT_RUNS = 10
+# A full ingest round reloads the collections, so it gets fewer runs than the update and queries
+INGEST_WARMUP_RUNS = 1
+INGEST_REPEAT_RUNS = 3
+UPDATE_SIZE = 100
+PERCENTILES = [50, 95, 99]
+OUTPUT_PREFIX = "benchmark_results"
+
+LOCAL_MONGO_URI = "mongodb://localhost:27017"
+
+
+# --- Backends under test ---
+class MongoTarget:
+    def __init__(self, name, uri, db_name):
+        self.name = name
+        self.backend = MongoBackend(uri, db_name)
+        self.db = self.backend.db
+
+    def reset(self):
+        for collection in ("vehicle_data", "urban_events", ROLLUP_COLLECTION, STATE_COLLECTION):
+            self.db.drop_collection(collection)
+        ensure_rollup_indexes(self.db)
+        ensure_state_indexes(self.db)
+
+    def ensure_indexes(self):
+        ensure_indexes(self.db)
+
+    def drop_indexes(self):
+        drop_indexes(self.db)
+
+    def ingest(self, n_docs, seed, now):
+        batches = plan_batches(n_docs, BATCH_SIZE)
+        return stream_docs(self.backend, batches, batches, seed, now)
+
+    def update(self, n_updates, rng):
+        return len(apply_random_updates(self.backend, n_updates, rng))
+
+    def close(self):
+        pass
+
+
+class MySQLTarget:
+    def __init__(self, strategy):
+        # Imported here so the Mongo-only runs don't need mysql-connector-python
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "MySQL"))
+        import generate_data_mysql
+        import schema_mysql
+        from mysql_backend import MySQLBackend
+        self.generator = generate_data_mysql
+        self.schema = schema_mysql
+
+        self.name = "mysql"
+        self.load_options = {"strategy": strategy}
+        self.backend = MySQLBackend(load_options=self.load_options)
+        self.conn = generate_data_mysql.connect(database=None, allow_local_infile=strategy == "infile")
+        self.cursor = self.conn.cursor()
+        generate_data_mysql.create_schema(self.conn, self.cursor)
+
+    def reset(self):
+        self.cursor.execute("TRUNCATE TABLE vehicle_data")
+        self.cursor.execute("TRUNCATE TABLE urban_events")
+        self.cursor.execute(f"TRUNCATE TABLE {self.schema.STATE_TABLE}")
+        self.conn.commit()
+
+    def ensure_indexes(self):
+        self.schema.ensure_indexes(self.conn, self.cursor)
+
+    def drop_indexes(self):
+        self.schema.drop_indexes(self.conn, self.cursor)
+
+    def ingest(self, n_docs, seed, now):
+        # MySQL stores local DATETIMEs: the same instant as the MongoDB timestamps, in local time
+        local_now = local_time(now)
+        self.schema.ensure_partitions(self.conn, self.cursor, generated_days(local_now))
+        batches = plan_batches(n_docs, BATCH_SIZE)
+        return self.generator.stream_rows(self.conn, batches, batches, seed, local_now, self.load_options)
+
+    def update(self, n_updates, rng):
+        return len(self.generator.apply_random_updates(self.conn, self.cursor, n_updates, rng))
+
+    def close(self):
+        self.conn.close()
+
+
+def open_target(name, mysql_strategy):
+    if name == "atlas":
+        return MongoTarget(name, os.getenv("MONGO_URI"), os.getenv("DB_NAME"))
+    if name == "local":
+        return MongoTarget(name, os.getenv("LOCAL_MONGO_URI", LOCAL_MONGO_URI), os.getenv("DB_NAME"))
+    return MySQLTarget(mysql_strategy)
+
+
+# --- Measurements ---
+def summarize(latencies, units):
+    # latencies in seconds; units = items processed by all runs together (docs, rows or queries)
+    latencies_ms = np.asarray(latencies) * 1000
+    total_seconds = float(np.sum(latencies)) if latencies else 0.0
+    summary = {"runs": len(latencies)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = float(np.percentile(latencies_ms, p)) if latencies else 0.0
+    summary["mean_ms"] = float(latencies_ms.mean()) if latencies else 0.0
+    summary["throughput"] = units / total_seconds if total_seconds else 0.0
+    return summary
+
+
+def timed_runs(func, warmup, repeats):
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def ingest_round(target, size, index_mode, seed, now):
+    # One full load from empty collections: reset, ingest both collections and, in "after"
+    # mode, build the indexes. Returns (vehicle_stats, event_stats, index build seconds or None).
+    target.reset()
+    if index_mode == "before":
+        target.ensure_indexes()
+    else:
+        target.drop_indexes()
+
+    # Same seed and reference time on every backend and round: identical data to compare on
+    vehicle_stats, event_stats = target.ingest(size, seed, now)
+    build_seconds = None
+    if index_mode == "after":
+        start = time.perf_counter()
+        target.ensure_indexes()
+        build_seconds = time.perf_counter() - start
+    return vehicle_stats, event_stats, build_seconds
+
+
+def benchmark_target(target, size, index_mode, args, seed, now):
+    # Ingest is a whole round (reset + load), repeated like the other workloads: untimed warmup
+    # rounds, then timed rounds whose wall-clock times give the percentiles. The last round's
+    # data stays in place for the update and query workloads.
+    base = {"backend": target.name, "size": size, "indexes": index_mode}
+    results = []
+
+    for _ in range(args.ingest_warmup):
+        ingest_round(target, size, index_mode, seed, now)
+    rounds = [ingest_round(target, size, index_mode, seed, now) for _ in range(max(args.ingest_repeats, 1))]
+
+    for position, label in ((0, "ingest vehicle_data"), (1, "ingest urban_events")):
+        stats = [round_stats[position] for round_stats in rounds]
+        summary = summarize([s["elapsed"] for s in stats], sum(s["rows"] for s in stats))
+        results.append(dict(base, workload="ingest", operation=label, unit="rows/s", **summary))
+        # Individual batch writes of all timed rounds; throughput stays the wall-clock one
+        batch_summary = summarize([seconds for s in stats for seconds in s["batch_seconds"]], 0)
+        batch_summary["throughput"] = summary["throughput"]
+        results.append(dict(base, workload="ingest", operation=f"{label} (batch writes)", unit="rows/s",
+                            **batch_summary))
+
+    if index_mode == "after":
+        latencies = [build_seconds for _, _, build_seconds in rounds]
+        summary = summarize(latencies, len(latencies))
+        results.append(dict(base, workload="ingest", operation="build indexes", unit="builds/s", **summary))
+
+    rng = batch_rng(seed, "updates")
+    latencies = timed_runs(lambda: target.update(args.update_size, rng), args.warmup, args.repeats)
+    summary = summarize(latencies, args.update_size * len(latencies))
+    results.append(dict(base, workload="update", operation=f"bulk update x{args.update_size}",
+                        unit="docs/s", **summary))
+
+    # Named report queries, each run on a pooled connection of the backend
+    for name in REPORT_QUERY_NAMES:
+        latencies = timed_runs(lambda: target.backend.run_query(name), args.warmup, args.repeats)
+        summary = summarize(latencies, len(latencies))
+        results.append(dict(base, workload="query", operation=name, unit="queries/s", **summary))
+    return results
+
+
+# --- Output ---
+FIELDS = ["backend", "size", "indexes", "workload", "operation", "runs",
+          *[f"p{p}_ms" for p in PERCENTILES], "mean_ms", "throughput", "unit"]
+
+
+def write_results(results, prefix, metadata):
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=2, ensure_ascii=False)
+    with open(f"{prefix}.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_summary(results):
+    print(f"{'Backend':<7} | {'Size':>10} | {'Indexes':<7} | {'Operation':<55} | "
+          f"{'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | {'Throughput':>16}")
+    for r in results:
+        print(f"{r['backend']:<7} | {r['size']:>10,} | {r['indexes']:<7} | {r['operation'][:55]:<55} | "
+              f"{r['p50_ms']:>9.2f} | {r['p95_ms']:>9.2f} | {r['p99_ms']:>9.2f} | "
+              f"{r['throughput']:>10,.0f} {r['unit']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Runs the same ingest, update and report workloads against each backend.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS,
+                        help="backends to benchmark (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES,
+                        help="documents per collection for each round (default: 10k 1M 10M)")
+    parser.add_argument("--indexes", nargs="+", choices=INDEX_MODES, default=["before"],
+                        help="index modes to compare; 'after' also reports the index build time")
+    parser.add_argument("--warmup", type=int, default=WARMUP_RUNS,
+                        help="untimed runs before each update/query measurement (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=REPEAT_RUNS,
+                        help="timed runs per update/query (default: %(default)s)")
+    parser.add_argument("--ingest-warmup", type=int, default=INGEST_WARMUP_RUNS,
+                        help="untimed reset + ingest rounds before the timed ones (default: %(default)s)")
+    parser.add_argument("--ingest-repeats", type=int, default=INGEST_REPEAT_RUNS,
+                        help="timed reset + ingest rounds per size and index mode (default: %(default)s)")
+    parser.add_argument("--update-size", type=int, default=UPDATE_SIZE,
+                        help="documents per bulk update (default: %(default)s)")
+    parser.add_argument("--mysql-strategy", default="multirow",
+                        help="MySQL load strategy (see MySQL/mysql_loader.py, default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the generated data (default: fresh, saved in the metadata)")
+    parser.add_argument("--reference-time", default=None,
+                        help="ISO 8601 instant the timestamps are generated around (default: start of the run)")
+    parser.add_argument("--output", default=OUTPUT_PREFIX,
+                        help="prefix of the .json/.csv result files (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    seed = resolve_seed(args.seed)
+    now = parse_reference_time(args.reference_time) or datetime.now(UTC)
+    metadata = {
+        "started_at": datetime.now(UTC).isoformat(),
+        "warmup": args.warmup,
+        "repeats": args.repeats,
+        "ingest_warmup": args.ingest_warmup,
+        "ingest_repeats": args.ingest_repeats,
+        "update_size": args.update_size,
+        "batch_size": BATCH_SIZE,
+        "mysql_strategy": args.mysql_strategy,
+        "seed": seed,
+        "reference_time": now.isoformat(),
+    }
+    print(f"📅 Benchmark started at: {metadata['started_at']}")
+    print("⚠️ Each round replaces vehicle_data and urban_events on the selected backends.\n")
+
+    results = []
+    for name in args.backends:
+        target = None
+        try:
+            target = open_target(name, args.mysql_strategy)
+            for size in args.sizes:
+                for index_mode in args.indexes:
+                    print(f"⏱️  {name}: {size:,} docs per collection, indexes {index_mode}...")
+                    start = time.time()
+                    results.extend(benchmark_target(target, size, index_mode, args, seed, now))
+                    print(f"   done in {time.time() - start:.2f} seconds.")
+        except Exception as e:
+            # An unreachable backend should not discard the results of the others
+            print(f"⚠️ {name}: stopped ({e})")
+        finally:
+            if target is not None:
+                target.close()
+
+    write_results(results, args.output, metadata)
+    print()
+    print_summary(results)
+    print(f"\n📄 Results saved to '{args.output}.json' and '{args.output}.csv'")
+
+
+if __name__ == "__main__":
+    main()
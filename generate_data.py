@@ -1,152 +1,310 @@
-import random
-import uuid
-from datetime import datetime, timedelta, UTC
-from faker import Faker
-from pymongo import MongoClient
+import argparse
+from datetime import datetime, UTC
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
-import os
 import time
 import sys
+import numpy as np
+from telemetry_batch import (
+    STATUS_TYPES,
+    STATUS_WEIGHTS,
+    parse_reference_time,
+    generate_vehicle_batch,
+    generate_event_batch,
+    vehicle_batch_to_docs,
+    event_batch_to_docs,
+)
+from schema import (
+    INDEX_MODES,
+    TIMESERIES_GRANULARITIES,
+    TIMESERIES_GRANULARITY,
+    ensure_indexes,
+    drop_indexes,
+    create_vehicle_collection,
+    sample_docs,
+    apply_retention,
+    storage_size_mb,
+)
+from rollups import ROLLUP_COLLECTION, ensure_rollup_indexes, rollup_operations, rollup_correction
+from vehicle_state import STATE_COLLECTION, ensure_state_indexes, rebuild_state, state_operations
+from anomaly_detector import ALERT_COLLECTION, STORED_FIELDS, alert_batch_to_docs, detect_stored
+from backends import MongoBackend
+from ingest_pipeline import (
+    run_pipeline,
+    run_sharded,
+    merge_stats,
+    batch_latency_summary,
+    plan_batches,
+    iter_seeded_batches,
+    resolve_seed,
+    batch_rng,
+)
 
 # --- Setup ---
 load_dotenv()
-fake = Faker()
 
-# MongoDB config
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
-
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# MongoDB config: shared pooled client (MONGO_URI, DB_NAME and MONGO_POOL_SIZE in .env)
+backend = MongoBackend()
+db = backend.db
 vehicle_collection = db["vehicle_data"]
 events_collection = db["urban_events"]
 
 # --- Configurable parameters ---
-NUM_VEHICLES = 50
 NUM_VEHICLE_DOCS = 1000
 NUM_EVENT_DOCS = 1000
-VEHICLE_IDS = [f"V-{2025}-{str(i).zfill(3)}" for i in range(NUM_VEHICLES)]
-
-EVENT_TYPES = ["obstacle", "traffic_jam", "roadwork", "accident", "pedestrian_crossing"]
-STATUS_TYPES = ["OK", "WARNING", "ERROR"]
-SEVERITY_LEVELS = ["low", "medium", "high"]
-
-# --- Helper functions ---
-def generate_vehicle_data():
-    vehicle_id = random.choice(VEHICLE_IDS)
-    location = fake.local_latlng(country_code="BR", coords_only=True)
-    random_hour = random.randint(6, 10)
-    timestamp = datetime.now(UTC) - timedelta(days=random.randint(0, 6))
-    timestamp = timestamp.replace(hour=random_hour, minute=random.randint(0, 59), microsecond=0)
-    return {
-        "vehicle_id": vehicle_id,
-        "timestamp": timestamp,
-        "location": {
-            "lat": float(location[0]),
-            "lng": float(location[1])
-        },
-        "speed_kmh": round(random.uniform(0, 120), 2),
-        "battery_level": round(random.uniform(10, 100), 2),
-        "temperature_celsius": round(random.uniform(20, 90), 2),
-        "system_status": random.choices(STATUS_TYPES, weights=[0.6, 0.3, 0.1])[0]
-    }
-
-def generate_urban_event():
-    vehicle_id = random.choice(VEHICLE_IDS)
-    location = fake.local_latlng(country_code="BR", coords_only=True)
-    timestamp = datetime.now(UTC) - timedelta(days=random.randint(0, 6))
-    timestamp = timestamp.replace(microsecond=0)
-    return {
-        "event_id": str(uuid.uuid4()),
-        "vehicle_id": vehicle_id,
-        "timestamp": timestamp.isoformat(),
-        "event_type": random.choice(EVENT_TYPES),
-        "description": fake.sentence(nb_words=6),
-        "location": {
-            "lat": float(location[0]),
-            "lng": float(location[1])
-        },
-        "severity": random.choices(SEVERITY_LEVELS, weights=[0.2, 0.3, 0.5])[0]
-    }
+BATCH_SIZE = 10_000
+ORDERED_INSERTS = False
+
+# --- Batch builders ---
+# Vehicle batches travel as (docs, rollup operations, state operations) so the hourly buckets
+# and the latest state of each vehicle are computed from the columnar arrays, before they are
+# turned into documents. `now` is the reference time
+# of the run (fixed once, so every batch and worker generates the same days).
+def make_vehicle_docs(n, rng=None, rollups=True, now=None):
+    batch = generate_vehicle_batch(n, rng=rng, now=now)
+    return vehicle_batch_to_docs(batch), (rollup_operations(batch) if rollups else []), state_operations(batch)
+
+def count_vehicle_docs(item):
+    return len(item[0])
+
+def make_event_docs(n, rng=None, now=None):
+    return event_batch_to_docs(generate_event_batch(n, rng=rng, now=now))
+
+def insert_docs(target, collection, ordered=ORDERED_INSERTS):
+    return lambda docs: target.insert_batch(collection, docs, ordered=ordered)
+
+def insert_vehicle_docs(target, ordered=ORDERED_INSERTS):
+    # Raw telemetry first, then the hourly buckets and the vehicle states touched by the same batch
+    def write(item):
+        docs, rollup_ops, state_ops = item
+        target.insert_batch("vehicle_data", docs, ordered=ordered)
+        if rollup_ops:
+            target.db[ROLLUP_COLLECTION].bulk_write(rollup_ops, ordered=False)
+        if state_ops:
+            target.db[STATE_COLLECTION].bulk_write(state_ops, ordered=False)
+    return write
 
 # --- Update Example ---
-def update_example_data(n_updates=5):
+def apply_random_updates(target, n_updates=5, rng=None):
+    # Rewrites battery, speed and status of n sampled documents in one bulk_write, applies the
+    # matching corrections to the hourly buckets and recomputes the state of the vehicles touched
+    # (a rewritten status can change which of the readings tied on the latest timestamp is the
+    # state). Returns [(old_doc, new_values)].
+    rng = rng if rng is not None else np.random.default_rng()
+    sample_vehicles = sample_docs(target.db, n_updates, rng)
+
+    rollup_fixes = []
+    changes = []
+    for doc in sample_vehicles:
+        new_values = {
+            "battery_level": round(float(rng.uniform(10, 100)), 2),
+            "speed_kmh": round(float(rng.uniform(0, 120)), 2),
+            "system_status": STATUS_TYPES[rng.choice(len(STATUS_TYPES), p=STATUS_WEIGHTS)]
+        }
+        rollup_fixes.append(rollup_correction(doc, new_values))
+        changes.append((doc, new_values))
+
+    if changes:
+        target.bulk_update("vehicle_data", [(doc["_id"], new_values) for doc, new_values in changes])
+        target.db[ROLLUP_COLLECTION].bulk_write(rollup_fixes, ordered=False)
+        rebuild_state(target.db, [doc["vehicle_id"] for doc, _ in changes])
+        target.mark_written("vehicle_data")
+    return changes
+
+def update_example_data(n_updates=5, rng=None):
     print(f"\n🔧 Updating {n_updates} random vehicle documents...\n")
     start_update = time.time()
 
-    sample_vehicles = list(vehicle_collection.aggregate([{"$sample": {"size": n_updates}}]))
-
-    for doc in sample_vehicles:
-        vehicle_id = doc["vehicle_id"]
-        old_battery = doc["battery_level"]
-        old_speed = doc["speed_kmh"]
-        old_status = doc["system_status"]
-
-        new_battery = round(random.uniform(10, 100), 2)
-        new_speed = round(random.uniform(0, 120), 2)
-        new_status = random.choices(STATUS_TYPES, weights=[0.6, 0.3, 0.1])[0]
-
-        vehicle_collection.update_one(
-            {"_id": doc["_id"]},
-            {"$set": {
-                "battery_level": new_battery,
-                "speed_kmh": new_speed,
-                "system_status": new_status
-            }}
-        )
-
-        print(f"Vehicle: {vehicle_id}")
-        print(f"  🔸 Battery: {old_battery} → {new_battery}")
-        print(f"  🔸 Speed:   {old_speed} km/h → {new_speed} km/h")
-        print(f"  🔸 Status:  {old_status} → {new_status}\n")
+    changes = apply_random_updates(backend, n_updates, rng)
+    for doc, new_values in changes:
+        print(f"Vehicle: {doc['vehicle_id']}")
+        print(f"  🔸 Battery: {doc['battery_level']} → {new_values['battery_level']}")
+        print(f"  🔸 Speed:   {doc['speed_kmh']} km/h → {new_values['speed_kmh']} km/h")
+        print(f"  🔸 Status:  {doc['system_status']} → {new_values['system_status']}\n")
 
     end_update = time.time()
-    print(f"✅ Update completed in {end_update - start_update:.2f} seconds.\n")
+    print(f"✅ Update of {len(changes)} documents (one bulk_write) completed in {end_update - start_update:.2f} seconds.\n")
+
+# --- Parallel workers ---
+def stream_docs(target, vehicle_batches, event_batches, seed, now, ordered=ORDERED_INSERTS, rollups=True):
+    # Generates and inserts the given [(batch index, rows)] of each collection
+    vehicle_stats = run_pipeline(
+        iter_seeded_batches(vehicle_batches, lambda n, rng: make_vehicle_docs(n, rng, rollups, now),
+                            seed, "vehicle_data"),
+        insert_vehicle_docs(target, ordered),
+        count_rows=count_vehicle_docs,
+    )
+    event_stats = run_pipeline(
+        iter_seeded_batches(event_batches, lambda n, rng: make_event_docs(n, rng, now), seed, "urban_events"),
+        insert_docs(target, "urban_events", ordered),
+    )
+    return vehicle_stats, event_stats
+
+def insert_shard(worker_id, seed, vehicle_batches, event_batches, now, ordered=ORDERED_INSERTS, rollups=True):
+    # Runs in a worker process with its own connection pool; the batches bring their own generators
+    worker_backend = MongoBackend()
+    vehicle_stats, event_stats = stream_docs(worker_backend, vehicle_batches, event_batches, seed, now,
+                                             ordered, rollups)
+    return {"worker": worker_id, "vehicles": vehicle_stats, "events": event_stats}
+
+def print_insert_stats(label, stats):
+    summary = batch_latency_summary(stats)
+    print(f"{label} inserted in {stats['elapsed']:.2f} seconds "
+          f"({stats['batches']} batches, {stats['write_seconds']:.2f}s spent writing, "
+          f"{summary['rows_per_second']:,.0f} docs/s).")
+    print(f"  Batch latency: avg {summary['avg_ms']:.1f} ms | p95 {summary['p95_ms']:.1f} ms | "
+          f"max {summary['max_ms']:.1f} ms\n")
+
+def insert_data(workers=1, ordered=ORDERED_INSERTS, rollups=True, seed=None, now=None):
+    seed = resolve_seed(seed)
+    now = now or datetime.now(UTC)
+    if workers == 1:
+        print(f"Streaming {NUM_VEHICLE_DOCS} vehicle and {NUM_EVENT_DOCS} event documents in batches of {BATCH_SIZE}...")
+        vehicle_stats, event_stats = stream_docs(backend, plan_batches(NUM_VEHICLE_DOCS, BATCH_SIZE),
+                                                 plan_batches(NUM_EVENT_DOCS, BATCH_SIZE), seed, now,
+                                                 ordered, rollups)
+        print_insert_stats("Vehicle data", vehicle_stats)
+        print_insert_stats("Urban event data", event_stats)
+        return
+
+    print(f"⚙️ Sharding {NUM_VEHICLE_DOCS} vehicle and {NUM_EVENT_DOCS} event documents "
+          f"across {workers} worker processes (batches of {BATCH_SIZE})...")
+    results = run_sharded(insert_shard, workers, [NUM_VEHICLE_DOCS, NUM_EVENT_DOCS], seed,
+                          args=(now, ordered, rollups), batch_size=BATCH_SIZE)
+    for result in results:
+        print(f"  Worker {result['worker']}: "
+              f"{result['vehicles']['rows']} vehicle docs in {result['vehicles']['elapsed']:.2f}s, "
+              f"{result['events']['rows']} events in {result['events']['elapsed']:.2f}s")
+    print()
+    print_insert_stats("Vehicle data", merge_stats([r["vehicles"] for r in results]))
+    print_insert_stats("Urban event data", merge_stats([r["events"] for r in results]))
+
+# --- Anomaly detection (--detect) ---
+def stored_reading_chunks(chunk_size=BATCH_SIZE):
+    # vehicle_data in time order (timestamp index), chunk_size rows at a time
+    cursor = vehicle_collection.find({}, {field: 1 for field in STORED_FIELDS}, sort=[("timestamp", 1)],
+                                     batch_size=chunk_size, allow_disk_use=True)
+    chunk = []
+    for doc in cursor:
+        chunk.append(tuple(doc[field] for field in STORED_FIELDS))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def detect_anomalies():
+    print("🚨 Replaying vehicle_data in time order through the anomaly detector...")
+    detector, stats = detect_stored(
+        stored_reading_chunks(),
+        lambda alerts: backend.insert_batch(ALERT_COLLECTION, alert_batch_to_docs(alerts)),
+    )
+    backend.mark_written(ALERT_COLLECTION)
+    print(f"Stored {detector.stats['alerts']} alerts in '{ALERT_COLLECTION}' from {stats['rows']} readings "
+          f"in {stats['elapsed']:.2f} seconds ({detector.stats['seconds']:.2f}s spent detecting).\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate and insert fleet data into MongoDB.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes, each with its own connection (default: 1)")
+    parser.add_argument("--ordered", action="store_true", default=ORDERED_INSERTS,
+                        help="use ordered insert_many (stops at the first failed document)")
+    parser.add_argument("--indexes", choices=INDEX_MODES, default="before",
+                        help="build secondary indexes before the load, after it (faster bulk loads) or not at all")
+    parser.add_argument("--timeseries", action="store_true",
+                        help="store vehicle_data as a native time-series collection (timeField: timestamp, metaField: vehicle_id)")
+    parser.add_argument("--granularity", choices=TIMESERIES_GRANULARITIES, default=TIMESERIES_GRANULARITY,
+                        help="time-series bucket granularity (default: %(default)s)")
+    parser.add_argument("--no-rollups", dest="rollups", action="store_false",
+                        help=f"skip the incremental per-vehicle hourly buckets in '{ROLLUP_COLLECTION}'")
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="expire raw telemetry and events after N days (TTL, see retention.py)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the generated data (default: fresh, printed in the log)")
+    parser.add_argument("--reference-time", default=None,
+                        help="ISO 8601 instant the timestamps are generated around (default: now, printed in the log)")
+    parser.add_argument("--detect", action="store_true",
+                        help=f"after the load, replay vehicle_data in time order through the anomaly detector "
+                             f"and store its alerts in '{ALERT_COLLECTION}'")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # --- Redirecionar saída para arquivo ---
+    log_filename = f"log_insercao.txt"
+    original_stdout = sys.stdout
+
+    try:
+        with open(log_filename, "w", encoding="utf-8") as f:
+            sys.stdout = f
+
+            print(f"📅 Execution started at: {datetime.now(UTC).isoformat()}\n")
+
+            # Same seed and reference time -> same dataset, whatever the number of workers
+            seed = resolve_seed(args.seed)
+            now = parse_reference_time(args.reference_time) or datetime.now(UTC)
+            print(f"🎲 Seed: {seed} | reference time: {now.isoformat()}")
+            print(f"   Reproduce with --seed {seed} --reference-time {now.isoformat()}\n")
 
-# --- Redirecionar saída para arquivo ---
-log_filename = f"log_insercao.txt"
-original_stdout = sys.stdout
+            # --- Delete old data ---
+            # Dropping the collections costs the same at any size (delete_many removes document by
+            # document); indexes and retention are recreated below
+            start_delete = time.time()
+            deleted_vehicles = create_vehicle_collection(db, args.timeseries, args.granularity)
+            deleted_events = events_collection.estimated_document_count()
+            db.drop_collection("urban_events")
+            db.drop_collection(ROLLUP_COLLECTION)
+            db.drop_collection(STATE_COLLECTION)
+            db.drop_collection(ALERT_COLLECTION)
+            ensure_rollup_indexes(db)
+            ensure_state_indexes(db)
+            # Dropped collections outdate the cached query results of every process
+            backend.mark_written("vehicle_data", "urban_events")
+            end_delete = time.time()
 
-try:
-    with open(log_filename, "w", encoding="utf-8") as f:
-        sys.stdout = f
+            if args.timeseries:
+                print(f"🕒 vehicle_data is a time-series collection (granularity: {args.granularity}).")
+            print(f"Deleted {deleted_vehicles} vehicle records.")
+            print(f"Deleted {deleted_events} urban event records.")
+            print(f"🧹 Data deletion completed in {end_delete - start_delete:.2f} seconds.\n")
 
-        print(f"📅 Execution started at: {datetime.now(UTC).isoformat()}\n")
+            # --- Indexes (idempotent) ---
+            if args.indexes == "before":
+                print(f"📇 Indexes ensured: {', '.join(ensure_indexes(db))}\n")
+            elif args.indexes == "after":
+                print(f"📇 Indexes dropped until the load finishes: {', '.join(drop_indexes(db)) or 'none'}\n")
 
-        # --- Delete old data ---
-        start_delete = time.time()
-        deleted_vehicles = vehicle_collection.delete_many({})
-        deleted_events = events_collection.delete_many({})
-        end_delete = time.time()
+            # --- Generate and insert data in streaming batches ---
+            insert_data(workers=args.workers, ordered=args.ordered, rollups=args.rollups, seed=seed, now=now)
+            # One write counter bump per load, not per batch (workers included)
+            backend.mark_written("vehicle_data", "urban_events")
 
-        print(f"Deleted {deleted_vehicles.deleted_count} vehicle records.")
-        print(f"Deleted {deleted_events.deleted_count} urban event records.")
-        print(f"🧹 Data deletion completed in {end_delete - start_delete:.2f} seconds.\n")
+            if args.indexes == "after":
+                start_index = time.time()
+                created = ensure_indexes(db)
+                end_index = time.time()
+                print(f"📇 Indexes built in {end_index - start_index:.2f} seconds: {', '.join(created)}\n")
 
-        # --- Generate data ---
-        print(f"Generating {NUM_VEHICLE_DOCS} vehicle telemetry documents...")
-        vehicle_docs = [generate_vehicle_data() for _ in range(NUM_VEHICLE_DOCS)]
+            if args.retention_days:
+                print(f"⏳ Raw data expires after {args.retention_days} days: {', '.join(apply_retention(db, args.retention_days))}\n")
 
-        print(f"Generating {NUM_EVENT_DOCS} urban event documents...")
-        event_docs = [generate_urban_event() for _ in range(NUM_EVENT_DOCS)]
+            print(f"💾 vehicle_data storage size: {storage_size_mb(vehicle_collection):.2f} MB\n")
 
-        # --- Insert data with timing ---
-        print("Inserting vehicle data...")
-        start_vehicles = time.time()
-        vehicle_collection.insert_many(vehicle_docs)
-        end_vehicles = time.time()
-        print(f"Vehicle data inserted in {end_vehicles - start_vehicles:.2f} seconds.\n")
+            try:
+                update_example_data(n_updates=5, rng=batch_rng(seed, "updates"))
+            except OperationFailure as e:
+                # Older servers only allow metaField updates on time-series collections
+                print(f"⚠️ Update step skipped: {e}\n")
 
-        print("Inserting urban events...")
-        start_events = time.time()
-        events_collection.insert_many(event_docs)
-        end_events = time.time()
-        print(f"Urban event data inserted in {end_events - start_events:.2f} seconds.\n")
+            if args.detect:
+                detect_anomalies()
 
-        update_example_data(n_updates=5)
+            print("✅ Data generation and insertion completed.")
 
-        print("✅ Data generation and insertion completed.")
+    finally:
+        sys.stdout = original_stdout
+        print(f"📄 Logs saved to '{log_filename}'")
 
-finally:
-    sys.stdout = original_stdout
-    print(f"📄 Logs saved to '{log_filename}'")
+if __name__ == "__main__":
+    main()
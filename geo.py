@@ -0,0 +1,57 @@
+import numpy as np
+
+# --- Geohash grid cells ---
+# Events store a full-precision geohash; a hotspot query groups on a prefix of it, so the
+# grid resolution is chosen at query time (5 chars ~ 4.9 km x 4.9 km, 6 chars ~ 1.2 km x 0.6 km).
+GEOHASH_PRECISION = 12
+HOTSPOT_PRECISION = 5
+_BASE32 = np.frombuffer(b"0123456789bcdefghjkmnpqrstuvwxyz", dtype="S1")
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    # Vectorized geohash: quantize both axes, interleave the bits (longitude first) and
+    # read them back 5 bits per base32 character.
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    n_bits = 5 * precision
+    lng_bits = (n_bits + 1) // 2
+    lat_bits = n_bits // 2
+
+    lat_q = np.clip((lat + 90.0) / 180.0 * 2.0 ** lat_bits, 0, 2 ** lat_bits - 1).astype(np.uint64)
+    lng_q = np.clip((lng + 180.0) / 360.0 * 2.0 ** lng_bits, 0, 2 ** lng_bits - 1).astype(np.uint64)
+
+    code = np.zeros(lat.shape, dtype=np.uint64)
+    one = np.uint64(1)
+    for i in range(n_bits):
+        if i % 2 == 0:
+            bit = (lng_q >> np.uint64(lng_bits - 1 - i // 2)) & one
+        else:
+            bit = (lat_q >> np.uint64(lat_bits - 1 - i // 2)) & one
+        code = (code << one) | bit
+
+    chars = np.empty(lat.shape + (precision,), dtype="S1")
+    for c in range(precision):
+        shift = np.uint64(5 * (precision - 1 - c))
+        chars[..., c] = _BASE32[((code >> shift) & np.uint64(31)).astype(np.intp)]
+    return chars.view(f"S{precision}")[..., 0].astype(str)
+
+
+def geojson_point(lat, lng):
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def geohash_center(geohash):
+    # Center of a geohash cell, used to label hotspot cells in the reports
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = int(_BASE32.tobytes().index(char.encode()))
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bits >> shift & 1:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
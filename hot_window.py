@@ -0,0 +1,203 @@
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime, UTC
+import numpy as np
+
+from telemetry_batch import VEHICLE_IDS, STATUS_TYPES, generate_vehicle_batch, vehicle_batch_to_docs, parse_reference_time
+from ingest_pipeline import BATCH_SIZE, plan_batches, iter_seeded_batches, resolve_seed
+
+# --- Hot window parameters ---
+# The window keeps the last HOURS of readings of every vehicle at HZ readings per second, i.e.
+# HOURS * 3600 * HZ slots per vehicle (stream_simulator.py emits 1 reading/s per vehicle).
+HOURS = 24
+HZ = 1.0
+
+# One typed array per column, (vehicles x capacity). The vehicle is the row, the status an index
+# into STATUS_TYPES and the measures float32 (2 decimals up to 120 and coordinates to ~0.2 m),
+# so a reading takes 29 bytes instead of a dict with a nested location dict.
+COLUMNS = {
+    "timestamp": "datetime64[ms]",
+    "lat": np.float32,
+    "lng": np.float32,
+    "speed_kmh": np.float32,
+    "battery_level": np.float32,
+    "temperature_celsius": np.float32,
+    "status_idx": np.uint8,
+}
+ERROR_IDX = STATUS_TYPES.index("ERROR")
+
+
+def capacity_for(hours=HOURS, hz=HZ):
+    return max(int(hours * 3600 * hz), 1)
+
+
+def _now(now=None):
+    # Timestamps are naive UTC, like the generated batches
+    now = now or datetime.now(UTC)
+    return np.datetime64((now.astimezone(UTC) if now.tzinfo else now).replace(tzinfo=None), "ms")
+
+
+# --- Ring buffers ---
+class HotWindow:
+    # Fixed-size ring buffer per vehicle: once a vehicle has `capacity` readings, each new one
+    # overwrites its oldest. Appends take columnar batches (telemetry_batch / stream_simulator) and
+    # write every reading with one fancy-indexed assignment per column. Queries scan the arrays with
+    # NumPy masks; nothing is materialized per reading.
+    def __init__(self, capacity=None, n_vehicles=len(VEHICLE_IDS)):
+        self.capacity = capacity or capacity_for()
+        self.columns = {name: np.zeros((n_vehicles, self.capacity), dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.head = np.zeros(n_vehicles, dtype=np.int64)    # next slot of each vehicle
+        self.size = np.zeros(n_vehicles, dtype=np.int64)    # readings held by each vehicle
+        # Queries may run in other threads than the appends
+        self.lock = threading.Lock()
+
+    def append(self, batch):
+        with self.lock:
+            return self._append(batch)
+
+    def _append(self, batch):
+        # Readings keep their arrival order per vehicle; if a batch brings more than `capacity`
+        # readings of one vehicle, only its last `capacity` are written
+        vehicles = batch["vehicle_idx"].astype(np.intp)
+        if not len(vehicles):
+            return 0
+        order = np.argsort(vehicles, kind="stable")
+        vehicles = vehicles[order]
+        present, first, counts = np.unique(vehicles, return_index=True, return_counts=True)
+        group = np.repeat(np.arange(len(present)), counts)
+        rank = np.arange(len(vehicles)) - first[group]
+        keep = rank >= (counts - self.capacity)[group]
+        rows = vehicles[keep]
+        slots = ((self.head[present][group] + rank) % self.capacity)[keep]
+        for name, array in self.columns.items():
+            array[rows, slots] = batch[name][order][keep]
+        self.head[present] = (self.head[present] + counts) % self.capacity
+        self.size[present] = np.minimum(self.size[present] + counts, self.capacity)
+        return len(rows)
+
+    def __len__(self):
+        return int(self.size.sum())
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.columns.values()) + self.head.nbytes + self.size.nbytes
+
+    def valid(self):
+        # Slots are filled from 0 up, so the first `size` slots of each vehicle hold readings
+        return np.arange(self.capacity) < self.size[:, None]
+
+    def since(self, start, end=None):
+        mask = self.valid() & (self.columns["timestamp"] >= start)
+        if end is not None:
+            mask &= self.columns["timestamp"] <= end
+        return mask
+
+    # --- Report questions (same answers as query.py over the readings in the window) ---
+    def critical_failures_last_24h(self, now=None):
+        with self.lock:
+            mask = self.since(_now(now) - np.timedelta64(24, "h"))
+            return int(np.count_nonzero(mask & (self.columns["status_idx"] == ERROR_IDX)))
+
+    def average_battery_morning(self, now=None):
+        today = _now(now).astype("datetime64[D]")
+        with self.lock:
+            mask = self.since(today + np.timedelta64(6, "h"), today + np.timedelta64(10, "h"))
+            if not mask.any():
+                return []
+            return [{"avg_battery": float(self.columns["battery_level"][mask].mean(dtype=np.float64))}]
+
+    def avg_speed_last_7_days(self, now=None):
+        with self.lock:
+            mask = self.since(_now(now) - np.timedelta64(7, "D"))
+            counts = mask.sum(axis=1)
+            sums = np.where(mask, self.columns["speed_kmh"], 0).sum(axis=1, dtype=np.float64)
+        vehicles = np.flatnonzero(counts)
+        averages = sums[vehicles] / counts[vehicles]
+        ranking = np.argsort(-averages, kind="stable")
+        return [{"_id": VEHICLE_IDS[v], "avg_speed": float(a)} for v, a in zip(vehicles[ranking], averages[ranking])]
+
+
+# --- Per-reading cost of the current representation ---
+def dict_bytes_per_reading(docs):
+    # Deep size of the documents built by telemetry_batch.vehicle_batch_to_docs, counting shared
+    # objects (keys, vehicle ids and status labels) once, plus a list slot per document
+    seen = set()
+
+    def size(obj):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            total += sum(size(value) for value in obj.values())
+        return total
+
+    return sum(size(doc) + 8 for doc in docs) / len(docs)
+
+
+def print_report(window, now=None):
+    questions = [
+        ("1. ERROR readings in the last 24h", window.critical_failures_last_24h,
+         lambda count: f"{count} ERROR readings"),
+        ("3. Average battery between 6h and 10h today", window.average_battery_morning,
+         lambda result: f"{result[0]['avg_battery']:.2f}%" if result else "No readings in this interval."),
+        ("4. Average speed per vehicle in the last 7 days", window.avg_speed_last_7_days,
+         lambda results: f"{len(results)} vehicles, fastest {results[0]['_id']} at {results[0]['avg_speed']:.2f} km/h"
+         if results else "No readings in the last 7 days."),
+    ]
+    for title, question, describe in questions:
+        start = time.perf_counter()
+        result = question(now)
+        elapsed = time.perf_counter() - start
+        print(f"🔍 {title}: {describe(result)} (scan {elapsed * 1000:.2f} ms)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Fill the in-memory hot window with generated telemetry and answer the report questions from it.")
+    parser.add_argument("--readings", type=int, default=1_000_000,
+                        help="generated readings appended to the window (default: %(default)s)")
+    parser.add_argument("--hours", type=float, default=HOURS,
+                        help="hours of readings kept per vehicle (default: %(default)s)")
+    parser.add_argument("--hz", type=float, default=HZ,
+                        help="readings per second of each vehicle the window is sized for (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the generated data")
+    parser.add_argument("--reference-time", default=None,
+                        help="ISO 8601 instant the timestamps are generated around (default: now)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    seed = resolve_seed(args.seed)
+    now = parse_reference_time(args.reference_time) or datetime.now(UTC)
+    window = HotWindow(capacity_for(args.hours, args.hz))
+    print(f"📅 Hot window run started at: {datetime.now(UTC).isoformat()} (seed {seed})")
+    print(f"🧊 {len(VEHICLE_IDS)} vehicles x {window.capacity:,} slots ({args.hours:g} h at {args.hz:g} Hz) = "
+          f"{window.nbytes() / 2**20:,.1f} MB allocated\n")
+
+    # Same batches as generate_data.py, appended in time order like a live stream
+    start = time.perf_counter()
+    appended = 0
+    for batch in iter_seeded_batches(plan_batches(args.readings, BATCH_SIZE),
+                                     lambda n, rng: generate_vehicle_batch(n, rng=rng, now=now), seed, "vehicle_data"):
+        order = np.argsort(batch["timestamp"], kind="stable")
+        appended += window.append({name: values[order] for name, values in batch.items()})
+    elapsed = time.perf_counter() - start
+    print(f"📥 {appended:,} readings appended in {elapsed:.2f} seconds "
+          f"({appended / elapsed if elapsed else 0:,.0f} readings/s, generation included); {len(window):,} held.")
+
+    sample = vehicle_batch_to_docs(generate_vehicle_batch(1000, np.random.default_rng(seed), now=now))
+    per_dict = dict_bytes_per_reading(sample)
+    per_slot = window.nbytes() / (len(VEHICLE_IDS) * window.capacity)
+    print(f"💾 {per_slot:.0f} bytes per reading in the window vs ~{per_dict:.0f} bytes as a dict "
+          f"({per_dict / per_slot:.0f}x smaller); {len(window):,} readings as dicts ≈ "
+          f"{len(window) * per_dict / 2**20:,.0f} MB\n")
+
+    print_report(window, now)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# --- Defaults ---
+BATCH_SIZE = 10_000
+QUEUE_SIZE = 4  # batches buffered between generation and insertion
+
+_DONE = object()
+
+
+def iter_batches(total, batch_size, make_batch):
+    # Yields make_batch(n) until `total` rows were produced, never holding more than one batch
+    produced = 0
+    while produced < total:
+        n = min(batch_size, total - produced)
+        yield make_batch(n)
+        produced += n
+
+
+def run_pipeline(batches, write_batch, queue_size=QUEUE_SIZE, count_rows=len):
+    # Generation runs in a background thread and hands batches to the writer through a
+    # bounded queue, so memory stays at ~queue_size batches and the database never waits
+    # for the whole dataset to be generated.
+    pending = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for batch in batches:
+                while not stop.is_set():
+                    try:
+                        pending.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pending.put(_DONE)
+
+    stats = {"batches": 0, "rows": 0, "write_seconds": 0.0, "elapsed": 0.0, "batch_seconds": []}
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce, name="batch-producer", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            batch = pending.get()
+            if batch is _DONE:
+                break
+            start_write = time.perf_counter()
+            write_batch(batch)
+            latency = time.perf_counter() - start_write
+            stats["write_seconds"] += latency
+            stats["batch_seconds"].append(latency)
+            stats["batches"] += 1
+            stats["rows"] += count_rows(batch)
+    finally:
+        stop.set()
+        # Unblock the producer if it is waiting on a full queue
+        while producer.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    if errors:
+        raise errors[0]
+
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+# --- Reproducible batches ---
+# Batch i of a table always holds rows [i * batch_size, (i + 1) * batch_size) and draws from its
+# own generator, derived from (seed, table, i). The dataset then depends only on the seed and the
+# reference time, not on the number of workers or on which of them produced each batch.
+SEED_STREAMS = {"vehicle_data": 0, "urban_events": 1, "updates": 2}
+
+
+def resolve_seed(seed=None):
+    # No seed: fresh entropy, returned so the run can be logged and reproduced later
+    return np.random.SeedSequence(seed).entropy
+
+
+def batch_rng(seed, stream, index=0):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(SEED_STREAMS[stream], index)))
+
+
+def plan_batches(total, batch_size=BATCH_SIZE):
+    # [(batch index, rows)] covering `total` rows
+    return [(i, min(batch_size, total - start)) for i, start in enumerate(range(0, total, batch_size))]
+
+
+def iter_seeded_batches(batches, make_batch, seed, stream):
+    # Yields make_batch(n, rng) for each (index, n) of plan_batches, with the batch's own generator
+    for index, n in batches:
+        yield make_batch(n, batch_rng(seed, stream, index))
+
+
+# --- Multi-process sharding ---
+def split_rows(total, parts):
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def split_batches(batches, parts):
+    # Contiguous runs of batches, one per worker
+    bounds = np.cumsum([0] + split_rows(len(batches), parts))
+    return [batches[bounds[i]:bounds[i + 1]] for i in range(parts)]
+
+
+def run_sharded(worker, workers, totals, seed=None, args=(), batch_size=BATCH_SIZE):
+    # Calls worker(worker_id, seed, *shard_batches, *args) in a process pool, where each shard is
+    # the worker's part of plan_batches(total) for one table. All workers share the seed (batches
+    # get their generator from their index) and each is expected to open its own connection.
+    seed = resolve_seed(seed)
+    shards = [split_batches(plan_batches(total, batch_size), workers) for total in totals]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(worker, i, seed, *[shard[i] for shard in shards], *args)
+            for i in range(workers)
+        ]
+        return [future.result() for future in futures]
+
+
+def merge_stats(all_stats):
+    # Workers run side by side, so wall time is the slowest worker, not the sum
+    return {
+        "batches": sum(s["batches"] for s in all_stats),
+        "rows": sum(s["rows"] for s in all_stats),
+        "write_seconds": sum(s["write_seconds"] for s in all_stats),
+        "elapsed": max((s["elapsed"] for s in all_stats), default=0.0),
+        "batch_seconds": [latency for s in all_stats for latency in s["batch_seconds"]],
+    }
+
+
+def batch_latency_summary(stats):
+    # Per-batch write latency in milliseconds plus overall throughput
+    latencies = np.array(stats["batch_seconds"]) * 1000
+    return {
+        "avg_ms": float(latencies.mean()) if len(latencies) else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        "max_ms": float(latencies.max()) if len(latencies) else 0.0,
+        "rows_per_second": stats["rows"] / stats["elapsed"] if stats["elapsed"] else 0.0,
+    }
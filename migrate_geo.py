@@ -0,0 +1,53 @@
+from datetime import datetime, UTC
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from backends import mongo_client
+import os
+import time
+from geo import geohash_encode, geojson_point
+
+# --- Setup ---
+load_dotenv()
+
+# MongoDB config
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+client = mongo_client(MONGO_URI)
+db = client[DB_NAME]
+
+BATCH_SIZE = 10_000
+MISSING_GEO = {"geohash": {"$exists": False}}
+
+# One-shot backfill: urban events written by older versions of generate_data.py only have
+# {location: {lat, lng}}. Adds the GeoJSON point (2dsphere index) and the geohash cell
+# (hotspot query), computed client-side in batches since the server has no geohash operator.
+def backfill_collection(collection, batch_size=BATCH_SIZE):
+    pending = collection.count_documents(MISSING_GEO)
+    if not pending:
+        print(f"{collection.name}: every event already has geo fields.")
+        return 0
+
+    start = time.time()
+    updated = 0
+    while True:
+        docs = list(collection.find(MISSING_GEO, {"location": 1}).limit(batch_size))
+        if not docs:
+            break
+        lats = [doc["location"]["lat"] for doc in docs]
+        lngs = [doc["location"]["lng"] for doc in docs]
+        hashes = geohash_encode(lats, lngs).tolist()
+        result = collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"geo": geojson_point(lat, lng), "geohash": geohash}})
+            for doc, lat, lng, geohash in zip(docs, lats, lngs, hashes)
+        ], ordered=False)
+        updated += result.modified_count
+    end = time.time()
+    print(f"{collection.name}: added geo fields to {updated}/{pending} events "
+          f"in {end - start:.2f} seconds.")
+    return updated
+
+if __name__ == "__main__":
+    print(f"📅 Geo backfill started at: {datetime.now(UTC).isoformat()}\n")
+    backfill_collection(db["urban_events"])
+    print("\n✅ Geo backfill completed.")
@@ -0,0 +1,47 @@
+from datetime import datetime, UTC
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+from backends import mongo_client
+import os
+import time
+
+# --- Setup ---
+load_dotenv()
+
+# MongoDB config
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+client = mongo_client(MONGO_URI)
+db = client[DB_NAME]
+
+COLLECTIONS = ["vehicle_data", "urban_events"]
+STRING_TIMESTAMPS = {"timestamp": {"$type": "string"}}
+
+# One-shot migration: converts ISO-8601 string timestamps (written by older versions of
+# generate_data.py) into native BSON dates. The conversion runs server-side as a single
+# pipeline update per collection, so no documents travel to the client.
+def migrate_collection(collection):
+    pending = collection.count_documents(STRING_TIMESTAMPS)
+    if not pending:
+        print(f"{collection.name}: no string timestamps found.")
+        return 0
+
+    start = time.time()
+    result = collection.update_many(
+        STRING_TIMESTAMPS,
+        [{"$set": {"timestamp": {"$dateFromString": {"dateString": "$timestamp"}}}}]
+    )
+    end = time.time()
+    print(f"{collection.name}: converted {result.modified_count}/{pending} timestamps "
+          f"in {end - start:.2f} seconds.")
+    return result.modified_count
+
+if __name__ == "__main__":
+    print(f"📅 Migration started at: {datetime.now(UTC).isoformat()}\n")
+    for name in COLLECTIONS:
+        try:
+            migrate_collection(db[name])
+        except OperationFailure as e:
+            print(f"⚠️ {name}: migration failed: {e}")
+    print("\n✅ Timestamp migration completed.")
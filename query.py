@@ -1,81 +1,139 @@
+import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
-from pymongo import MongoClient
 from collections import defaultdict
+from functools import partial
 from dotenv import load_dotenv
 import os
 import sys
+from rollups import ROLLUP_COLLECTION
+from vehicle_state import STATE_COLLECTION, status_counts, vehicles_in_status
+from backends import MongoBackend
+from geo import HOTSPOT_PRECISION, geohash_center
+from query_cache import CACHE_TTL, QueryCache
+from query_plans import MongoProfiler, PlanLog
 
 # --- Setup ---
 load_dotenv()
 
-# MongoDB config
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
-
-# Conexão com o MongoDB
-client = MongoClient(MONGO_URI)
-db = client["fleet_monitoring"]
-vehicle_collection = db["vehicle_data"]
-event_collection = db["urban_events"]
+# Conexão com o MongoDB: cliente compartilhado do pool (backends.py, MONGO_POOL_SIZE no .env).
+# As consultas recebem o banco como parâmetro, então outro backend pode executá-las (run_query).
+backend = MongoBackend()
+db = backend.db
 
 # Função auxiliar para medir tempo de execução
-def run_query(title, func):
+def run_query(title, func, formatter):
     print(f"\n🔍 {title}")
     start = time.perf_counter()
-    func()
+    results = func()
     end = time.perf_counter()
+    formatter(results)
     print(f"⏱️  Tempo de execução: {end - start:.4f} segundos\n")
+    return end - start
+
+# Modo de instrumentação: além do tempo, registra o plano de cada consulta (explain
+# "executionStats") no log estruturado PLAN_LOG, uma linha JSON por consulta e execução
+PLAN_LOG = "query_plans.jsonl"
+
+def query_name(func):
+    return func.func.__name__ if isinstance(func, partial) else func.__name__
+
+def print_plan(record):
+    print(f"🧭 Plano: {record.get('examined', 0):,} docs e {record.get('keys_examined', 0):,} chaves examinados / "
+          f"{record['returned']:,} retornados | índices: {', '.join(record.get('indexes', [])) or 'nenhum'}")
+    print(f"   Servidor {record.get('server_ms', 0):.1f} ms | ida e volta {record['round_trip_ms']:.1f} ms "
+          f"({record['round_trips']}x) | cliente {record['client_ms']:.1f} ms | {record['transfer_bytes'] / 1024:.1f} KB")
+    if record.get("full_scan"):
+        print("   ⚠️ Varredura completa da coleção (COLLSCAN)")
+
+def run_query_explained(title, func, formatter, profiler, plan_log):
+    print(f"\n🔍 {title}")
+    results, record = profiler.profile(query_name(func), func)
+    formatter(results)
+    print_plan(record)
+    plan_log.write(dict(record, title=title))
+    print(f"⏱️  Tempo de execução: {record['client_ms'] / 1000:.4f} segundos\n")
+    return record["client_ms"] / 1000
+
+def timed(func):
+    start = time.perf_counter()
+    results = func()
+    return results, time.perf_counter() - start
+
+# Dispara todas as consultas ao mesmo tempo (o MongoClient é thread-safe e usa um pool de
+# conexões) e imprime os resultados na ordem original do relatório
+def run_queries_concurrently(queries, max_workers=None):
+    with ThreadPoolExecutor(max_workers=max_workers or len(queries)) as pool:
+        futures = [pool.submit(timed, func) for _, func, _ in queries]
+        elapsed_per_query = []
+        for (title, _, formatter), future in zip(queries, futures):
+            results, elapsed = future.result()
+            print(f"\n🔍 {title}")
+            formatter(results)
+            print(f"⏱️  Tempo de execução: {elapsed:.4f} segundos\n")
+            elapsed_per_query.append(elapsed)
+    return elapsed_per_query
 
 # 1. Veículos com falha crítica nas últimas 24h
-def critical_failures_last_24h():
+def critical_failures_last_24h(db=db):
     since = datetime.now(UTC) - timedelta(hours=24)
-    count = vehicle_collection.count_documents({
-        "timestamp": {"$gte": since.isoformat()},
+    return db["vehicle_data"].count_documents({
+        "timestamp": {"$gte": since},
         "system_status": "ERROR"
     })
+
+def print_critical_failures_last_24h(count):
     print(f"Total de veículos com falhas críticas nas últimas 24h: {count}")
 
 # 2. Regiões com mais eventos severos
-def most_severe_event_areas():
+# Agrupa por célula geohash (prefixo do geohash do evento): a resolução é escolhida na consulta
+# e coordenadas com ruído de GPS caem na mesma célula. O índice severity_geohash cobre a consulta.
+def most_severe_event_areas(db=db, precision=HOTSPOT_PRECISION):
     pipeline = [
         {"$match": {"severity": "high"}},
-        {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+        {"$group": {"_id": {"$substrCP": ["$geohash", 0, precision]}, "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
         {"$limit": 5}
     ]
-    results = list(event_collection.aggregate(pipeline))
+    return list(db["urban_events"].aggregate(pipeline))
+
+def print_most_severe_event_areas(results):
     print("Top 5 regiões com mais eventos severos:")
     for r in results:
-        print(f"Local: {r['_id']} - Eventos severos: {r['count']}")
+        lat, lng = geohash_center(r["_id"])
+        print(f"Célula: {r['_id']} (centro {lat:.4f}, {lng:.4f}) - Eventos severos: {r['count']}")
 
 # 3. Nível médio de bateria entre 6h e 10h
-def average_battery_morning():
+def average_battery_morning(db=db):
     today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
     start_time = today + timedelta(hours=6)
     end_time = today + timedelta(hours=10)
 
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start_time.isoformat(), "$lte": end_time.isoformat()}}},
+        {"$match": {"timestamp": {"$gte": start_time, "$lte": end_time}}},
         {"$group": {"_id": None, "avg_battery": {"$avg": "$battery_level"}}}
     ]
 
-    result = list(vehicle_collection.aggregate(pipeline))
+    return list(db["vehicle_data"].aggregate(pipeline))
+
+def print_average_battery_morning(result):
     if result:
         print(f"Nível médio de bateria entre 6h e 10h: {result[0]['avg_battery']:.2f}%")
     else:
         print("Nenhum dado encontrado nesse intervalo de tempo.")
 
 # 4. Velocidade média por veículo nos últimos 7 dias
-def avg_speed_last_7_days():
+def avg_speed_last_7_days(db=db):
     since = datetime.now(UTC) - timedelta(days=7)
     pipeline = [
-        #{"$match": {"timestamp": {"$gte": since.isoformat()}}},
         {"$match": {"timestamp": {"$gte": since}}},
         {"$group": {"_id": "$vehicle_id", "avg_speed": {"$avg": "$speed_kmh"}}},
         {"$sort": {"avg_speed": -1}}
     ]
-    results = list(vehicle_collection.aggregate(pipeline))
+    return list(db["vehicle_data"].aggregate(pipeline))
+
+def print_avg_speed_last_7_days(results):
     if results:
         total = sum(doc["avg_speed"] for doc in results)
         media_geral = total / len(results)
@@ -84,27 +142,256 @@ def avg_speed_last_7_days():
         print("Nenhum dado de velocidade encontrado nos últimos 7 dias.")
 
 # 5. Eventos com sistema do veículo em "ERROR"
-def events_while_system_error():
-    error_vehicle_ids = vehicle_collection.distinct("vehicle_id", {"system_status": "ERROR"})
-    if not error_vehicle_ids:
-        print("Nenhum veículo com status de erro encontrado.")
+# Junção "as-of": cada evento recebe o status do veículo no último instante com leituras até o
+# instante do evento. Leituras do mesmo veículo no mesmo instante valem pelo status mais grave
+# (ERROR vence), uma regra que só depende dos dados, não da ordem de inserção. São duas buscas no
+# índice vehicle_timestamp por evento: o último timestamp (uma descida no índice) e uma leitura em
+# ERROR com esse timestamp (igualdade em vehicle_id e timestamp). O pipeline só tem estágios de
+# streaming, então o servidor entrega os resultados em páginas de tamanho fixo.
+EVENT_PAGE_SIZE = 1000
+
+def iter_events_while_system_error(db=db, page_size=EVENT_PAGE_SIZE):
+    cursor = db["urban_events"].aggregate([
+        {"$sort": {"vehicle_id": 1, "timestamp": 1}},
+        {"$lookup": {
+            "from": "vehicle_data",
+            "let": {"vehicle_id": "$vehicle_id", "timestamp": "$timestamp"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$vehicle_id", "$$vehicle_id"]},
+                    {"$lte": ["$timestamp", "$$timestamp"]},
+                ]}}},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "timestamp": 1}},
+            ],
+            "as": "last_reading",
+        }},
+        {"$unwind": "$last_reading"},
+        {"$lookup": {
+            "from": "vehicle_data",
+            "let": {"vehicle_id": "$vehicle_id", "timestamp": "$last_reading.timestamp"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$vehicle_id", "$$vehicle_id"]},
+                    {"$eq": ["$timestamp", "$$timestamp"]},
+                ]}, "system_status": "ERROR"}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}},
+            ],
+            "as": "error_at_event",
+        }},
+        {"$match": {"error_at_event": {"$ne": []}}},
+        {"$project": {"_id": 0, "vehicle_id": 1, "timestamp": 1, "event_type": 1, "severity": 1}},
+    ], batchSize=page_size)
+
+    page = []
+    for event in cursor:
+        page.append(event)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def events_while_system_error(db=db):
+    return sum(len(page) for page in iter_events_while_system_error(db))
+
+def print_events_while_system_error(count):
+    if not count:
+        print("Nenhum evento ocorreu com o veículo em status de erro.")
         return
+    print(f"Total de eventos ocorridos com o veículo em status de erro: {count}")
+
+# --- Consultas sobre os agregados por veículo/hora (rollups.py) ---
+# O custo depende de veículos × horas, não do número de documentos brutos. As janelas começam
+# na hora cheia, então a primeira hora da janela pode incluir leituras alguns minutos mais antigas.
+def _hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
 
-    count = event_collection.count_documents({"vehicle_id": {"$in": error_vehicle_ids}})
-    print(f"Total de eventos relacionados a veículos com erro: {count}")
+def critical_failures_last_24h_rollup(db=db):
+    since = _hour(datetime.now(UTC) - timedelta(hours=24))
+    result = list(db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"hour": {"$gte": since}}},
+        {"$group": {"_id": None, "errors": {"$sum": "$status_counts.ERROR"}}}
+    ]))
+    return result[0]["errors"] if result else 0
+
+def average_battery_morning_rollup(db=db):
+    today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    result = list(db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"hour": {"$gte": today + timedelta(hours=6), "$lt": today + timedelta(hours=10)}}},
+        {"$group": {"_id": None, "battery_sum": {"$sum": "$battery_sum"}, "count": {"$sum": "$count"}}}
+    ]))
+    if not result or not result[0]["count"]:
+        return []
+    return [{"avg_battery": result[0]["battery_sum"] / result[0]["count"]}]
+
+def avg_speed_last_7_days_rollup(db=db):
+    since = _hour(datetime.now(UTC) - timedelta(days=7))
+    return list(db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"hour": {"$gte": since}}},
+        {"$group": {"_id": "$vehicle_id", "speed_sum": {"$sum": "$speed_sum"}, "count": {"$sum": "$count"}}},
+        {"$project": {"avg_speed": {"$divide": ["$speed_sum", "$count"]}}},
+        {"$sort": {"avg_speed": -1}}
+    ]))
+
+# Versão por hora: o evento conta se o bucket do veículo na hora do evento teve alguma leitura
+# em ERROR (busca exata no índice único hour_vehicle; requer MongoDB 5.0+ para $dateTrunc)
+def events_while_system_error_rollup(db=db):
+    result = list(db["urban_events"].aggregate([
+        {"$lookup": {
+            "from": ROLLUP_COLLECTION,
+            "let": {"vehicle_id": "$vehicle_id", "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$hour", "$$hour"]},
+                    {"$eq": ["$vehicle_id", "$$vehicle_id"]},
+                ]}}},
+                {"$project": {"_id": 0, "errors": "$status_counts.ERROR"}},
+            ],
+            "as": "bucket",
+        }},
+        {"$match": {"bucket.errors": {"$gt": 0}}},
+        {"$count": "count"},
+    ]))
+    return result[0]["count"] if result else 0
+
+# --- Estado atual da frota (vehicle_state.py) ---
+# Um documento por veículo com a leitura mais recente, mantido pela carga: o custo depende do
+# tamanho da frota, não do histórico guardado em vehicle_data
+def fleet_status_counts(db=db):
+    return status_counts(db)
+
+def print_fleet_status_counts(counts):
+    print("Veículos por status agora: " + " | ".join(f"{status}: {count}" for status, count in counts.items()))
+
+def vehicles_in_error(db=db):
+    return vehicles_in_status(db, "ERROR")
+
+def print_vehicles_in_error(results):
+    if not results:
+        print("Nenhum veículo em 'ERROR' agora.")
+    for state in results:
+        print(f"Veículo: {state['vehicle_id']} | Última leitura: {state['timestamp'].isoformat()} | "
+              f"Bateria: {state['battery_level']:.2f}% | Temperatura: {state['temperature_celsius']:.2f} °C")
+
+FLEET_STATUS_QUERIES = [
+    ("6. Status atual da frota", fleet_status_counts, print_fleet_status_counts),
+    ("7. Veículos em 'ERROR' agora", vehicles_in_error, print_vehicles_in_error),
+]
+
+# Consultas do relatório, na ordem em que aparecem no arquivo
+REPORT_QUERIES = [
+    ("1. Veículos com falhas críticas nas últimas 24h", critical_failures_last_24h, print_critical_failures_last_24h),
+    ("2. Regiões com mais eventos severos", most_severe_event_areas, print_most_severe_event_areas),
+    ("3. Nível médio de bateria entre 6h e 10h", average_battery_morning, print_average_battery_morning),
+    ("4. Velocidade média por veículo nos últimos 7 dias", avg_speed_last_7_days, print_avg_speed_last_7_days),
+    ("5. Eventos ocorridos enquanto o sistema estava em 'ERROR'", events_while_system_error, print_events_while_system_error),
+]
+
+# Mesmo relatório lendo os agregados por hora sempre que possível
+ROLLUP_REPORT_QUERIES = [
+    ("1. Veículos com falhas críticas nas últimas 24h", critical_failures_last_24h_rollup, print_critical_failures_last_24h),
+    ("2. Regiões com mais eventos severos", most_severe_event_areas, print_most_severe_event_areas),
+    ("3. Nível médio de bateria entre 6h e 10h", average_battery_morning_rollup, print_average_battery_morning),
+    ("4. Velocidade média por veículo nos últimos 7 dias", avg_speed_last_7_days_rollup, print_avg_speed_last_7_days),
+    ("5. Eventos ocorridos enquanto o sistema estava em 'ERROR'", events_while_system_error_rollup, print_events_while_system_error),
+]
+
+# Consultas nomeadas, executadas por backends.MongoBackend.run_query(nome, **parâmetros)
+NAMED_QUERIES = {func.__name__: func for _, func, _ in REPORT_QUERIES + ROLLUP_REPORT_QUERIES + FLEET_STATUS_QUERIES}
+
+# Troca a resolução das células da consulta de hotspots
+def with_hotspot_precision(queries, precision):
+    return [
+        (title, partial(most_severe_event_areas, precision=precision) if func is most_severe_event_areas else func, formatter)
+        for title, func, formatter in queries
+    ]
+
+# Consultas servidas pelo cache do backend, com a chave nome da consulta + parâmetros (p. ex. a
+# precisão dos hotspots). Inserções e atualizações feitas por backends deste processo invalidam
+# as entradas das coleções escritas; escritas de outros processos valem após o TTL.
+def through_cache(queries, backend):
+    cached = []
+    for title, func, formatter in queries:
+        params = func.keywords if isinstance(func, partial) else {}
+        cached.append((title, partial(backend.run_query, query_name(func), **params), formatter))
+    return cached
+
+def print_cache_stats(cache):
+    stats = cache.summary()
+    print(f"🗃️  Cache: {stats['hits']} acertos, {stats['misses']} faltas (taxa de acerto {stats['hit_rate']:.0%}) | "
+          f"acerto médio {stats['avg_hit_us']:.1f} µs, falta média {stats['avg_miss_ms']:.1f} ms | "
+          f"{stats['expired']} expiradas, {stats['evicted']} removidas (LRU), {stats['invalidated']} invalidadas, "
+          f"{stats['version_checks']} leituras dos contadores de escrita")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Executa as consultas analíticas e gera o relatório.")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="envia todas as consultas ao mesmo tempo usando um pool de threads")
+    parser.add_argument("--rollups", action="store_true",
+                        help=f"lê os agregados por veículo/hora de '{ROLLUP_COLLECTION}' em vez dos documentos brutos")
+    parser.add_argument("--fleet-status", action="store_true",
+                        help=f"acrescenta o status atual de cada veículo, lido de '{STATE_COLLECTION}'")
+    parser.add_argument("--hotspot-precision", type=int, default=HOTSPOT_PRECISION,
+                        help=f"caracteres de geohash por célula na consulta de hotspots (padrão: {HOTSPOT_PRECISION}, ~4,9 km)")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve consultas repetidas do cache de resultados (LRU + TTL)")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL,
+                        help="segundos que um resultado fica no cache (padrão: %(default)s)")
+    parser.add_argument("--refreshes", type=int, default=0,
+                        help="repete as consultas N vezes após o relatório, como um painel atualizando")
+    parser.add_argument("--explain", action="store_true",
+                        help=f"registra o plano de cada consulta (explain executionStats) em '{PLAN_LOG}'")
+    args = parser.parse_args()
+    if args.explain and (args.concurrent or args.cache):
+        parser.error("--explain executa as consultas em sequência e sem cache")
+    return args
 
 # Executar todas as queries
 if __name__ == "__main__":
+    args = parse_args()
+
     # Salvar a saída em um arquivo .txt
     with open("relatorio_consultas.txt", "w", encoding="utf-8") as f:
-        original_stdout = sys.stdout  
-        sys.stdout = f  
+        original_stdout = sys.stdout
+        sys.stdout = f
+
+        queries = ROLLUP_REPORT_QUERIES if args.rollups else REPORT_QUERIES
+        if args.fleet_status:
+            queries = queries + FLEET_STATUS_QUERIES
+        queries = with_hotspot_precision(queries, args.hotspot_precision)
+        if args.cache:
+            backend.cache = QueryCache(ttl=args.cache_ttl)
+            queries = through_cache(queries, backend)
+        start_report = time.perf_counter()
+        if args.explain:
+            profiler = MongoProfiler(backend.uri, db.name)
+            plan_log = PlanLog(PLAN_LOG, backend.name)
+            elapsed_per_query = [run_query_explained(title, func, formatter, profiler, plan_log)
+                                 for title, func, formatter in queries]
+            profiler.close()
+        elif args.concurrent:
+            elapsed_per_query = run_queries_concurrently(queries)
+        else:
+            elapsed_per_query = [run_query(title, func, formatter) for title, func, formatter in queries]
+        end_report = time.perf_counter()
+
+        mode = "concorrente" if args.concurrent else "sequencial"
+        if args.explain:
+            print(f"🧭 Planos registrados em '{PLAN_LOG}' (execução {plan_log.run_id})")
+        print(f"⏱️  Tempo total do relatório ({mode}): {end_report - start_report:.4f} segundos "
+              f"(soma das consultas: {sum(elapsed_per_query):.4f} segundos)")
 
-        run_query("1. Veículos com falhas críticas nas últimas 24h", critical_failures_last_24h)
-        run_query("2. Regiões com mais eventos severos", most_severe_event_areas)
-        run_query("3. Nível médio de bateria entre 6h e 10h", average_battery_morning)
-        run_query("4. Velocidade média por veículo nos últimos 7 dias", avg_speed_last_7_days)
-        run_query("5. Eventos ocorridos enquanto o sistema estava em 'ERROR'", events_while_system_error)
+        # Atualizações do painel: as mesmas consultas de novo, sem imprimir os resultados
+        for refresh in range(1, args.refreshes + 1):
+            start_refresh = time.perf_counter()
+            for _, func, _ in queries:
+                func()
+            print(f"🔁 Atualização {refresh}: {time.perf_counter() - start_refresh:.4f} segundos")
+        if args.cache:
+            print_cache_stats(backend.cache)
 
-        sys.stdout = original_stdout  
+        sys.stdout = original_stdout
     print("📄 Relatório salvo em 'relatorio_consultas.txt'")
@@ -0,0 +1,142 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# --- Defaults ---
+CACHE_SIZE = 128    # entries kept (least recently used are evicted first)
+CACHE_TTL = 30.0    # seconds an entry is served before the query runs again
+CHECK_INTERVAL = 1.0  # seconds the write counters read from the database are trusted
+
+# Tables read by each named report query (backends.REPORT_QUERY_NAMES, the rollup variants of
+# query.py and the fleet status queries). vehicle_hourly and vehicle_state are written together
+# with vehicle_data, so their queries depend on it.
+QUERY_TABLES = {
+    "critical_failures_last_24h": {"vehicle_data"},
+    "most_severe_event_areas": {"urban_events"},
+    "average_battery_morning": {"vehicle_data"},
+    "avg_speed_last_7_days": {"vehicle_data"},
+    "events_while_system_error": {"urban_events", "vehicle_data"},
+    "critical_failures_last_24h_rollup": {"vehicle_data"},
+    "average_battery_morning_rollup": {"vehicle_data"},
+    "avg_speed_last_7_days_rollup": {"vehicle_data"},
+    "events_while_system_error_rollup": {"urban_events", "vehicle_data"},
+    "fleet_status_counts": {"vehicle_data"},
+    "vehicles_in_error": {"vehicle_data"},
+}
+
+# Every cache of the process, so a write through any backend reaches all of them
+_caches = weakref.WeakSet()
+
+# Writes made by other processes (generators, update and retention jobs) reach the caches through
+# the database: it keeps one write counter per table (collection / table WRITE_VERSIONS), bumped
+# once per load, and an entry is only served while the counters of the tables its query reads are
+# still the ones it was computed with. The counters are read at most once per check_interval for
+# each set of tables, so hits in between cost no round trip; other processes' writes show up
+# within that interval.
+WRITE_VERSIONS = "write_versions"
+
+
+def invalidate_tables(scope, *tables):
+    # Called by the backends after each write: scope identifies the database written to
+    # (StorageBackend.scope()), so caches of other databases keep their entries
+    for cache in list(_caches):
+        cache.invalidate(scope, *tables)
+
+
+class QueryCache:
+    # LRU + TTL cache of report query results, keyed by (scope, query name, parameters).
+    # Writes of this process drop entries right away (invalidate_tables); writes of other
+    # processes are seen through the write counters of the backend (fetch's `versions`). Without
+    # counters, only the TTL bounds how stale an entry can get.
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic, check_interval=CHECK_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.check_interval = check_interval
+        self.entries = OrderedDict()  # key -> (expires_at, write versions, result)
+        self.checked = {}  # (scope, tables) -> (read at, write versions)
+        self.lock = threading.Lock()
+        # Bumped on every invalidation; a result computed across one is not stored
+        self.epoch = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0,
+                      "version_checks": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+        _caches.add(self)
+
+    @staticmethod
+    def key(scope, name, params):
+        return scope, name, tuple(sorted(params.items()))
+
+    def fetch(self, scope, name, params, compute, versions=None):
+        # versions(tables) -> write counters of the tables in the database (StorageBackend.write_versions)
+        start = time.perf_counter()
+        key = self.key(scope, name, params)
+        tables = sorted(QUERY_TABLES.get(name, ()))
+        # Read before computing: a write that lands during compute() leaves the entry outdated
+        current = self.write_versions(scope, tables, versions) if versions is not None and tables else None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, entry_versions, result = entry
+                if expires_at > self.clock() and entry_versions == current:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["hit_seconds"] += time.perf_counter() - start
+                    return result
+                del self.entries[key]
+                self.stats["expired" if expires_at <= self.clock() else "invalidated"] += 1
+            epoch = self.epoch
+
+        result = compute()
+
+        with self.lock:
+            if epoch == self.epoch:
+                self.entries[key] = (self.clock() + self.ttl, current, result)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.stats["evicted"] += 1
+            self.stats["misses"] += 1
+            self.stats["miss_seconds"] += time.perf_counter() - start
+        return result
+
+    def write_versions(self, scope, tables, versions):
+        key = (scope, tuple(tables))
+        with self.lock:
+            checked = self.checked.get(key)
+            if checked is not None and self.clock() - checked[0] < self.check_interval:
+                return checked[1]
+            epoch, read_at = self.epoch, self.clock()
+        current = versions(tables)
+        with self.lock:
+            if epoch == self.epoch:
+                self.checked[key] = (read_at, current)
+            self.stats["version_checks"] += 1
+        return current
+
+    def invalidate(self, scope=None, *tables):
+        # No scope: drops everything. No tables: drops every entry of the scope.
+        with self.lock:
+            self.epoch += 1
+            # Counters read before a write of this process are outdated too
+            self.checked = {key: checked for key, checked in self.checked.items()
+                            if scope is not None and key[0] != scope}
+            stale = [
+                key for key in self.entries
+                if scope is None or (key[0] == scope and (
+                    not tables or QUERY_TABLES.get(key[1], set()) & set(tables) or key[1] not in QUERY_TABLES
+                ))
+            ]
+            for key in stale:
+                del self.entries[key]
+            self.stats["invalidated"] += len(stale)
+            return len(stale)
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats, entries=len(self.entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["avg_hit_us"] = stats["hit_seconds"] / stats["hits"] * 1e6 if stats["hits"] else 0.0
+        stats["avg_miss_ms"] = stats["miss_seconds"] / stats["misses"] * 1000 if stats["misses"] else 0.0
+        return stats
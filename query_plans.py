@@ -0,0 +1,210 @@
+import json
+import re
+import time
+from datetime import datetime, UTC
+import bson
+from pymongo import MongoClient, monitoring
+
+# --- Plan capture for the report queries ---
+# Every profiled query produces one record: client time (call to result), round trips and their
+# time on the wire, server execution time from the plan, documents/rows examined versus
+# returned, indexes used, bytes transferred and whether the plan fell back to a full scan.
+# Records are appended as JSON lines (one per query, tagged with the run) to a plan log.
+
+# Command fields added by the driver that explain does not accept
+_DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+_READ_COMMANDS = {"aggregate", "find", "count", "distinct"}
+
+
+class PlanLog:
+    def __init__(self, path, backend):
+        self.path = path
+        self.backend = backend
+        self.run_id = datetime.now(UTC).isoformat()
+
+    def write(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"run_id": self.run_id, "backend": self.backend, **record},
+                               ensure_ascii=False, default=str) + "\n")
+
+
+# --- MongoDB ---
+class CommandRecorder(monitoring.CommandListener):
+    # Keeps the commands sent while a query runs (the first read command is the one explained)
+    # with their round-trip time, returned documents and reply size
+    def __init__(self):
+        self.commands = None
+
+    def start(self):
+        self.commands = []
+
+    def stop(self):
+        commands, self.commands = self.commands, None
+        return commands
+
+    def started(self, event):
+        if self.commands is not None:
+            self.commands.append({"name": event.command_name, "command": event.command, "request_id": event.request_id})
+
+    def succeeded(self, event):
+        if self.commands is None:
+            return
+        for command in self.commands:
+            if command["request_id"] == event.request_id:
+                cursor = event.reply.get("cursor", {})
+                command["seconds"] = event.duration_micros / 1e6
+                command["returned"] = len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+                command["bytes"] = len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+def _walk(node):
+    # Every sub-document of an explain output, except the plans the optimizer rejected
+    if isinstance(node, dict):
+        yield node
+        for key, value in node.items():
+            if key != "rejectedPlans":
+                yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def summarize_mongo_explain(explain):
+    # Explain output differs between find, aggregate ($cursor stage, $lookup sub-pipelines),
+    # classic and SBE engines, so the whole document is walked for the fields of interest
+    summary = {"examined": 0, "keys_examined": 0, "server_ms": 0.0, "indexes": [], "stages": [], "full_scan": False}
+    for node in _walk(explain):
+        for field, target in (("totalDocsExamined", "examined"), ("totalKeysExamined", "keys_examined")):
+            if isinstance(node.get(field), int):
+                summary[target] += node[field]
+        for field in ("executionTimeMillis", "executionTimeMillisEstimate"):
+            if isinstance(node.get(field), (int, float)):
+                summary["server_ms"] = max(summary["server_ms"], float(node[field]))
+        stage = node.get("stage")
+        if isinstance(stage, str):
+            if stage not in summary["stages"]:
+                summary["stages"].append(stage)
+            summary["full_scan"] |= stage == "COLLSCAN"
+        # $lookup stages report their sub-pipeline scans as collectionScans / indexesUsed
+        summary["full_scan"] |= bool(node.get("collectionScans"))
+        names = [node["indexName"]] if isinstance(node.get("indexName"), str) else node.get("indexesUsed", [])
+        for name in names if isinstance(names, list) else []:
+            if name not in summary["indexes"]:
+                summary["indexes"].append(name)
+    return summary
+
+
+class MongoProfiler:
+    # Own client (not the shared pool) so the listener only sees the commands of the report
+    def __init__(self, uri, db_name):
+        self.recorder = CommandRecorder()
+        self.client = MongoClient(uri, event_listeners=[self.recorder])
+        self.db = self.client[db_name]
+
+    def profile(self, name, func):
+        # Runs func(db) as the report would, then explains its first read command
+        # (explain runs the query again on the server, now with a warm cache)
+        self.recorder.start()
+        start = time.perf_counter()
+        results = func(self.db)
+        client_seconds = time.perf_counter() - start
+        commands = self.recorder.stop()
+
+        record = {
+            "query": name,
+            "client_ms": client_seconds * 1000,
+            "round_trips": len(commands),
+            "round_trip_ms": sum(c.get("seconds", 0.0) for c in commands) * 1000,
+            "returned": sum(c.get("returned", 0) for c in commands),
+            "transfer_bytes": sum(c.get("bytes", 0) for c in commands),
+        }
+        read = next((c for c in commands if c["name"] in _READ_COMMANDS), None)
+        if read is not None:
+            command = {k: v for k, v in read["command"].items() if not k.startswith("$") and k not in _DRIVER_FIELDS}
+            explain = self.db.command({"explain": command, "verbosity": "executionStats"})
+            record.update(summarize_mongo_explain(explain))
+        return results, record
+
+    def close(self):
+        self.client.close()
+
+
+# --- MySQL ---
+# EXPLAIN ANALYZE (MySQL 8.0.18+) prints an iterator tree, one "-> ..." line per node, with the
+# measured "(actual time=first..last rows=N loops=L)" of each node
+_ACTUAL = re.compile(r"\(actual time=([\d.]+)\.\.([\d.]+) rows=([\d.e+]+) loops=(\d+)\)")
+_ACCESS = re.compile(r"-> (Table scan|Index scan|Index range scan|Index lookup|Covering index lookup|"
+                     r"Covering index range scan|Covering index scan|Single-row index lookup|"
+                     r"Single-row covering index lookup|Index skip scan|Covering index skip scan) on (\S+)"
+                     r"(?: using (\w+))?")
+_FULL_SCANS = {"Table scan", "Index scan", "Covering index scan"}
+
+
+def summarize_mysql_explain(tree):
+    # Rows examined = rows read by the table/index access nodes (rows x loops); a full table or
+    # index scan on a real table (not a <temporary> one) is flagged
+    summary = {"examined": 0, "server_ms": 0.0, "indexes": [], "stages": [], "full_scan": False, "plan": tree}
+    lines = tree.splitlines()
+    if lines:
+        first = _ACTUAL.search(lines[0])
+        if first:
+            summary["server_ms"] = float(first.group(2))
+    for line in lines:
+        access = _ACCESS.search(line)
+        if access is None:
+            continue
+        method, table, index = access.groups()
+        if method not in summary["stages"]:
+            summary["stages"].append(method)
+        if index and index not in summary["indexes"]:
+            summary["indexes"].append(index)
+        if method in _FULL_SCANS and not table.startswith("<"):
+            summary["full_scan"] = True
+        actual = _ACTUAL.search(line)
+        if actual:
+            summary["examined"] += round(float(actual.group(3)) * int(actual.group(4)))
+    return summary
+
+
+class MySQLProfiler:
+    # Uses the report's connection: bytes sent by the server come from the session counter
+    def __init__(self, conn):
+        self.conn = conn
+        # The counter query itself returns a few bytes; measured once and discounted
+        first = self._bytes_sent()
+        self.overhead = self._bytes_sent() - first
+
+    def _bytes_sent(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+        value = int(cursor.fetchone()[1])
+        cursor.close()
+        return value
+
+    def profile(self, name, func, sql=None):
+        # Runs func() as the report would, then EXPLAIN ANALYZE on the same SQL (executed again)
+        before = self._bytes_sent()
+        start = time.perf_counter()
+        results = func()
+        client_seconds = time.perf_counter() - start
+        transferred = self._bytes_sent() - before - self.overhead
+
+        returned = results["total"] if isinstance(results, dict) and "total" in results else len(results)
+        record = {
+            "query": name,
+            "client_ms": client_seconds * 1000,
+            "round_trips": 1,
+            "round_trip_ms": client_seconds * 1000,
+            "returned": returned,
+            "transfer_bytes": max(transferred, 0),
+        }
+        if sql is not None:
+            cursor = self.conn.cursor()
+            cursor.execute("EXPLAIN ANALYZE " + sql.strip().rstrip(";"))
+            tree = cursor.fetchone()[0]
+            cursor.close()
+            record.update(summarize_mysql_explain(tree))
+        return results, record
@@ -0,0 +1,75 @@
+import argparse
+import time
+from datetime import datetime, timedelta, UTC
+from dotenv import load_dotenv
+
+from backends import MongoBackend
+from rollups import ROLLUP_COLLECTION, ensure_rollup_indexes, merge_rollups
+from schema import RETENTION_DAYS, TTL_INDEXES, apply_retention
+
+# --- Setup ---
+load_dotenv()
+
+# --- Retention job ---
+# Raw telemetry and events expire through TTL (schema.apply_retention), so the server removes
+# them without this job having to run. With --downsample, the hourly buckets of vehicle_hourly
+# (which never expire) are recomputed from the readings that will expire before the next run,
+# i.e. the DOWNSAMPLE_AHEAD after the cutoff: loads done with --no-rollups or writes that bypass
+# the rollups still leave an hourly history behind. Meant to run daily (cron).
+DOWNSAMPLE_AHEAD = timedelta(days=1)
+
+
+def _next_hour(moment):
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    return hour if hour == moment else hour + timedelta(hours=1)
+
+
+def run_retention(db, days=RETENTION_DAYS, downsample=False, now=None):
+    now = now or datetime.now(UTC)
+    cutoff = now - timedelta(days=days)
+    stats = {"cutoff": cutoff, "applied": apply_retention(db, days), "downsample_seconds": 0.0}
+
+    # Readings older than the cutoff may already be partly gone: the window starts at the next
+    # full hour, whose bucket the TTL monitor has not touched yet
+    if downsample:
+        ensure_rollup_indexes(db)
+        start_time = time.perf_counter()
+        start = _next_hour(cutoff)
+        merge_rollups(db, start, start + DOWNSAMPLE_AHEAD)
+        stats["downsampled"] = (start, start + DOWNSAMPLE_AHEAD)
+        stats["downsample_seconds"] = time.perf_counter() - start_time
+
+    stats["pending"] = {
+        name: db[name].count_documents({"timestamp": {"$lt": cutoff}}) for name in TTL_INDEXES
+    }
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expire old telemetry and events from MongoDB (TTL).")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS,
+                        help="days of raw data kept (default: %(default)s)")
+    parser.add_argument("--downsample", action="store_true",
+                        help=f"recompute the '{ROLLUP_COLLECTION}' buckets of the readings about to expire")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    backend = MongoBackend()
+    print(f"📅 Retention started at: {datetime.now(UTC).isoformat()} (keeping {args.days} days)")
+
+    start = time.time()
+    stats = run_retention(backend.db, args.days, args.downsample)
+    print(f"⏳ Expiry set on: {', '.join(stats['applied'])}")
+    if args.downsample:
+        first, last = stats["downsampled"]
+        print(f"📊 Hourly buckets recomputed for {first.isoformat()} → {last.isoformat()} "
+              f"in {stats['downsample_seconds']:.2f} seconds.")
+    for name, count in stats["pending"].items():
+        print(f"🗑️ {name}: {count} documents older than {stats['cutoff'].isoformat()} left for the TTL monitor.")
+    print(f"✅ Retention completed in {time.time() - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from datetime import datetime, UTC
+from pymongo import ASCENDING, UpdateOne
+from dotenv import load_dotenv
+import numpy as np
+import os
+import time
+from telemetry_batch import VEHICLE_IDS, STATUS_TYPES
+from backends import mongo_client
+
+# --- Per-vehicle, per-hour buckets kept next to vehicle_data ---
+# {vehicle_id, hour, count, <m>_sum, <m>_min, <m>_max, status_counts: {OK, WARNING, ERROR}}
+ROLLUP_COLLECTION = "vehicle_hourly"
+ROLLUP_MEASURES = {
+    "speed_kmh": "speed",
+    "battery_level": "battery",
+    "temperature_celsius": "temperature",
+}
+
+
+def ensure_rollup_indexes(db):
+    db[ROLLUP_COLLECTION].create_index(
+        [("hour", ASCENDING), ("vehicle_id", ASCENDING)], name="hour_vehicle", unique=True
+    )
+
+
+def rollup_operations(batch):
+    # Groups a columnar telemetry batch (telemetry_batch.generate_vehicle_batch) by
+    # (vehicle, hour) with NumPy and returns one upsert per bucket touched by the batch.
+    n_vehicles = len(VEHICLE_IDS)
+    hour_codes = batch["timestamp"].astype("datetime64[h]").astype(np.int64)
+    keys = hour_codes * n_vehicles + batch["vehicle_idx"]
+    bucket_keys, inverse = np.unique(keys, return_inverse=True)
+    n_buckets = len(bucket_keys)
+
+    counts = np.bincount(inverse, minlength=n_buckets)
+    measures = {}
+    for column, name in ROLLUP_MEASURES.items():
+        values = batch[column]
+        mins = np.full(n_buckets, np.inf)
+        maxs = np.full(n_buckets, -np.inf)
+        np.minimum.at(mins, inverse, values)
+        np.maximum.at(maxs, inverse, values)
+        measures[name] = (np.bincount(inverse, weights=values, minlength=n_buckets), mins, maxs)
+
+    status_counts = np.zeros((n_buckets, len(STATUS_TYPES)), dtype=np.int64)
+    np.add.at(status_counts, (inverse, batch["status_idx"]), 1)
+
+    hours = (bucket_keys // n_vehicles).astype("datetime64[h]").astype("datetime64[us]").tolist()
+    vehicle_ids = [VEHICLE_IDS[i] for i in (bucket_keys % n_vehicles).tolist()]
+
+    operations = []
+    for b in range(n_buckets):
+        inc = {"count": int(counts[b])}
+        set_min, set_max = {}, {}
+        for name, (sums, mins, maxs) in measures.items():
+            inc[f"{name}_sum"] = float(sums[b])
+            set_min[f"{name}_min"] = float(mins[b])
+            set_max[f"{name}_max"] = float(maxs[b])
+        for s, status in enumerate(STATUS_TYPES):
+            if status_counts[b, s]:
+                inc[f"status_counts.{status}"] = int(status_counts[b, s])
+        operations.append(UpdateOne(
+            {"hour": hours[b], "vehicle_id": vehicle_ids[b]},
+            {"$inc": inc, "$min": set_min, "$max": set_max},
+            upsert=True
+        ))
+    return operations
+
+
+def rollup_correction(old_doc, new_values):
+    # Keeps the bucket of an updated telemetry document in sync: sums and status counts
+    # move by the delta. Min/max can only widen, so they stay an envelope of every value
+    # the bucket has seen.
+    hour = old_doc["timestamp"].replace(minute=0, second=0, microsecond=0)
+    inc, set_min, set_max = {}, {}, {}
+    for column, name in ROLLUP_MEASURES.items():
+        if column in new_values:
+            inc[f"{name}_sum"] = new_values[column] - old_doc[column]
+            set_min[f"{name}_min"] = new_values[column]
+            set_max[f"{name}_max"] = new_values[column]
+    new_status = new_values.get("system_status", old_doc["system_status"])
+    if new_status != old_doc["system_status"]:
+        inc[f"status_counts.{old_doc['system_status']}"] = -1
+        inc[f"status_counts.{new_status}"] = 1
+
+    update = {"$inc": inc}
+    if set_min:
+        update["$min"] = set_min
+        update["$max"] = set_max
+    return UpdateOne({"hour": hour, "vehicle_id": old_doc["vehicle_id"]}, update)
+
+
+def rebuild_rollups(db):
+    # Recomputes every bucket from raw telemetry on the server (e.g. after a load done
+    # without rollups). Requires MongoDB 5.0+ for $dateTrunc.
+    db.drop_collection(ROLLUP_COLLECTION)
+    ensure_rollup_indexes(db)
+    return merge_rollups(db)
+
+
+def merge_rollups(db, start=None, end=None):
+    # Recomputes the buckets of the raw telemetry in [start, end) and merges them into
+    # vehicle_hourly, replacing the ones already there. Both bounds must fall on an hour, so
+    # every recomputed bucket sees all of its readings.
+    match = {}
+    if start is not None:
+        match["$gte"] = start
+    if end is not None:
+        match["$lt"] = end
+    group = {
+        "_id": {
+            "vehicle_id": "$vehicle_id",
+            "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+        },
+        "count": {"$sum": 1},
+    }
+    for column, name in ROLLUP_MEASURES.items():
+        group[f"{name}_sum"] = {"$sum": f"${column}"}
+        group[f"{name}_min"] = {"$min": f"${column}"}
+        group[f"{name}_max"] = {"$max": f"${column}"}
+    for status in STATUS_TYPES:
+        group[f"status_{status}"] = {"$sum": {"$cond": [{"$eq": ["$system_status", status]}, 1, 0]}}
+
+    project = {"_id": 0, "vehicle_id": "$_id.vehicle_id", "hour": "$_id.hour", "count": 1}
+    for name in ROLLUP_MEASURES.values():
+        for suffix in ("sum", "min", "max"):
+            project[f"{name}_{suffix}"] = 1
+    project["status_counts"] = {status: f"$status_{status}" for status in STATUS_TYPES}
+
+    db["vehicle_data"].aggregate([
+        *([{"$match": {"timestamp": match}}] if match else []),
+        {"$group": group},
+        {"$project": project},
+        {"$merge": {"into": ROLLUP_COLLECTION, "on": ["hour", "vehicle_id"]}},
+    ])
+    return db[ROLLUP_COLLECTION].estimated_document_count()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    client = mongo_client()
+    db = client[os.getenv("DB_NAME")]
+
+    print(f"📅 Rollup rebuild started at: {datetime.now(UTC).isoformat()}")
+    start = time.time()
+    buckets = rebuild_rollups(db)
+    print(f"✅ {buckets} hourly buckets rebuilt in {time.time() - start:.2f} seconds.")
@@ -0,0 +1,217 @@
+import argparse
+import time
+from datetime import timedelta
+import numpy as np
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+
+# --- Secondary indexes matching the query.py workload ---
+# vehicle_data: filtered on system_status + timestamp, timestamp ranges, grouped by vehicle_id
+# urban_events: filtered on severity and grouped by geohash cell, joined on vehicle_id;
+# geo (GeoJSON point) backs radius/polygon queries with $geoWithin / $nearSphere
+# vehicle_alerts: alerts of a vehicle over a period (anomaly_detector.py)
+VEHICLE_INDEXES = {
+    "status_timestamp": [("system_status", ASCENDING), ("timestamp", ASCENDING)],
+    "vehicle_timestamp": [("vehicle_id", ASCENDING), ("timestamp", ASCENDING)],
+    "timestamp": [("timestamp", ASCENDING)],
+}
+EVENT_INDEXES = {
+    "severity_geohash": [("severity", ASCENDING), ("geohash", ASCENDING)],
+    "geo": [("geo", GEOSPHERE)],
+    "vehicle_timestamp": [("vehicle_id", ASCENDING), ("timestamp", ASCENDING)],
+}
+ALERT_INDEXES = {
+    "vehicle_timestamp": [("vehicle_id", ASCENDING), ("timestamp", ASCENDING)],
+}
+INDEX_MODES = ["before", "after", "none"]
+
+# --- Time-series collection for vehicle telemetry ---
+TIMESERIES_GRANULARITIES = ["seconds", "minutes", "hours"]
+TIMESERIES_GRANULARITY = "hours"
+
+
+def is_timeseries(db, name="vehicle_data"):
+    return "timeseries" in db[name].options()
+
+
+def create_vehicle_collection(db, timeseries=False, granularity=TIMESERIES_GRANULARITY):
+    # Drops vehicle_data and recreates it empty, as a native time-series collection if requested.
+    # Returns how many documents were removed.
+    removed = db["vehicle_data"].estimated_document_count()
+    db.drop_collection("vehicle_data")
+    if timeseries:
+        db.create_collection("vehicle_data", timeseries={
+            "timeField": "timestamp",
+            "metaField": "vehicle_id",
+            "granularity": granularity,
+        })
+    else:
+        db.create_collection("vehicle_data")
+    return removed
+
+
+# --- Retention ---
+# Raw telemetry and events expire after `days`. A time-series vehicle_data expires whole buckets
+# (collection-level expireAfterSeconds); regular collections get a TTL on their timestamp index,
+# whose documents the server's TTL monitor removes in the background (about once a minute).
+RETENTION_DAYS = 30
+TTL_INDEXES = {
+    "vehicle_data": "timestamp",
+    "urban_events": "timestamp",
+}
+
+
+def apply_retention(db, days=RETENTION_DAYS):
+    # Idempotent: creates the TTL indexes or changes their expiry. Returns what was configured.
+    seconds = int(days * 86400)
+    applied = []
+    for name, index in TTL_INDEXES.items():
+        collection = db[name]
+        if is_timeseries(db, name):
+            db.command("collMod", name, expireAfterSeconds=seconds)
+            applied.append(f"{name} (time-series buckets)")
+        elif index in collection.index_information():
+            db.command("collMod", name, index={"name": index, "expireAfterSeconds": seconds})
+            applied.append(f"{name}.{index}")
+        else:
+            collection.create_index([("timestamp", ASCENDING)], name=index, expireAfterSeconds=seconds)
+            applied.append(f"{name}.{index}")
+    return applied
+
+
+def storage_size_mb(collection):
+    stats = next(collection.aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    return stats.get("storageSize", 0) / (1024 * 1024)
+
+
+def _managed_indexes(db):
+    return [
+        (db["vehicle_data"], VEHICLE_INDEXES),
+        (db["urban_events"], EVENT_INDEXES),
+        (db["vehicle_alerts"], ALERT_INDEXES),
+    ]
+
+
+def ensure_indexes(db):
+    # create_index is a no-op when an index with the same name and keys already exists; an index
+    # that only differs in its options (the TTL set by apply_retention) is kept as it is
+    created = []
+    for collection, indexes in _managed_indexes(db):
+        existing_names = set(collection.index_information())
+        for name, keys in indexes.items():
+            if name not in existing_names:
+                collection.create_index(keys, name=name)
+            created.append(f"{collection.name}.{name}")
+    return created
+
+
+def drop_indexes(db):
+    # Used before a bulk load when indexes should only be built afterwards
+    dropped = []
+    for collection, indexes in _managed_indexes(db):
+        existing_names = set(collection.index_information())
+        for name in indexes:
+            if name in existing_names:
+                collection.drop_index(name)
+                dropped.append(f"{collection.name}.{name}")
+    return dropped
+
+
+# --- Seeded sampling of vehicle_data ---
+# Each pick is a seeded probe on the vehicle_timestamp index: a vehicle, an instant between the
+# first and last reading and a direction, resolved to the vehicle's nearest reading at or after
+# (or at or before) that instant, or to the nearest one on the other side when there is none;
+# readings with that same timestamp are ordered by their values. Every probe is a few index
+# seeks, whatever the size of the collection, and the picks depend only on the seed and the data,
+# not on the storage order or the _ids the server assigned ($sample would pick other documents
+# on every run).
+PROBES_PER_DOC = 10  # probes per requested document before giving up on finding new ones
+
+
+def _value_key(doc):
+    location = doc.get("location") or {}
+    return (doc["speed_kmh"], doc["battery_level"], doc["temperature_celsius"], doc["system_status"],
+            location.get("lat", 0.0), location.get("lng", 0.0))
+
+
+def _edge_timestamp(collection, direction):
+    doc = next(collection.find({}, {"_id": 0, "timestamp": 1}).sort("timestamp", direction).limit(1), None)
+    return doc["timestamp"] if doc is not None else None
+
+
+def _nearest_reading(collection, vehicle_id, timestamp, backwards):
+    direction = DESCENDING if backwards else ASCENDING
+    doc = next(collection.find({"vehicle_id": vehicle_id, "timestamp": {"$lte" if backwards else "$gte": timestamp}},
+                               {"_id": 0, "timestamp": 1})
+               .sort([("vehicle_id", direction), ("timestamp", direction)]).limit(1), None)
+    return doc["timestamp"] if doc is not None else None
+
+
+def sample_docs(db, n, rng):
+    # Up to n distinct documents of vehicle_data (fewer if the collection is smaller, or once
+    # PROBES_PER_DOC * n probes keep landing on documents already picked)
+    collection = db["vehicle_data"]
+    vehicles = sorted(collection.distinct("vehicle_id"))
+    first, last = _edge_timestamp(collection, ASCENDING), _edge_timestamp(collection, DESCENDING)
+    if not vehicles or first is None or n <= 0:
+        return []
+    span_ms = int((last - first).total_seconds() * 1000)
+    picked, seen = [], set()
+    for _ in range(n * PROBES_PER_DOC):
+        vehicle_id = vehicles[rng.integers(len(vehicles))]
+        probe = first + timedelta(milliseconds=int(rng.integers(span_ms + 1)))
+        backwards = bool(rng.integers(2))
+        timestamp = _nearest_reading(collection, vehicle_id, probe, backwards) \
+            or _nearest_reading(collection, vehicle_id, probe, not backwards)
+        ties = sorted(collection.find({"vehicle_id": vehicle_id, "timestamp": timestamp}), key=_value_key)
+        doc = ties[rng.integers(len(ties))]
+        if doc["_id"] in seen:
+            continue
+        seen.add(doc["_id"])
+        picked.append(doc)
+        if len(picked) == n:
+            break
+    return picked
+
+
+def time_report_queries(queries):
+    # queries: query.REPORT_QUERIES entries; results are discarded, only the time is kept
+    timings = []
+    for title, func, _ in queries:
+        start = time.perf_counter()
+        func()
+        timings.append((title, time.perf_counter() - start))
+    return timings
+
+
+def print_timings(before, after):
+    print(f"{'Query':<55} | {'Before (s)':>10} | {'After (s)':>10}")
+    for (title, seconds_before), (_, seconds_after) in zip(before, after):
+        print(f"{title:<55} | {seconds_before:>10.4f} | {seconds_after:>10.4f}")
+
+
+def main():
+    import query
+
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes used by query.py.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="drop the managed indexes first so the 'before' timings run without them")
+    args = parser.parse_args()
+
+    db = query.db
+    queries = query.REPORT_QUERIES
+
+    if args.rebuild:
+        print(f"🗑️ Dropped indexes: {', '.join(drop_indexes(db)) or 'none'}")
+
+    before = time_report_queries(queries)
+
+    start = time.perf_counter()
+    created = ensure_indexes(db)
+    print(f"📇 Indexes ensured in {time.perf_counter() - start:.2f} seconds: {', '.join(created)}\n")
+
+    after = time_report_queries(queries)
+    print_timings(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, UTC
+from dotenv import load_dotenv
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backends import MongoBackend
+from geo import geohash_encode, geojson_point
+from ingest_pipeline import run_pipeline
+
+# --- Setup ---
+load_dotenv()
+
+# --- Snapshot layout ---
+# <dir>/<table>/day=YYYY-MM-DD/[vehicle=V-2025-000/]part-00000.parquet
+# Files hold flat columns in the order of the MySQL tables (and of the telemetry_batch row
+# tuples); MongoDB's location {lat, lng} and GeoJSON geo are rebuilt from lat/lng on import.
+SNAPSHOT_SCHEMAS = {
+    "vehicle_data": pa.schema([
+        ("vehicle_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("lat", pa.float64()),
+        ("lng", pa.float64()),
+        ("speed_kmh", pa.float64()),
+        ("battery_level", pa.float64()),
+        ("temperature_celsius", pa.float64()),
+        ("system_status", pa.string()),
+    ]),
+    "urban_events": pa.schema([
+        ("event_id", pa.string()),
+        ("vehicle_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("event_type", pa.string()),
+        ("description", pa.string()),
+        ("lat", pa.float64()),
+        ("lng", pa.float64()),
+        ("severity", pa.string()),
+        ("geohash", pa.string()),
+    ]),
+}
+TABLES = list(SNAPSHOT_SCHEMAS)
+BACKENDS = ["mongodb", "mysql"]
+SNAPSHOT_DIR = "snapshot"
+CHUNK_SIZE = 100_000  # rows held in memory per chunk, on export and on import
+COMPRESSION = "zstd"
+
+
+def rows_to_table(rows, schema):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def fill_geohash(table):
+    # Events exported from data written before the geohash field existed come back with nulls
+    if "geohash" not in table.column_names or not table["geohash"].null_count:
+        return table
+    encoded = geohash_encode(table["lat"].to_numpy(), table["lng"].to_numpy()).tolist()
+    hashes = [h or e for h, e in zip(table["geohash"].to_pylist(), encoded)]
+    return table.set_column(table.schema.get_field_index("geohash"), "geohash", pa.array(hashes, pa.string()))
+
+
+# --- Partitioned writer ---
+class PartitionedWriter:
+    # Receives chunks already sorted by partition (day, and vehicle when by_vehicle) and keeps
+    # one ParquetWriter open at a time, so every partition gets one file with a row group per chunk.
+    def __init__(self, directory, schema, by_vehicle=False, compression=COMPRESSION):
+        self.directory = directory
+        self.schema = schema
+        self.by_vehicle = by_vehicle
+        self.compression = compression
+        self.writer = None
+        self.key = None
+        self.parts = {}
+        self.files = 0
+
+    def partition_dir(self, key):
+        day, vehicle_id = key
+        path = os.path.join(self.directory, f"day={day}")
+        return os.path.join(path, f"vehicle={vehicle_id}") if self.by_vehicle else path
+
+    def write(self, table):
+        if not len(table):
+            return
+        days = table["timestamp"].to_numpy().astype("datetime64[D]")
+        change = days[1:] != days[:-1]
+        vehicles = None
+        if self.by_vehicle:
+            vehicles = np.asarray(table["vehicle_id"].to_pylist(), dtype=object)
+            change |= vehicles[1:] != vehicles[:-1]
+        starts = [0, *(np.flatnonzero(change) + 1).tolist()]
+        ends = starts[1:] + [len(table)]
+        for start, end in zip(starts, ends):
+            key = (str(days[start]), vehicles[start] if self.by_vehicle else None)
+            if key != self.key:
+                self._open(key)
+            self.writer.write_table(table.slice(start, end - start))
+
+    def _open(self, key):
+        self.close()
+        part = self.parts.get(key, 0)
+        self.parts[key] = part + 1
+        directory = self.partition_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        self.writer = pq.ParquetWriter(
+            os.path.join(directory, f"part-{part:05d}.parquet"), self.schema, compression=self.compression
+        )
+        self.key = key
+        self.files += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.key = None
+
+
+def snapshot_files(directory, table):
+    return sorted(glob.glob(os.path.join(directory, table, "**", "*.parquet"), recursive=True))
+
+
+def snapshot_days(directory, tables):
+    # Days present in the snapshot (day=YYYY-MM-DD directories), for the MySQL day partitions
+    days = set()
+    for table in tables:
+        for path in glob.glob(os.path.join(directory, table, "day=*")):
+            days.add(datetime.strptime(os.path.basename(path)[4:], "%Y-%m-%d").date())
+    return sorted(days)
+
+
+def iter_snapshot(directory, table, chunk_size=CHUNK_SIZE):
+    # Record batches from every file of the table, regrouped into chunks of ~chunk_size rows
+    # (a per-vehicle partition may hold only a few hundred rows)
+    schema = SNAPSHOT_SCHEMAS[table]
+    pending, n_rows = [], 0
+    for path in snapshot_files(directory, table):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            pending.append(batch)
+            n_rows += batch.num_rows
+            if n_rows >= chunk_size:
+                yield pa.Table.from_batches(pending, schema=schema)
+                pending, n_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending, schema=schema)
+
+
+def directory_size_mb(directory):
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "**", "*.parquet"),
+                                                           recursive=True)) / (1024 * 1024)
+
+
+# --- Backends ---
+class MongoSnapshot:
+    def __init__(self):
+        from rollups import rebuild_rollups
+        from schema import ensure_indexes, is_timeseries, create_vehicle_collection
+        from vehicle_state import rebuild_state
+        self.rebuild_rollups = rebuild_rollups
+        self.rebuild_state = rebuild_state
+        self.ensure_indexes = ensure_indexes
+        self.is_timeseries = is_timeseries
+        self.create_vehicle_collection = create_vehicle_collection
+
+        self.backend = MongoBackend()
+        self.db = self.backend.db
+
+    def read_chunks(self, table, by_vehicle, chunk_size=CHUNK_SIZE):
+        # Sorted on the (vehicle_id, timestamp) / timestamp indexes so partitions come out contiguous.
+        # allow_disk_use: a collection without the index (or a sort the planner can't serve from it)
+        # falls back to an in-memory sort, which fails past 100 MB instead of spilling to disk
+        schema = SNAPSHOT_SCHEMAS[table]
+        fields = schema.names
+        sort = [("vehicle_id", 1), ("timestamp", 1)] if by_vehicle else [("timestamp", 1)]
+        projection = {"_id": 0, "geo": 0}
+        rows = []
+        for doc in self.db[table].find({}, projection, sort=sort, batch_size=chunk_size,
+                                         allow_disk_use=True):
+            location = doc.get("location") or {}
+            rows.append(tuple(location.get(name) if name in ("lat", "lng") else doc.get(name) for name in fields))
+            if len(rows) >= chunk_size:
+                yield rows_to_table(rows, schema)
+                rows = []
+        if rows:
+            yield rows_to_table(rows, schema)
+
+    def prepare(self, tables, replace, days):
+        if not replace:
+            return
+        if "vehicle_data" in tables:
+            # Keeps the collection mode (regular or time-series) of the current data
+            self.create_vehicle_collection(self.db, timeseries=self.is_timeseries(self.db))
+        if "urban_events" in tables:
+            self.db.drop_collection("urban_events")
+
+    def load(self, table, chunk):
+        columns = {name: chunk[name].to_pylist() for name in chunk.column_names}
+        docs = []
+        for i in range(len(chunk)):
+            # Same field order as the generated documents (telemetry_batch)
+            doc = {}
+            for name, values in columns.items():
+                if name == "lat":
+                    lat, lng = values[i], columns["lng"][i]
+                    doc["location"] = {"lat": lat, "lng": lng}
+                    if table == "urban_events":
+                        doc["geo"] = geojson_point(lat, lng)
+                elif name != "lng":
+                    doc[name] = values[i]
+            docs.append(doc)
+        return self.backend.insert_batch(table, docs)
+
+    def finish(self, tables):
+        self.ensure_indexes(self.db)
+        if "vehicle_data" in tables:
+            # Hourly buckets and the latest state of each vehicle are recomputed on the server from
+            # the loaded telemetry
+            self.rebuild_rollups(self.db)
+            self.rebuild_state(self.db)
+        self.backend.mark_written(*tables)
+
+    def close(self):
+        self.backend.close()
+
+
+class MySQLSnapshot:
+    def __init__(self, strategy):
+        # Imported here so the MongoDB-only runs don't need mysql-connector-python
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "MySQL"))
+        import generate_data_mysql
+        import schema_mysql
+        from mysql_backend import MySQLBackend, connect
+        from vehicle_state_mysql import rebuild_state
+        self.generator = generate_data_mysql
+        self.schema = schema_mysql
+        self.connect = connect
+        self.rebuild_state = rebuild_state
+
+        self.backend = MySQLBackend(load_options={"strategy": strategy})
+
+    def read_chunks(self, table, by_vehicle, chunk_size=CHUNK_SIZE):
+        # Unbuffered cursor on its own connection: rows are fetched from the server chunk by chunk
+        schema = SNAPSHOT_SCHEMAS[table]
+        order = "vehicle_id, timestamp" if by_vehicle else "timestamp"
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(schema.names)} FROM {table} ORDER BY {order}")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows_to_table(rows, schema)
+            cursor.close()
+        finally:
+            conn.close()
+
+    def prepare(self, tables, replace, days):
+        conn = self.connect(database=None)
+        try:
+            cursor = conn.cursor()
+            # One partition per snapshot day, so retention can later drop them one by one
+            self.generator.create_schema(conn, cursor, sorted(set(days) | set(self.schema.upcoming_days())))
+            if replace:
+                for table in tables:
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+                conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, table, chunk):
+        columns = [chunk[name].to_pylist() for name in chunk.column_names]
+        return self.backend.insert_batch(table, list(zip(*columns)))
+
+    def finish(self, tables):
+        conn = self.connect()
+        try:
+            self.schema.ensure_indexes(conn, conn.cursor())
+            if "vehicle_data" in tables:
+                # The chunks already upsert vehicle_state, but a --replace import must also drop
+                # the state of the data it replaced
+                self.rebuild_state(conn, conn.cursor())
+        finally:
+            conn.close()
+        self.backend.mark_written(*tables)
+
+    def close(self):
+        self.backend.close()
+
+
+def open_backend(name, strategy="multirow"):
+    if name == "mongodb":
+        return MongoSnapshot()
+    return MySQLSnapshot(strategy)
+
+
+# --- Export / import ---
+def export_table(source, table, directory, by_vehicle=False, chunk_size=CHUNK_SIZE):
+    # Replaces <directory>/<table>; reading from the database overlaps with writing Parquet
+    output = os.path.join(directory, table)
+    shutil.rmtree(output, ignore_errors=True)
+    writer = PartitionedWriter(output, SNAPSHOT_SCHEMAS[table], by_vehicle)
+    try:
+        stats = run_pipeline(source.read_chunks(table, by_vehicle, chunk_size), writer.write)
+    finally:
+        writer.close()
+    stats["files"] = writer.files
+    stats["size_mb"] = directory_size_mb(output)
+    return stats
+
+
+def import_table(target, table, directory, chunk_size=CHUNK_SIZE):
+    return run_pipeline(
+        (fill_geohash(chunk) for chunk in iter_snapshot(directory, table, chunk_size)),
+        lambda chunk: target.load(table, chunk),
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Exports vehicle_data and urban_events to partitioned Parquet files and loads them back.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="stream the tables of a backend into Parquet files")
+    export_parser.add_argument("--output", default=SNAPSHOT_DIR,
+                               help="snapshot directory (default: %(default)s)")
+    export_parser.add_argument("--by-vehicle", action="store_true",
+                               help="partition by vehicle inside each day")
+
+    import_parser = commands.add_parser("import", help="bulk-load a snapshot into a backend")
+    import_parser.add_argument("--input", default=SNAPSHOT_DIR,
+                               help="snapshot directory (default: %(default)s)")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="empty the tables before loading (default: append)")
+    import_parser.add_argument("--mysql-strategy", default="multirow",
+                               help="MySQL load strategy (see MySQL/mysql_loader.py, default: %(default)s)")
+
+    for command in (export_parser, import_parser):
+        command.add_argument("--backend", choices=BACKENDS, default="mongodb",
+                             help="mongodb (MONGO_URI/DB_NAME) or mysql (MYSQL_* variables) (default: %(default)s)")
+        command.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES,
+                             help="tables to copy (default: all)")
+        command.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                             help="rows per chunk (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"📅 Snapshot {args.command} started at: {datetime.now(UTC).isoformat()} ({args.backend})")
+
+    if args.command == "export":
+        backend = open_backend(args.backend)
+        try:
+            for table in args.tables:
+                stats = export_table(backend, table, args.output, args.by_vehicle, args.chunk_size)
+                print(f"📦 {table}: {stats['rows']} rows in {stats['files']} files "
+                      f"({stats['size_mb']:.1f} MB) in {stats['elapsed']:.2f} seconds "
+                      f"({stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0:,.0f} rows/s).")
+        finally:
+            backend.close()
+        print(f"\n✅ Snapshot written to '{args.output}'.")
+        return
+
+    tables = [table for table in args.tables if snapshot_files(args.input, table)]
+    for table in sorted(set(args.tables) - set(tables)):
+        print(f"⚠️ {table}: no files in '{args.input}', skipped.")
+    backend = open_backend(args.backend, args.mysql_strategy)
+    try:
+        backend.prepare(tables, args.replace, snapshot_days(args.input, tables))
+        for table in tables:
+            stats = import_table(backend, table, args.input, args.chunk_size)
+            print(f"📥 {table}: {stats['rows']} rows in {stats['elapsed']:.2f} seconds "
+                  f"({stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0:,.0f} rows/s).")
+        start = time.time()
+        backend.finish(tables)
+        rebuilt = ("rollups and vehicle state" if args.backend == "mongodb" else "vehicle state") \
+            if "vehicle_data" in tables else ""
+        print(f"📇 Indexes{' and ' + rebuilt if rebuilt else ''} ready in {time.time() - start:.2f} seconds.")
+    finally:
+        backend.close()
+    print(f"\n✅ Snapshot '{args.input}' loaded.")
+
+
+if __name__ == "__main__":
+    main()
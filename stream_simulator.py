@@ -0,0 +1,435 @@
+import argparse
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, UTC
+from dotenv import load_dotenv
+import numpy as np
+
+from telemetry_batch import BR_COORDS, VEHICLE_IDS, STATUS_TYPES, STATUS_WEIGHTS, vehicle_batch_to_docs, vehicle_batch_to_rows
+from anomaly_detector import ALERT_COLLECTION, AnomalyDetector, alert_batch_to_docs, alert_batch_to_rows
+from hot_window import HotWindow, capacity_for, print_report
+
+# --- Setup ---
+load_dotenv()
+
+# --- Simulation parameters ---
+# Every vehicle in VEHICLE_IDS emits HZ readings per second, so the target rate is
+# HZ * len(VEHICLE_IDS) readings/s (--rate sets it directly).
+HZ = 1.0
+DURATION = 60           # seconds of simulated traffic
+TICK_SECONDS = 0.05     # shortest sleep of a vehicle; readings due in between are emitted together
+BATCH_SIZE = 1000       # readings per write
+MAX_DELAY = 0.5         # seconds the oldest reading may wait for its batch to fill
+WRITERS = 2             # writes in flight at the same time (one thread each)
+QUEUE_SIZE = 1000       # vehicle chunks buffered before the vehicles block
+REPORT_INTERVAL = 5
+TARGETS = ["mongodb", "mysql", "sqlite", "duckdb", "none"]
+SQL_TARGETS = ["mysql", "sqlite", "duckdb"]
+
+# Movement model: random walk on speed and heading, battery drained by distance
+SPEED_STEP_KMH = 2.0        # std. deviation of the speed change per second
+HEADING_STEP_RAD = 0.1      # std. deviation of the heading change per second
+BATTERY_PER_KM = 0.2        # battery % used per km; recharged to 100% below 10%
+KM_PER_DEG_LAT = 111.32
+
+_DONE = object()
+
+
+# --- Vehicles ---
+class SimulatedVehicle:
+    # Keeps the position, heading, speed and battery of one vehicle between emissions, so
+    # consecutive readings describe a continuous trip instead of random points.
+    def __init__(self, idx, hz, start_time, rng):
+        self.idx = idx
+        self.hz = hz
+        self.rng = rng
+        # Readings are staggered inside the period so the fleet does not emit in bursts
+        self.phase = rng.uniform(0, 1 / hz)
+        self.start_time = start_time + np.timedelta64(int(self.phase * 1000), "ms")
+        self.lat, self.lng = BR_COORDS[rng.integers(0, len(BR_COORDS))]
+        self.heading = rng.uniform(0, 2 * np.pi)
+        self.speed = rng.uniform(20, 60)
+        self.battery = rng.uniform(40, 100)
+
+    def readings(self, first, n):
+        # Columnar batch (same keys as telemetry_batch.generate_vehicle_batch) for readings
+        # first .. first + n - 1, plus "due": seconds after the start when each one was scheduled
+        rng = self.rng
+        dt = 1 / self.hz
+        indices = np.arange(first, first + n)
+
+        speeds = np.clip(self.speed + np.cumsum(rng.normal(0, SPEED_STEP_KMH * np.sqrt(dt), n)), 0, 120)
+        headings = self.heading + np.cumsum(rng.normal(0, HEADING_STEP_RAD * np.sqrt(dt), n))
+        distances_km = speeds * dt / 3600
+        lats = self.lat + np.cumsum(distances_km * np.cos(headings) / KM_PER_DEG_LAT)
+        lngs = self.lng + np.cumsum(distances_km * np.sin(headings) / (KM_PER_DEG_LAT * np.cos(np.radians(lats))))
+        batteries = 10 + (self.battery - np.cumsum(distances_km) * BATTERY_PER_KM - 10) % 90
+
+        self.speed, self.heading = speeds[-1], headings[-1]
+        self.lat, self.lng, self.battery = lats[-1], lngs[-1], batteries[-1]
+
+        offsets_ms = np.round(indices * dt * 1000).astype("timedelta64[ms]")
+        return {
+            "vehicle_idx": np.full(n, self.idx, dtype=np.int16),
+            "timestamp": self.start_time + offsets_ms,
+            "lat": np.round(lats, 6),
+            "lng": np.round(lngs, 6),
+            "speed_kmh": np.round(speeds, 2),
+            "battery_level": np.round(batteries, 2),
+            "temperature_celsius": np.round(np.clip(20 + speeds * 0.5 + rng.normal(0, 1, n), 20, 90), 2),
+            "status_idx": rng.choice(len(STATUS_TYPES), n, p=STATUS_WEIGHTS).astype(np.uint8),
+            "due": self.phase + indices * dt,
+        }
+
+
+def due_readings(elapsed, phase, hz, total):
+    # Reading i is due at phase + i / hz: counts the readings whose slot has started `elapsed`
+    # seconds after the start, none before the first slot
+    if elapsed < phase:
+        return 0
+    due = math.floor((elapsed - phase) * hz) + 1
+    # Settles float rounding against the boundaries themselves, computed like next_due in run_vehicle
+    if phase + due / hz <= elapsed:
+        due += 1
+    elif phase + (due - 1) / hz > elapsed:
+        due -= 1
+    return min(total, due)
+
+
+async def run_vehicle(vehicle, total, start, queue, stats):
+    # Emits on an absolute schedule (reading i is due at start + phase + i / hz): a late wake-up
+    # emits every reading that became due, so the rate does not drift with the event loop.
+    emitted = 0
+    while emitted < total:
+        due = due_readings(time.perf_counter() - start, vehicle.phase, vehicle.hz, total)
+        if due > emitted:
+            batch = vehicle.readings(emitted, due - emitted)
+            await queue.put(batch)
+            stats["generated"] += due - emitted
+            stats["peak_backlog"] = max(stats["peak_backlog"], stats["generated"] - stats["written"])
+            emitted = due
+        next_due = vehicle.phase + emitted / vehicle.hz
+        await asyncio.sleep(max(next_due - (time.perf_counter() - start), TICK_SECONDS))
+
+
+# --- Micro-batching writer ---
+def merge_batches(batches):
+    return {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+
+async def run_batcher(queue, write, start, stats, batch_size=BATCH_SIZE, max_delay=MAX_DELAY, writers=WRITERS,
+                      observe=None):
+    # Coalesces vehicle chunks into writes of batch_size readings, or fewer once the oldest
+    # pending reading has waited max_delay. At most `writers` writes are in flight.
+    # observe(batch) runs here, on the event loop, on every batch in the order they are formed,
+    # so it sees each vehicle's readings in time order whatever order the writers finish in; what
+    # it returns (the detector's alerts) is passed to write(batch, alerts).
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(writers)
+    in_flight = set()
+    errors = []
+    pending, n_pending, deadline = [], 0, None
+
+    async def write_batch(batch, n_rows, alerts):
+        try:
+            write_start = time.perf_counter()
+            await asyncio.to_thread(write, batch, alerts)
+            now = time.perf_counter()
+            stats["written"] += n_rows
+            stats["write_seconds"].append(now - write_start)
+            # Lag: from the moment the oldest reading of the batch was due until it was stored
+            stats["lag_seconds"].append(now - start - float(batch["due"].min()))
+            stats["last_write"] = now
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    async def flush():
+        nonlocal pending, n_pending, deadline
+        batch, n_rows = merge_batches(pending), n_pending
+        pending, n_pending, deadline = [], 0, None
+        alerts = observe(batch) if observe is not None else None
+        await slots.acquire()
+        if errors:
+            # Stops at the first failed write instead of reporting a partial run as a result
+            slots.release()
+            raise errors[0]
+        task = asyncio.create_task(write_batch(batch, n_rows, alerts))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    while True:
+        timeout = None if deadline is None else max(deadline - loop.time(), 0)
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            await flush()
+            continue
+        if item is _DONE:
+            break
+        pending.append(item)
+        n_pending += len(item["due"])
+        if deadline is None:
+            deadline = loop.time() + max_delay
+        if n_pending >= batch_size:
+            await flush()
+
+    if pending:
+        await flush()
+    await asyncio.gather(*in_flight)
+    if errors:
+        raise errors[0]
+
+
+# --- Reporting ---
+def percentile_ms(values, p):
+    return float(np.percentile(values, p)) * 1000 if values else 0.0
+
+
+async def run_reporter(start, target_rate, stats, interval=REPORT_INTERVAL):
+    previous_generated = previous_written = 0
+    previous_writes = previous_lags = 0
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - start
+        writes = stats["write_seconds"][previous_writes:]
+        lags = stats["lag_seconds"][previous_lags:]
+        backlog = stats["generated"] - stats["written"]
+        print(f"⏱️ {elapsed:6.1f}s | target {target_rate:,.0f}/s | "
+              f"generated {(stats['generated'] - previous_generated) / interval:,.0f}/s | "
+              f"written {(stats['written'] - previous_written) / interval:,.0f}/s | "
+              f"backlog {backlog:,} | write p50 {percentile_ms(writes, 50):.1f} ms "
+              f"p95 {percentile_ms(writes, 95):.1f} ms | lag p95 {percentile_ms(lags, 95):.0f} ms")
+        previous_generated, previous_written = stats["generated"], stats["written"]
+        previous_writes, previous_lags = len(stats["write_seconds"]), len(stats["lag_seconds"])
+
+
+async def simulate(write, hz, duration, seed=None, batch_size=BATCH_SIZE, max_delay=MAX_DELAY,
+                   writers=WRITERS, report_interval=REPORT_INTERVAL, observe=None, now=None):
+    # now: wall-clock time of the first slot, in the clock of the target (see target_now)
+    rng = np.random.default_rng(seed)
+    start_time = np.datetime64((now or datetime.now(UTC)).replace(tzinfo=None), "ms")
+    vehicles = [SimulatedVehicle(i, hz, start_time, rng) for i in range(len(VEHICLE_IDS))]
+    total = int(duration * hz)
+    stats = {"generated": 0, "written": 0, "write_seconds": [], "lag_seconds": [],
+             "peak_backlog": 0, "last_write": None}
+
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    start = time.perf_counter()
+    batcher = asyncio.create_task(run_batcher(queue, write, start, stats, batch_size, max_delay, writers, observe))
+    reporter = asyncio.create_task(run_reporter(start, hz * len(vehicles), stats, report_interval))
+
+    async def produce():
+        await asyncio.gather(*(run_vehicle(vehicle, total, start, queue, stats) for vehicle in vehicles))
+        stats["generation_seconds"] = time.perf_counter() - start
+        await queue.put(_DONE)
+
+    # A failed write stops the vehicles too, instead of leaving them blocked on a full queue
+    producer = asyncio.create_task(produce())
+    try:
+        await asyncio.gather(producer, batcher)
+    finally:
+        for task in (producer, batcher, reporter):
+            task.cancel()
+    stats["elapsed"] = time.perf_counter() - start
+    stats["target_rate"] = hz * len(vehicles)
+    stats["batch_size"] = batch_size
+    stats["writers"] = writers
+    stats["max_delay"] = max_delay
+    return stats
+
+
+def summarize(stats):
+    elapsed = stats["elapsed"]
+    return {
+        "target_rate": stats["target_rate"],
+        "batch_size": stats["batch_size"],
+        "writers": stats["writers"],
+        "max_delay": stats["max_delay"],
+        "generated": stats["generated"],
+        "written": stats["written"],
+        "generated_rate": stats["generated"] / stats["generation_seconds"] if stats.get("generation_seconds") else 0.0,
+        "written_rate": stats["written"] / elapsed if elapsed else 0.0,
+        "peak_backlog": stats["peak_backlog"],
+        "writes": len(stats["write_seconds"]),
+        "write_p50_ms": percentile_ms(stats["write_seconds"], 50),
+        "write_p95_ms": percentile_ms(stats["write_seconds"], 95),
+        "write_p99_ms": percentile_ms(stats["write_seconds"], 99),
+        "lag_p95_ms": percentile_ms(stats["lag_seconds"], 95),
+        "lag_max_ms": max(stats["lag_seconds"], default=0.0) * 1000,
+        "drain_seconds": elapsed - stats.get("generation_seconds", elapsed),
+    }
+
+
+# --- Targets ---
+def target_now(target):
+    # MongoDB stores naive UTC, like generate_data.py. MySQL, SQLite and DuckDB store local time, like
+    # generate_data_mysql.py: their queries compare with NOW() and the retention partitions are local days.
+    return datetime.now() if target in SQL_TARGETS else datetime.now(UTC)
+
+
+def make_observer(detector=None, window=None):
+    # observe(batch) for run_batcher: the anomaly detector (anomaly_detector.AnomalyDetector) and
+    # the hot window (hot_window.HotWindow) both need each vehicle's readings in time order, so
+    # they run on the batcher, not in the writer threads. Returns the alerts of the batch.
+    if detector is None and window is None:
+        return None
+
+    def observe(batch):
+        if window is not None:
+            window.append(batch)
+        return detector.process(batch) if detector is not None else None
+    return observe
+
+
+def open_target(target, mysql_strategy="multirow", path=None, rollups=True):
+    # Returns write(batch, alerts) and finish() for the target. Each writer thread opens its own
+    # backend: MongoDB and MySQL share the process-wide pools anyway, and SQLite/DuckDB connections
+    # stay in one thread. Alerts raised by the detector on the batch, if any, are stored in vehicle_alerts.
+    if target == "none":
+        # Measures the simulator alone (generation, batching, detection and the hot window), i.e. the ceiling of this client
+        return (lambda batch, alerts=None: None), (lambda: None)
+
+    if target == "mongodb":
+        from backends import MongoBackend
+        from rollups import ROLLUP_COLLECTION, ensure_rollup_indexes, rollup_operations
+        from vehicle_state import STATE_COLLECTION, ensure_state_indexes, state_operations
+        db = MongoBackend().db
+        ensure_rollup_indexes(db)
+        ensure_state_indexes(db)
+        make_backend = MongoBackend
+    else:
+        # Imported here so the MongoDB-only runs don't need mysql-connector-python
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "MySQL"))
+        if target == "mysql":
+            import generate_data_mysql
+            from mysql_backend import MySQLBackend, connect
+            conn = connect(database=None)
+            try:
+                generate_data_mysql.create_schema(conn, conn.cursor())
+            finally:
+                conn.close()
+            make_backend = lambda: MySQLBackend(load_options={"strategy": mysql_strategy})
+        else:
+            from embedded_backend import EmbeddedBackend
+            make_backend = lambda: EmbeddedBackend(path, target)
+
+    local = threading.local()
+    setup_lock = threading.Lock()
+
+    def write(batch, alerts=None):
+        if not hasattr(local, "backend"):
+            # One at a time: opening an embedded backend also creates its tables
+            with setup_lock:
+                local.backend = make_backend()
+        if target == "mongodb":
+            local.backend.insert_batch("vehicle_data", vehicle_batch_to_docs(batch))
+            if rollups:
+                local.backend.db[ROLLUP_COLLECTION].bulk_write(rollup_operations(batch), ordered=False)
+            local.backend.db[STATE_COLLECTION].bulk_write(state_operations(batch), ordered=False)
+        else:
+            # MySQLBackend also upserts vehicle_state in the same commit (MySQL/vehicle_state_mysql.py)
+            local.backend.insert_batch("vehicle_data", vehicle_batch_to_rows(batch))
+        if alerts is not None and len(alerts["vehicle_idx"]):
+            records = alert_batch_to_docs(alerts) if target == "mongodb" else alert_batch_to_rows(alerts)
+            local.backend.insert_batch(ALERT_COLLECTION, records)
+
+    def finish():
+        # One write counter bump per run instead of one per batch: query caches of other processes
+        # see the streamed readings once the run ends (or when their TTL runs out)
+        backend = make_backend()
+        try:
+            backend.mark_written("vehicle_data", ALERT_COLLECTION)
+        finally:
+            backend.close()
+    return write, finish
+
+
+def print_summary(target, summary):
+    print(f"\n📊 {target}: {summary['generated']:,} readings generated, {summary['written']:,} written "
+          f"in {summary['writes']:,} writes")
+    print(f"  Rate: target {summary['target_rate']:,.0f}/s | generated {summary['generated_rate']:,.0f}/s | "
+          f"written {summary['written_rate']:,.0f}/s")
+    print(f"  Write latency: p50 {summary['write_p50_ms']:.1f} ms | p95 {summary['write_p95_ms']:.1f} ms | "
+          f"p99 {summary['write_p99_ms']:.1f} ms")
+    print(f"  Lag (due → stored): p95 {summary['lag_p95_ms']:.0f} ms | max {summary['lag_max_ms']:.0f} ms | "
+          f"peak backlog {summary['peak_backlog']:,} | drained in {summary['drain_seconds']:.2f} s after the last reading")
+    # A backend that keeps up is drained within one flush delay and one write after the last
+    # reading; anything more is backlog. With --target none this is the ceiling of the simulator.
+    if summary["drain_seconds"] > max(1.0, summary["max_delay"] + summary["write_p99_ms"] / 1000) * 2:
+        print(f"⚠️ {target} fell behind: ingestion ceiling ≈ {summary['written_rate']:,.0f} readings/s "
+              f"with {summary['batch_size']} readings per write and {summary['writers']} writers.")
+    else:
+        print(f"✅ {target} sustained the target rate.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Simulates the live fleet: every vehicle streams telemetry at a fixed rate into a backend.")
+    parser.add_argument("--target", choices=TARGETS, default="mongodb",
+                        help="where readings are written; 'none' measures the simulator alone (default: %(default)s)")
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument("--hz", type=float, default=HZ,
+                      help="readings per second of each vehicle (default: %(default)s)")
+    rate.add_argument("--rate", type=float, default=None,
+                      help=f"readings per second of the whole fleet ({len(VEHICLE_IDS)} vehicles)")
+    parser.add_argument("--duration", type=float, default=DURATION,
+                        help="seconds of simulated traffic (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="readings per write (default: %(default)s)")
+    parser.add_argument("--max-delay", type=float, default=MAX_DELAY,
+                        help="seconds a reading may wait for its batch to fill (default: %(default)s)")
+    parser.add_argument("--writers", type=int, default=WRITERS,
+                        help="concurrent writes in flight (default: %(default)s)")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL,
+                        help="seconds between progress lines (default: %(default)s)")
+    parser.add_argument("--mysql-strategy", default="multirow",
+                        help="MySQL load strategy (see MySQL/mysql_loader.py, default: %(default)s)")
+    parser.add_argument("--path", default=None,
+                        help="database file for sqlite/duckdb (default: see MySQL/embedded_backend.py)")
+    parser.add_argument("--no-rollups", dest="rollups", action="store_false",
+                        help="MongoDB only: skip the hourly buckets in vehicle_hourly")
+    parser.add_argument("--detect", action="store_true",
+                        help=f"run the anomaly detector on every batch and store its alerts in '{ALERT_COLLECTION}'")
+    parser.add_argument("--hot-window", type=float, default=None, metavar="HOURS",
+                        help="also keep the last HOURS of readings in the in-memory hot window and answer the "
+                             "report questions from it at the end")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the starting positions and the random walks")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    hz = args.rate / len(VEHICLE_IDS) if args.rate else args.hz
+    print(f"📅 Stream simulation started at: {datetime.now(UTC).isoformat()}")
+    print(f"🚗 {len(VEHICLE_IDS)} vehicles x {hz:g} Hz = {hz * len(VEHICLE_IDS):,.0f} readings/s for "
+          f"{args.duration:g} s into {args.target} (batches of {args.batch_size}, max delay {args.max_delay} s, "
+          f"{args.writers} writers)\n")
+
+    detector = AnomalyDetector() if args.detect else None
+    window = HotWindow(capacity_for(args.hot_window, hz)) if args.hot_window else None
+    write, finish = open_target(args.target, args.mysql_strategy, args.path, args.rollups)
+    stats = asyncio.run(simulate(write, hz, args.duration, args.seed, args.batch_size, args.max_delay,
+                                 args.writers, args.report_interval, make_observer(detector, window),
+                                 target_now(args.target)))
+    finish()
+    print_summary(args.target, summarize(stats))
+    if detector is not None:
+        detected = detector.stats
+        print(f"🚨 Anomaly detector: {detected['alerts']:,} alerts from {detected['readings']:,} readings "
+              f"({detected['readings'] / detected['seconds'] if detected['seconds'] else 0:,.0f} readings/s "
+              f"spent detecting)")
+    if window is not None:
+        print(f"🧊 Hot window: {len(window):,} readings held in {window.nbytes() / 2**20:,.1f} MB "
+              f"({window.capacity:,} per vehicle)")
+        print_report(window, target_now(args.target))
+
+
+if __name__ == "__main__":
+    main()
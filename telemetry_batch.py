@@ -0,0 +1,223 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+import numpy as np
+from faker import Faker
+from faker.providers.geo import Provider as GeoProvider
+from geo import geohash_encode, geojson_point
+
+# --- Shared fleet parameters ---
+NUM_VEHICLES = 50
+VEHICLE_IDS = [f"V-{2025}-{str(i).zfill(3)}" for i in range(NUM_VEHICLES)]
+
+EVENT_TYPES = ["obstacle", "traffic_jam", "roadwork", "accident", "pedestrian_crossing"]
+STATUS_TYPES = ["OK", "WARNING", "ERROR"]
+SEVERITY_LEVELS = ["low", "medium", "high"]
+
+STATUS_WEIGHTS = [0.6, 0.3, 0.1]
+SEVERITY_WEIGHTS = [0.2, 0.3, 0.5]
+
+# Generated timestamps fall on the reference day and the days before it
+HISTORY_DAYS = 7
+
+# Std. deviation of the jitter added to event coordinates (0.01 deg ~ 1.1 km)
+GPS_NOISE_DEG = 0.01
+
+# Same coordinate pool that fake.local_latlng(country_code="BR") draws from,
+# loaded once so a batch only needs an index per row.
+BR_COORDS = np.array(
+    [(float(c[0]), float(c[1])) for c in GeoProvider.land_coords if c[3] == "BR"]
+)
+
+# Descriptions are sampled from a pool instead of calling fake.sentence() per row. The pool is
+# seeded so every process (and every run) builds the same one.
+DESCRIPTION_POOL_SIZE = 1000
+DESCRIPTION_SEED = 2025
+_description_pool = None
+
+
+def _descriptions():
+    global _description_pool
+    if _description_pool is None:
+        fake = Faker()
+        fake.seed_instance(DESCRIPTION_SEED)
+        _description_pool = np.array(
+            [fake.sentence(nb_words=6) for _ in range(DESCRIPTION_POOL_SIZE)], dtype=object
+        )
+    return _description_pool
+
+
+def parse_reference_time(value):
+    # --reference-time: ISO 8601 instant the generated timestamps are relative to (None: now)
+    return datetime.fromisoformat(value) if value else None
+
+
+def local_time(value):
+    # Clock of the MySQL/SQLite/DuckDB tables (NOW(), day partitions): the same instant as naive local time
+    return value.astimezone().replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def _day_start(now):
+    # Naive times are already in the clock of the target (local for the SQL targets, see local_time);
+    # aware ones are converted to UTC, the clock of the MongoDB collections, before the offset is dropped
+    now = now or datetime.now(UTC)
+    naive = now.astimezone(UTC).replace(tzinfo=None) if now.tzinfo else now
+    day = np.datetime64(naive.replace(hour=0, minute=0, second=0, microsecond=0), "s")
+    return naive, day
+
+
+def generated_days(now=None):
+    # Calendar days covered by the batches generated around `now`, oldest first
+    naive, _ = _day_start(now)
+    return [(naive - timedelta(days=i)).date() for i in range(HISTORY_DAYS - 1, -1, -1)]
+
+
+# --- Batch generators (columnar NumPy arrays) ---
+def generate_vehicle_batch(n, rng=None, now=None, status_weights=STATUS_WEIGHTS):
+    rng = rng if rng is not None else np.random.default_rng()
+    naive_now, today = _day_start(now)
+
+    # Same shape as the per-record generator: one of the last 7 days, between 6h and 10h
+    days = rng.integers(0, HISTORY_DAYS, n)
+    hours = rng.integers(6, 11, n)
+    minutes = rng.integers(0, 60, n)
+    offsets = days * -86400 + hours * 3600 + minutes * 60 + naive_now.second
+    coords = BR_COORDS[rng.integers(0, len(BR_COORDS), n)]
+
+    return {
+        "vehicle_idx": rng.integers(0, len(VEHICLE_IDS), n).astype(np.int16),
+        "timestamp": today + offsets.astype("timedelta64[s]"),
+        "lat": coords[:, 0],
+        "lng": coords[:, 1],
+        "speed_kmh": np.round(rng.uniform(0, 120, n), 2),
+        "battery_level": np.round(rng.uniform(10, 100, n), 2),
+        "temperature_celsius": np.round(rng.uniform(20, 90, n), 2),
+        "status_idx": rng.choice(len(STATUS_TYPES), n, p=status_weights).astype(np.uint8),
+    }
+
+
+def generate_event_batch(n, rng=None, now=None, gps_noise_deg=GPS_NOISE_DEG):
+    rng = rng if rng is not None else np.random.default_rng()
+    naive_now, today = _day_start(now)
+
+    seconds_of_day = naive_now.hour * 3600 + naive_now.minute * 60 + naive_now.second
+    offsets = rng.integers(0, HISTORY_DAYS, n) * -86400 + seconds_of_day
+    coords = BR_COORDS[rng.integers(0, len(BR_COORDS), n)]
+    if gps_noise_deg:
+        # Scatters events around the city centers like real GPS fixes
+        coords = np.round(coords + rng.normal(0.0, gps_noise_deg, (n, 2)), 6)
+
+    return {
+        "event_uuid": rng.integers(0, 256, (n, 16), dtype=np.uint8),
+        "vehicle_idx": rng.integers(0, len(VEHICLE_IDS), n).astype(np.int16),
+        "timestamp": today + offsets.astype("timedelta64[s]"),
+        "event_type_idx": rng.integers(0, len(EVENT_TYPES), n).astype(np.uint8),
+        "description_idx": rng.integers(0, DESCRIPTION_POOL_SIZE, n).astype(np.int16),
+        "lat": coords[:, 0],
+        "lng": coords[:, 1],
+        "severity_idx": rng.choice(len(SEVERITY_LEVELS), n, p=SEVERITY_WEIGHTS).astype(np.uint8),
+    }
+
+
+# --- Latest reading per vehicle ---
+# --- Order of a vehicle's readings ---
+# The latest reading of a vehicle is the greatest by (timestamp, status rank, values): readings with
+# the same timestamp resolve to the most severe status (STATUS_TYPES order), then to the larger
+# values. Every state store (vehicle_state.py, MySQL/vehicle_state_mysql.py) and query 5 use this
+# one rule, so the state never depends on which of the tied readings was written first.
+STATUS_RANK = {status: rank for rank, status in enumerate(STATUS_TYPES)}
+TIE_FIELDS = ["speed_kmh", "battery_level", "temperature_celsius", "lat", "lng"]
+
+
+def reading_key(row):
+    # Same order for tuples of vehicle_data (vehicle_id, timestamp, lat, lng, speed, battery, temperature, status)
+    return row[1], STATUS_RANK[row[7]], row[4], row[5], row[6], row[2], row[3]
+
+
+def latest_readings(batch):
+    # Sub-batch with the latest reading of each vehicle in the batch (reading_key order), ordered
+    # by vehicle (VEHICLE_IDS are zero-padded, so index order is also id order)
+    order = np.lexsort(tuple(batch[field] for field in reversed(TIE_FIELDS))
+                       + (batch["status_idx"], batch["timestamp"], batch["vehicle_idx"]))
+    vehicles = batch["vehicle_idx"][order]
+    last = order[np.append(vehicles[1:] != vehicles[:-1], True)] if len(order) else order
+    return {key: values[last] for key, values in batch.items()}
+
+
+# --- Materialization (only at the insert boundary) ---
+def _labels(values, codes):
+    return np.array(values, dtype=object)[codes].tolist()
+
+
+def _uuids(raw):
+    return [str(uuid.UUID(bytes=b.tobytes(), version=4)) for b in raw]
+
+
+# One function per tuple field (batch -> Python list), in the column order of the MySQL tables
+# (mysql_loader.VEHICLE_COLUMNS / EVENT_COLUMNS); documents are built from the same tuples
+VEHICLE_FIELDS = [
+    lambda batch: _labels(VEHICLE_IDS, batch["vehicle_idx"]),
+    lambda batch: batch["timestamp"].astype("datetime64[us]").tolist(),
+    lambda batch: batch["lat"].tolist(),
+    lambda batch: batch["lng"].tolist(),
+    lambda batch: batch["speed_kmh"].tolist(),
+    lambda batch: batch["battery_level"].tolist(),
+    lambda batch: batch["temperature_celsius"].tolist(),
+    lambda batch: _labels(STATUS_TYPES, batch["status_idx"]),
+]
+EVENT_FIELDS = [
+    lambda batch: _uuids(batch["event_uuid"]),
+    lambda batch: _labels(VEHICLE_IDS, batch["vehicle_idx"]),
+    lambda batch: batch["timestamp"].astype("datetime64[us]").tolist(),
+    lambda batch: _labels(EVENT_TYPES, batch["event_type_idx"]),
+    lambda batch: _descriptions()[batch["description_idx"]].tolist(),
+    lambda batch: batch["lat"].tolist(),
+    lambda batch: batch["lng"].tolist(),
+    lambda batch: _labels(SEVERITY_LEVELS, batch["severity_idx"]),
+    lambda batch: geohash_encode(batch["lat"], batch["lng"]).tolist(),
+]
+
+
+def materialize(batch, fields):
+    # Row tuples of a columnar batch: each field is converted once for the whole batch
+    return list(zip(*[field(batch) for field in fields]))
+
+
+def vehicle_batch_to_rows(batch):
+    return materialize(batch, VEHICLE_FIELDS)
+
+
+def vehicle_batch_to_docs(batch):
+    return [
+        {
+            "vehicle_id": vehicle_id,
+            "timestamp": timestamp,
+            "location": {"lat": lat, "lng": lng},
+            "speed_kmh": speed,
+            "battery_level": battery,
+            "temperature_celsius": temperature,
+            "system_status": status,
+        }
+        for vehicle_id, timestamp, lat, lng, speed, battery, temperature, status in vehicle_batch_to_rows(batch)
+    ]
+
+
+def event_batch_to_rows(batch):
+    return materialize(batch, EVENT_FIELDS)
+
+
+def event_batch_to_docs(batch):
+    return [
+        {
+            "event_id": event_id,
+            "vehicle_id": vehicle_id,
+            "timestamp": timestamp,
+            "event_type": event_type,
+            "description": description,
+            "location": {"lat": lat, "lng": lng},
+            "geo": geojson_point(lat, lng),
+            "geohash": geohash,
+            "severity": severity,
+        }
+        for event_id, vehicle_id, timestamp, event_type, description, lat, lng, severity, geohash
+        in event_batch_to_rows(batch)
+    ]
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules are flat scripts: the project root and MySQL/ go on the path like the
+# subdirectory scripts do
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "MySQL"))
@@ -0,0 +1,121 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from anomaly_detector import (
+    ALERT_TYPES, ERROR_IDX, AnomalyDetector, alert_batch_to_docs, alert_batch_to_rows, detect_stored, simulated_stream,
+)
+from telemetry_batch import STATUS_TYPES, VEHICLE_IDS
+
+START = np.datetime64("2025-06-01T08:00:00", "ms")
+
+
+def random_stream(n, n_vehicles, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "vehicle_idx": rng.integers(0, n_vehicles, n).astype(np.int16),
+        "timestamp": START + np.sort(rng.integers(0, 10 ** 9, n)).astype("timedelta64[ms]"),
+        "temperature_celsius": np.round(rng.uniform(40, 100, n), 2),
+        "battery_level": np.round(rng.uniform(0, 100, n), 2),
+        "speed_kmh": np.round(rng.uniform(0, 120, n), 2),
+        "status_idx": rng.choice(3, n, p=[0.3, 0.2, 0.5]).astype(np.uint8),
+    }
+
+
+def run(detector, stream, batch_size):
+    alerts = []
+    n = len(stream["vehicle_idx"])
+    for start in range(0, n, batch_size):
+        batch = detector.process({key: values[start:start + batch_size] for key, values in stream.items()})
+        alerts.extend(zip(batch["vehicle_idx"].tolist(), batch["timestamp"].tolist(),
+                          batch["alert_type_idx"].tolist(), batch["value"].tolist()))
+    return alerts
+
+
+def reference_alerts(stream, window, min_readings, thresholds):
+    # One reading at a time, straight from the definitions
+    windows, active, alerts = {}, {}, []
+    for i in range(len(stream["vehicle_idx"])):
+        v = int(stream["vehicle_idx"][i])
+        idx = windows.setdefault(v, deque(maxlen=window))
+        idx.append(i)
+        idx = list(idx)
+        hours = (stream["timestamp"][idx[-1]] - stream["timestamp"][idx[0]]) / np.timedelta64(1, "h")
+        drop = stream["battery_level"][idx[0]] - stream["battery_level"][idx[-1]]
+        conditions = [
+            len(idx) >= min_readings and round(sum(stream["temperature_celsius"][idx]) * 100) >= thresholds[0] * 100 * len(idx),
+            len(idx) >= min_readings and hours > 0 and drop / hours >= thresholds[1],
+            int((stream["status_idx"][idx] == ERROR_IDX).sum()) >= thresholds[2],
+        ]
+        previous = active.get(v, [False] * 3)
+        alerts.extend((v, stream["timestamp"][i].item(), t) for t in range(3) if conditions[t] and not previous[t])
+        active[v] = conditions
+    return alerts
+
+
+def test_alerts_match_the_one_reading_at_a_time_definition():
+    stream = random_stream(3000, 5, seed=1)
+    thresholds = dict(overheat_celsius=72, drain_pct_per_hour=5, error_burst=4)
+    detector = AnomalyDetector(n_vehicles=5, window=7, min_readings=3, **thresholds)
+    got = sorted((v, t, a) for v, t, a, _ in run(detector, stream, 97))
+    assert got == sorted(reference_alerts(stream, 7, 3, [72, 5, 4]))
+    assert detector.stats["readings"] == 3000
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 270, 271, 10_000])
+def test_alerts_do_not_depend_on_how_the_stream_is_split(batch_size):
+    stream = simulated_stream(10_000, seed=2025)
+    # Alerts come ordered by vehicle within a batch, so only the sets are compared
+    baseline = sorted(run(AnomalyDetector(), stream, len(stream["vehicle_idx"])))
+    assert baseline
+    assert sorted(run(AnomalyDetector(), stream, batch_size)) == baseline
+
+
+def test_a_mean_exactly_on_the_threshold_alerts_in_any_split():
+    # Regression: (73.46 + 76.54) / 2 is 75.00, but a float running sum over the readings before
+    # it made the window mean 74.999... when the stream came in one batch, and 75.0 one at a time
+    temperatures = [54.08, 52.89, 35.65, 38.67, 52.96, 47.23, 53.48, 50.3, 73.46, 76.54]
+    n = len(temperatures)
+    stream = {
+        "vehicle_idx": np.zeros(n, dtype=np.int16),
+        "timestamp": START + np.arange(n).astype("timedelta64[s]"),
+        "temperature_celsius": np.array(temperatures),
+        "battery_level": np.full(n, 50.0),
+        "speed_kmh": np.full(n, 10.0),
+        "status_idx": np.zeros(n, dtype=np.uint8),
+    }
+    for batch_size in (1, 3, n):
+        detector = AnomalyDetector(n_vehicles=1, window=2, min_readings=2)
+        alerts = run(detector, stream, batch_size)
+        assert [(t, a, value) for _, t, a, value in alerts] == [(stream["timestamp"][9].item(), 0, 75.0)]
+
+
+def test_alert_docs_carry_the_window():
+    stream = random_stream(500, 2, seed=3)
+    detector = AnomalyDetector(n_vehicles=2, window=5, min_readings=2, overheat_celsius=60)
+    alerts = detector.process(stream)
+    docs = alert_batch_to_docs(alerts)
+    assert len(docs) == len(alerts["vehicle_idx"]) > 0
+    assert {doc["alert_type"] for doc in docs} <= set(ALERT_TYPES)
+    assert all(2 <= doc["window"]["readings"] <= 5 for doc in docs)
+
+
+def test_stored_readings_replay_like_the_stream():
+    stream = simulated_stream(5000, seed=7)
+    # Rows as read back from vehicle_data (STORED_FIELDS), in timestamp order
+    rows = list(zip(
+        [VEHICLE_IDS[i] for i in stream["vehicle_idx"]],
+        stream["timestamp"].astype("datetime64[us]").tolist(),
+        stream["temperature_celsius"].tolist(),
+        stream["battery_level"].tolist(),
+        stream["speed_kmh"].tolist(),
+        [STATUS_TYPES[i] for i in stream["status_idx"]],
+    ))
+    stored = []
+    detector, stats = detect_stored((rows[start:start + 333] for start in range(0, len(rows), 333)),
+                                    lambda alerts: stored.extend(alert_batch_to_rows(alerts)))
+    expected = AnomalyDetector().process(stream)
+    assert stats["rows"] == detector.stats["readings"] == len(rows)
+    assert stored
+    assert sorted(stored) == sorted(alert_batch_to_rows(expected))
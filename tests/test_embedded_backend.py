@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from embedded_backend import ENGINES, EmbeddedBackend, load_generated_data
+from query_cache import QueryCache
+
+BASE = datetime(2025, 6, 1, 8, 0, 0)
+
+
+@pytest.fixture(params=ENGINES)
+def backend(request, tmp_path):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    backend = EmbeddedBackend(str(tmp_path / f"fleet.{request.param}"), request.param)
+    yield backend
+    backend.close()
+
+
+def reading(vehicle_id, minutes, status):
+    return (vehicle_id, BASE + timedelta(minutes=minutes), -23.55, -46.63, 50.0, 80.0, 30.0, status)
+
+
+def event(event_id, vehicle_id, minutes):
+    return (event_id, vehicle_id, BASE + timedelta(minutes=minutes), "accident", "test", -23.55, -46.63,
+            "high", "6gycfqf0xnbc")
+
+
+def events_in_error(backend):
+    result = backend.execute_query("events_while_system_error")
+    # SQLite returns DATETIME columns as text; str() gives the same form for both engines
+    return [(row["vehicle_id"], str(row["timestamp"])) for row in result["sample"]], result["total"]
+
+
+@pytest.mark.parametrize("tied_statuses", [("OK", "ERROR"), ("ERROR", "OK"), ("WARNING", "ERROR", "OK")])
+def test_same_timestamp_readings_resolve_to_the_most_severe_status(backend, tied_statuses):
+    # Regression: ties went to the last inserted reading, so the result changed with the insert
+    # order (e.g. which --workers process flushed first); now an ERROR at that instant always wins
+    backend.insert_batch("vehicle_data", [reading("V-2025-001", 0, "OK")])
+    for status in tied_statuses:
+        backend.insert_batch("vehicle_data", [reading("V-2025-001", 10, status)])
+    backend.insert_batch("urban_events", [event("e1", "V-2025-001", 15)])
+    assert events_in_error(backend) == ([("V-2025-001", "2025-06-01 08:15:00")], 1)
+
+
+def test_ties_without_an_error_do_not_match(backend):
+    backend.insert_batch("vehicle_data", [reading("V-2025-001", 0, "ERROR"),
+                                          reading("V-2025-001", 10, "OK"),
+                                          reading("V-2025-001", 10, "WARNING")])
+    backend.insert_batch("urban_events", [event("e1", "V-2025-001", 15)])
+    assert events_in_error(backend) == ([], 0)
+
+
+def test_events_take_the_status_at_or_before_their_time(backend):
+    backend.insert_batch("vehicle_data", [
+        reading("V-2025-001", 0, "ERROR"),
+        reading("V-2025-001", 20, "OK"),
+        reading("V-2025-002", 0, "OK"),
+        reading("V-2025-002", 5, "ERROR"),
+    ])
+    backend.insert_batch("urban_events", [
+        event("e1", "V-2025-001", 0),      # same instant as the ERROR reading
+        event("e2", "V-2025-001", 30),     # after the vehicle recovered
+        event("e3", "V-2025-002", 10),
+        event("e4", "V-2025-003", 10),     # no readings at all
+    ])
+    assert events_in_error(backend) == ([("V-2025-001", "2025-06-01 08:00:00"), ("V-2025-002", "2025-06-01 08:10:00")], 2)
+
+
+def test_sqlite_and_duckdb_agree_on_generated_data(tmp_path):
+    # Generated readings have minute resolution, so same-timestamp readings of a vehicle are common
+    pytest.importorskip("duckdb")
+    now = datetime(2025, 6, 1, 12, 0, 0)
+    totals = []
+    for engine in ENGINES:
+        backend = EmbeddedBackend(str(tmp_path / f"fleet.{engine}"), engine)
+        load_generated_data(backend, 20_000, 2000, seed=7, now=now)
+        totals.append(backend.execute_query("events_while_system_error")["total"])
+        backend.close()
+    assert totals[0] == totals[1] > 0
+
+
+def test_runs_without_the_mysql_driver(tmp_path):
+    # Regression: embedded_backend imported mysql_backend/query_Mysql, and with them mysql.connector
+    script = """
+import sys
+sys.modules["mysql"] = None  # import mysql.connector now raises ImportError
+sys.path[:0] = sys.argv[2:]
+from datetime import datetime
+import report_queries
+from embedded_backend import EmbeddedBackend, load_generated_data
+backend = EmbeddedBackend(sys.argv[1], "sqlite")
+load_generated_data(backend, 2000, 200, seed=7, now=datetime(2025, 6, 1, 12, 0, 0))
+for title, query, formatter in report_queries.REPORT_QUERIES:
+    report_queries.run_query(backend.cursor(), title, query, formatter)
+assert "mysql_backend" not in sys.modules and "query_Mysql" not in sys.modules
+"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    subprocess.run([sys.executable, "-c", script, str(tmp_path / "fleet.sqlite"), root, os.path.join(root, "MySQL")],
+                   check=True, capture_output=True)
+
+
+def write_in_another_process(path):
+    script = (
+        "import sys; sys.path[:0] = {paths!r}\n"
+        "from datetime import datetime\n"
+        "from embedded_backend import EmbeddedBackend\n"
+        "backend = EmbeddedBackend({path!r}, 'sqlite')\n"
+        "backend.insert_batch('urban_events', [('e2', 'V-2025-001', datetime(2025, 6, 1, 8, 6), 'accident', "
+        "'test', -23.55, -46.63, 'high', '6gycfqf0xnbc')])\n"
+        "backend.mark_written('urban_events')\n"
+        "backend.close()\n"
+    ).format(paths=[path for path in sys.path if path], path=path)
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_writes_of_another_process_invalidate_the_cache(tmp_path):
+    path = str(tmp_path / "fleet.sqlite")
+    backend = EmbeddedBackend(path, "sqlite", cache=QueryCache(ttl=3600, check_interval=0))
+    backend.insert_batch("vehicle_data", [reading("V-2025-001", 0, "ERROR")])
+    backend.insert_batch("urban_events", [event("e1", "V-2025-001", 5)])
+    assert backend.run_query("events_while_system_error")["total"] == 1
+    assert backend.run_query("events_while_system_error")["total"] == 1
+    assert backend.cache.summary()["hits"] == 1
+
+    # Only the write counters in the database tell this process about the other one's load
+    write_in_another_process(path)
+    assert backend.write_versions(["urban_events", "vehicle_data"]) == (1, 0)
+    assert backend.run_query("events_while_system_error")["total"] == 2
+    assert backend.cache.summary()["invalidated"] == 1
+    backend.close()
+
+
+def test_write_counters_are_bumped_once_per_load(tmp_path):
+    backend = EmbeddedBackend(str(tmp_path / "fleet.sqlite"), "sqlite")
+    load_generated_data(backend, 25_000, 25_000, seed=7, now=datetime(2025, 6, 1, 12, 0, 0))
+    assert backend.write_versions(["urban_events", "vehicle_data"]) == (1, 1)
+    backend.close()
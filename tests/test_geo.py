@@ -0,0 +1,26 @@
+import numpy as np
+
+from geo import geohash_center, geohash_encode
+
+
+def test_geohash_matches_reference_values():
+    # Reference cells from the geohash specification examples
+    assert geohash_encode(42.6, -5.6, 5) == "ezs42"
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_geohash_is_vectorized_and_prefix_consistent():
+    lat = np.array([-23.5505, -22.9068, -15.7939])
+    lng = np.array([-46.6333, -43.1729, -47.8828])
+    full = geohash_encode(lat, lng)
+    coarse = geohash_encode(lat, lng, 5)
+    assert full.shape == (3,)
+    assert [cell[:5] for cell in full] == coarse.tolist()
+    assert full.tolist() == [geohash_encode(a, b) for a, b in zip(lat, lng)]
+
+
+def test_geohash_center_falls_back_into_its_cell():
+    cell = geohash_encode(-23.5505, -46.6333, 6)
+    lat, lng = geohash_center(str(cell))
+    assert geohash_encode(lat, lng, 6) == cell
+    assert abs(lat + 23.5505) < 0.01 and abs(lng + 46.6333) < 0.01
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+
+from hot_window import HotWindow, capacity_for
+from telemetry_batch import VEHICLE_IDS
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+NOW_MS = np.datetime64(NOW, "ms")
+
+
+def readings(vehicle_idx, seconds_before_now, speed=None, battery=None, status=None):
+    n = len(vehicle_idx)
+    return {
+        "vehicle_idx": np.array(vehicle_idx, dtype=np.int16),
+        "timestamp": NOW_MS - np.array(seconds_before_now).astype("timedelta64[s]"),
+        "lat": np.zeros(n),
+        "lng": np.zeros(n),
+        "speed_kmh": np.array(speed if speed is not None else [10.0] * n),
+        "battery_level": np.array(battery if battery is not None else [50.0] * n),
+        "temperature_celsius": np.full(n, 30.0),
+        "status_idx": np.array(status if status is not None else [0] * n, dtype=np.uint8),
+    }
+
+
+def held(window, vehicle, column="speed_kmh"):
+    return sorted(window.columns[column][vehicle][window.valid()[vehicle]].tolist())
+
+
+def test_capacity_covers_the_hours_at_the_rate():
+    assert capacity_for(24, 1.0) == 86_400
+    assert capacity_for(0.5, 2.0) == 3600
+    assert capacity_for(0, 1.0) == 1
+
+
+def test_full_buffers_overwrite_their_oldest_readings():
+    window = HotWindow(capacity=3, n_vehicles=2)
+    window.append(readings([0, 0, 1], [50, 40, 40], speed=[1.0, 2.0, 9.0]))
+    window.append(readings([0, 0, 0], [30, 20, 10], speed=[3.0, 4.0, 5.0]))
+    assert len(window) == 4
+    assert held(window, 0) == [3.0, 4.0, 5.0]
+    assert held(window, 1) == [9.0]
+
+
+def test_a_batch_longer_than_the_capacity_keeps_its_last_readings():
+    window = HotWindow(capacity=2, n_vehicles=1)
+    assert window.append(readings([0] * 5, [5, 4, 3, 2, 1], speed=[1.0, 2.0, 3.0, 4.0, 5.0])) == 2
+    assert held(window, 0) == [4.0, 5.0]
+    assert window.append(readings([], [])) == 0
+
+
+def test_report_questions_only_see_readings_inside_their_range():
+    window = HotWindow(capacity=10, n_vehicles=len(VEHICLE_IDS))
+    day = 3600 * 24
+    window.append(readings(
+        [0, 0, 1, 1, 2],
+        [60, 2 * day, 3600, 8 * day, 60],
+        speed=[20.0, 40.0, 90.0, 120.0, 35.0],
+        status=[2, 2, 2, 0, 0],
+    ))
+    assert window.critical_failures_last_24h(NOW) == 2
+    assert window.avg_speed_last_7_days(NOW) == [
+        {"_id": VEHICLE_IDS[1], "avg_speed": 90.0},
+        {"_id": VEHICLE_IDS[2], "avg_speed": 35.0},
+        {"_id": VEHICLE_IDS[0], "avg_speed": 30.0},
+    ]
+
+
+def test_morning_battery_averages_the_readings_between_6h_and_10h():
+    window = HotWindow(capacity=10, n_vehicles=2)
+    hour = 3600
+    assert window.average_battery_morning(NOW) == []
+    # NOW is 12h: 3h and 5h ago fall inside the morning range, 1h and 7h ago outside
+    window.append(readings([0, 1, 0, 1], [3 * hour, 5 * hour, 1 * hour, 7 * hour], battery=[40.0, 60.0, 99.0, 1.0]))
+    assert window.average_battery_morning(NOW) == [{"avg_battery": 50.0}]
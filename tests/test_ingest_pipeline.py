@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from ingest_pipeline import merge_stats, plan_batches, run_pipeline, run_sharded, split_batches, split_rows
+
+
+def test_plan_batches_covers_the_total():
+    assert plan_batches(25, 10) == [(0, 10), (1, 10), (2, 5)]
+    assert plan_batches(20, 10) == [(0, 10), (1, 10)]
+    assert plan_batches(0, 10) == []
+
+
+def test_run_pipeline_writes_every_batch_in_order():
+    written = []
+    stats = run_pipeline(iter([[1, 2], [3], [4, 5, 6]]), written.append)
+    assert written == [[1, 2], [3], [4, 5, 6]]
+    assert stats["batches"] == 3 and stats["rows"] == 6
+    assert len(stats["batch_seconds"]) == 3
+
+
+def test_generation_is_bounded_by_the_queue():
+    # The producer may only run queue_size batches (plus the one it holds) ahead of the writer
+    produced = []
+    ahead = []
+
+    def batches():
+        for i in range(20):
+            produced.append(i)
+            yield [i]
+
+    def write(batch):
+        ahead.append(len(produced) - batch[0])
+
+    run_pipeline(batches(), write, queue_size=2)
+    assert max(ahead) <= 4
+
+
+def test_a_failing_write_stops_the_producer():
+    def write(batch):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_pipeline(iter([[1]] * 100), write)
+    assert not any(thread.name == "batch-producer" for thread in threading.enumerate())
+
+
+def test_a_failing_generator_is_raised_by_the_writer():
+    def batches():
+        yield [1]
+        raise RuntimeError("generator failed")
+
+    written = []
+    with pytest.raises(RuntimeError, match="generator failed"):
+        run_pipeline(batches(), written.append)
+    assert written == [[1]]
+
+
+# --- Multi-process sharding ---
+def test_split_batches_keeps_contiguous_runs():
+    assert split_rows(10, 3) == [4, 3, 3]
+    batches = plan_batches(95, 10)
+    shards = split_batches(batches, 3)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert [batch for shard in shards for batch in shard] == batches
+
+
+def test_merge_stats_uses_the_slowest_worker_as_wall_time():
+    merged = merge_stats([
+        {"batches": 2, "rows": 20, "write_seconds": 1.0, "elapsed": 3.0, "batch_seconds": [0.4, 0.6]},
+        {"batches": 1, "rows": 5, "write_seconds": 0.5, "elapsed": 2.0, "batch_seconds": [0.5]},
+    ])
+    assert merged == {"batches": 3, "rows": 25, "write_seconds": 1.5, "elapsed": 3.0,
+                      "batch_seconds": [0.4, 0.6, 0.5]}
+    assert merge_stats([])["elapsed"] == 0.0
+
+
+def shard_worker(worker_id, seed, vehicle_batches, event_batches):
+    return worker_id, seed, vehicle_batches, event_batches
+
+
+def test_run_sharded_gives_every_worker_its_part_and_the_same_seed():
+    results = run_sharded(shard_worker, 3, [45, 12], seed=7, batch_size=10)
+    assert [worker_id for worker_id, _, _, _ in results] == [0, 1, 2]
+    assert {seed for _, seed, _, _ in results} == {7}
+    assert [batch for _, _, shard, _ in results for batch in shard] == plan_batches(45, 10)
+    assert [batch for _, _, _, shard in results for batch in shard] == plan_batches(12, 10)
@@ -0,0 +1,135 @@
+from query_cache import QueryCache, invalidate_tables
+
+SCOPE = ("test", "db")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Query:
+    # compute() that counts how many times the query really ran
+    def __init__(self, result="rows"):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self):
+        self.calls += 1
+        return f"{self.result}-{self.calls}"
+
+
+def test_entries_are_served_until_the_ttl_runs_out():
+    clock = Clock()
+    cache = QueryCache(ttl=10.0, clock=clock)
+    query = Query()
+    assert cache.fetch(SCOPE, "critical_failures_last_24h", {}, query) == "rows-1"
+    clock.now = 9.9
+    assert cache.fetch(SCOPE, "critical_failures_last_24h", {}, query) == "rows-1"
+    clock.now = 10.0
+    assert cache.fetch(SCOPE, "critical_failures_last_24h", {}, query) == "rows-2"
+    assert cache.summary()["expired"] == 1 and cache.summary()["hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = QueryCache(max_entries=2)
+    queries = {name: Query(name) for name in ("a", "b", "c")}
+    cache.fetch(SCOPE, "a", {}, queries["a"])
+    cache.fetch(SCOPE, "b", {}, queries["b"])
+    cache.fetch(SCOPE, "a", {}, queries["a"])      # a is now the most recent
+    cache.fetch(SCOPE, "c", {}, queries["c"])      # evicts b
+    cache.fetch(SCOPE, "a", {}, queries["a"])
+    cache.fetch(SCOPE, "b", {}, queries["b"])
+    assert queries["a"].calls == 1 and queries["b"].calls == 2
+    assert cache.summary()["evicted"] == 2
+
+
+def test_parameters_are_part_of_the_key():
+    cache = QueryCache()
+    query = Query()
+    cache.fetch(SCOPE, "most_severe_event_areas", {"precision": 5}, query)
+    cache.fetch(SCOPE, "most_severe_event_areas", {"precision": 6}, query)
+    cache.fetch(SCOPE, "most_severe_event_areas", {"precision": 5}, query)
+    assert query.calls == 2
+
+
+def test_writes_drop_only_the_queries_of_the_written_tables_and_scope():
+    cache = QueryCache()
+    vehicles, events, other = Query(), Query(), Query()
+    cache.fetch(SCOPE, "avg_speed_last_7_days", {}, vehicles)
+    cache.fetch(SCOPE, "most_severe_event_areas", {}, events)
+    cache.fetch(("test", "other"), "avg_speed_last_7_days", {}, other)
+
+    invalidate_tables(SCOPE, "vehicle_data")
+    cache.fetch(SCOPE, "avg_speed_last_7_days", {}, vehicles)
+    cache.fetch(SCOPE, "most_severe_event_areas", {}, events)
+    cache.fetch(("test", "other"), "avg_speed_last_7_days", {}, other)
+    assert (vehicles.calls, events.calls, other.calls) == (2, 1, 1)
+
+
+def test_write_counters_of_other_processes_invalidate_entries():
+    counters = {"vehicle_data": 0, "urban_events": 0}
+    versions = lambda tables: tuple(counters[table] for table in tables)
+    cache = QueryCache(check_interval=0)
+    query = Query()
+    cache.fetch(SCOPE, "events_while_system_error", {}, query, versions)
+    cache.fetch(SCOPE, "events_while_system_error", {}, query, versions)
+    counters["urban_events"] += 1
+    assert cache.fetch(SCOPE, "events_while_system_error", {}, query, versions) == "rows-2"
+    assert query.calls == 2 and cache.summary()["invalidated"] == 1
+
+
+def test_a_result_computed_across_an_invalidation_is_not_stored():
+    cache = QueryCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            invalidate_tables(SCOPE, "vehicle_data")
+        return len(calls)
+
+    assert cache.fetch(SCOPE, "avg_speed_last_7_days", {}, compute) == 1
+    assert cache.fetch(SCOPE, "avg_speed_last_7_days", {}, compute) == 2
+
+
+def test_write_counters_are_read_at_most_once_per_check_interval():
+    clock = Clock()
+    counters = {"vehicle_data": 0}
+    reads = []
+
+    def versions(tables):
+        reads.append(tables)
+        return tuple(counters[table] for table in tables)
+
+    cache = QueryCache(ttl=60.0, clock=clock, check_interval=1.0)
+    query = Query()
+    for _ in range(5):
+        cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions)
+    assert len(reads) == 1 and query.calls == 1
+
+    # Another process writes: seen once the interval runs out, not before
+    counters["vehicle_data"] += 1
+    clock.now = 0.9
+    assert cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions) == "rows-1"
+    clock.now = 1.0
+    assert cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions) == "rows-2"
+    assert len(reads) == 2 and cache.summary()["version_checks"] == 2
+
+
+def test_writes_of_this_process_drop_the_counters_read_before_them():
+    clock = Clock()
+    counters = {"vehicle_data": 0}
+    versions = lambda tables: tuple(counters[table] for table in tables)
+    cache = QueryCache(ttl=60.0, clock=clock, check_interval=10.0)
+    query = Query()
+    cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions)
+    counters["vehicle_data"] += 1
+    invalidate_tables(SCOPE, "vehicle_data")
+    cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions)
+    # The recomputed entry carries the new counters, so it is served right away
+    assert cache.fetch(SCOPE, "avg_speed_last_7_days", {}, query, versions) == "rows-2"
+    assert cache.summary()["version_checks"] == 2
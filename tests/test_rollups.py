@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import numpy as np
+
+from rollups import rollup_correction, rollup_operations
+from telemetry_batch import VEHICLE_IDS
+
+OLD_DOC = {
+    "vehicle_id": "V-2025-007",
+    "timestamp": datetime(2025, 6, 1, 8, 42, 10),
+    "speed_kmh": 50.0,
+    "battery_level": 80.0,
+    "temperature_celsius": 30.0,
+    "system_status": "OK",
+}
+
+
+def test_correction_moves_sums_and_status_counts_by_the_delta():
+    operation = rollup_correction(OLD_DOC, {"speed_kmh": 70.5, "battery_level": 60.0, "system_status": "ERROR"})
+    assert operation._filter == {"hour": datetime(2025, 6, 1, 8), "vehicle_id": "V-2025-007"}
+    assert operation._doc == {
+        "$inc": {"speed_sum": 20.5, "battery_sum": -20.0, "status_counts.OK": -1, "status_counts.ERROR": 1},
+        "$min": {"speed_min": 70.5, "battery_min": 60.0},
+        "$max": {"speed_max": 70.5, "battery_max": 60.0},
+    }
+
+
+def test_correction_without_measure_changes_only_moves_status():
+    operation = rollup_correction(OLD_DOC, {"system_status": "OK"})
+    assert operation._doc == {"$inc": {}}
+    operation = rollup_correction(OLD_DOC, {"system_status": "WARNING"})
+    assert operation._doc == {"$inc": {"status_counts.OK": -1, "status_counts.WARNING": 1}}
+
+
+def test_rollup_operations_group_by_vehicle_and_hour():
+    base = np.datetime64("2025-06-01T08:00:00")
+    batch = {
+        "vehicle_idx": np.array([1, 1, 1, 2], dtype=np.int16),
+        "timestamp": base + np.array([0, 1800, 3600, 60]).astype("timedelta64[s]"),
+        "speed_kmh": np.array([10.0, 30.0, 50.0, 5.0]),
+        "battery_level": np.array([90.0, 80.0, 70.0, 60.0]),
+        "temperature_celsius": np.array([20.0, 40.0, 30.0, 25.0]),
+        "status_idx": np.array([0, 2, 2, 1], dtype=np.uint8),
+    }
+    operations = {(op._filter["vehicle_id"], op._filter["hour"].hour): op._doc for op in rollup_operations(batch)}
+    assert set(operations) == {(VEHICLE_IDS[1], 8), (VEHICLE_IDS[1], 9), (VEHICLE_IDS[2], 8)}
+    bucket = operations[(VEHICLE_IDS[1], 8)]
+    assert bucket["$inc"] == {"count": 2, "speed_sum": 40.0, "battery_sum": 170.0, "temperature_sum": 60.0,
+                              "status_counts.OK": 1, "status_counts.ERROR": 1}
+    assert bucket["$min"]["temperature_min"] == 20.0 and bucket["$max"]["temperature_max"] == 40.0
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from schema import sample_docs
+from telemetry_batch import generate_vehicle_batch, vehicle_batch_to_docs
+
+mongomock = pytest.importorskip("mongomock")
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def value_of(doc):
+    return (doc["vehicle_id"], doc["timestamp"], doc["speed_kmh"], doc["battery_level"], doc["system_status"])
+
+
+def load(docs):
+    db = mongomock.MongoClient().db
+    db["vehicle_data"].insert_many([dict(doc) for doc in docs])
+    return db
+
+
+def test_same_seed_picks_the_same_documents_whatever_the_storage_order():
+    docs = vehicle_batch_to_docs(generate_vehicle_batch(3000, rng=np.random.default_rng(1), now=NOW))
+    # Minute-resolution timestamps: a vehicle has several readings with the same timestamp
+    docs += [dict(doc, speed_kmh=doc["speed_kmh"] + 1) for doc in docs[:200]]
+    picks = [
+        [value_of(doc) for doc in sample_docs(load(ordered), 20, np.random.default_rng(42))]
+        for ordered in (docs, docs[::-1])
+    ]
+    assert picks[0] == picks[1]
+    assert len(set(picks[0])) == 20
+
+
+def test_different_seeds_pick_different_documents():
+    db = load(vehicle_batch_to_docs(generate_vehicle_batch(3000, rng=np.random.default_rng(1), now=NOW)))
+    first = {value_of(doc) for doc in sample_docs(db, 20, np.random.default_rng(1))}
+    second = {value_of(doc) for doc in sample_docs(db, 20, np.random.default_rng(2))}
+    assert first != second
+
+
+def test_small_collections_give_back_every_document_at_most_once():
+    docs = [{"vehicle_id": "V-2025-001", "timestamp": NOW + timedelta(minutes=i), "speed_kmh": 10.0 + i,
+             "battery_level": 50.0, "temperature_celsius": 30.0, "system_status": "OK"} for i in range(3)]
+    picked = sample_docs(load(docs), 5, np.random.default_rng(0))
+    assert sorted(doc["speed_kmh"] for doc in picked) == [10.0, 11.0, 12.0]
+    assert sample_docs(mongomock.MongoClient().db, 5, np.random.default_rng(0)) == []
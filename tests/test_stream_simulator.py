@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from stream_simulator import due_readings, simulate
+from telemetry_batch import VEHICLE_IDS
+
+
+def test_no_reading_is_due_before_the_first_slot():
+    # Regression: int() truncates toward zero, so int(-0.4) + 1 counted reading 0 as due before its phase
+    assert due_readings(0.0, 0.4, 1.0, 60) == 0
+    assert due_readings(0.39, 0.4, 1.0, 60) == 0
+
+
+def test_readings_are_due_from_the_start_of_their_slot():
+    assert due_readings(0.4, 0.4, 1.0, 60) == 1
+    assert due_readings(1.39, 0.4, 1.0, 60) == 1
+    assert due_readings(1.4, 0.4, 1.0, 60) == 2
+    assert due_readings(100.0, 0.4, 1.0, 60) == 60
+
+
+def test_slot_boundaries_match_the_schedule_despite_rounding():
+    # The vehicle sleeps until phase + i / hz; waking exactly there must emit reading i
+    phase, hz = 0.07, 10.0
+    for i in range(1, 1000):
+        assert due_readings(phase + i / hz, phase, hz, 10_000) == i + 1
+
+
+def test_timestamps_follow_the_given_clock():
+    now = datetime(2025, 6, 1, 8, 0, 0)
+    batches = []
+    stats = asyncio.run(simulate(lambda batch, alerts=None: batches.append(batch), hz=10, duration=0.3, seed=1,
+                                 max_delay=0.05, report_interval=60, now=now))
+    timestamps = np.concatenate([batch["timestamp"] for batch in batches])
+    assert stats["written"] == stats["generated"] == 3 * len(VEHICLE_IDS) == len(timestamps)
+    assert timestamps.min() >= np.datetime64(now, "ms")
+    assert timestamps.max() < np.datetime64(now, "ms") + np.timedelta64(300, "ms")
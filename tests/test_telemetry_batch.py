@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ingest_pipeline import batch_rng
+from telemetry_batch import (
+    HISTORY_DAYS,
+    STATUS_TYPES,
+    VEHICLE_FIELDS,
+    VEHICLE_IDS,
+    event_batch_to_docs,
+    event_batch_to_rows,
+    generate_event_batch,
+    generate_vehicle_batch,
+    generated_days,
+    latest_readings,
+    local_time,
+    materialize,
+    reading_key,
+    vehicle_batch_to_docs,
+    vehicle_batch_to_rows,
+)
+
+NOW = datetime(2025, 6, 1, 12, 30, 15)
+
+
+def test_vehicle_batch_is_reproducible_from_the_seed():
+    a = generate_vehicle_batch(500, batch_rng(42, "vehicle_data"), NOW)
+    b = generate_vehicle_batch(500, batch_rng(42, "vehicle_data"), NOW)
+    c = generate_vehicle_batch(500, batch_rng(43, "vehicle_data"), NOW)
+    for key in a:
+        np.testing.assert_array_equal(a[key], b[key])
+    assert not np.array_equal(a["speed_kmh"], c["speed_kmh"])
+
+
+def test_aware_reference_times_are_converted_before_dropping_the_offset():
+    # Regression: 2025-06-01T22:30:15-03:00 generated the days of 2025-06-01 instead of the UTC
+    # instant 2025-06-02T01:30:15
+    aware = datetime(2025, 6, 1, 22, 30, 15, tzinfo=timezone(timedelta(hours=-3)))
+    utc = datetime(2025, 6, 2, 1, 30, 15)
+    for generate in (generate_vehicle_batch, generate_event_batch):
+        a = generate(200, batch_rng(42, "vehicle_data"), aware)
+        b = generate(200, batch_rng(42, "vehicle_data"), utc)
+        np.testing.assert_array_equal(a["timestamp"], b["timestamp"])
+    assert generated_days(aware)[-1] == utc.date()
+
+
+def test_local_time_keeps_the_instant():
+    aware = datetime(2025, 6, 1, 22, 30, 15, tzinfo=timezone(timedelta(hours=-3)))
+    assert local_time(aware) == aware.astimezone().replace(tzinfo=None)
+    assert local_time(NOW) is NOW and local_time(None) is None
+
+
+def test_vehicle_batch_ranges():
+    batch = generate_vehicle_batch(2000, np.random.default_rng(1), NOW)
+    assert all(len(values) == 2000 for values in batch.values())
+    assert batch["vehicle_idx"].min() >= 0 and batch["vehicle_idx"].max() < len(VEHICLE_IDS)
+    assert batch["status_idx"].max() < len(STATUS_TYPES)
+    assert (batch["speed_kmh"] >= 0).all() and (batch["speed_kmh"] <= 120).all()
+    assert (batch["battery_level"] >= 10).all() and (batch["battery_level"] <= 100).all()
+    np.testing.assert_array_equal(batch["speed_kmh"], np.round(batch["speed_kmh"], 2))
+
+    # One of the last HISTORY_DAYS days, between 6h and 10h
+    timestamps = batch["timestamp"].astype("datetime64[s]").tolist()
+    first_day = NOW.date() - timedelta(days=HISTORY_DAYS - 1)
+    assert all(first_day <= t.date() <= NOW.date() for t in timestamps)
+    assert all(6 <= t.hour <= 10 for t in timestamps)
+
+
+def test_vehicle_docs_nest_the_row_fields():
+    batch = generate_vehicle_batch(50, np.random.default_rng(2), NOW)
+    docs = vehicle_batch_to_docs(batch)
+    rows = vehicle_batch_to_rows(batch)
+    assert len(docs) == len(rows) == 50
+    for doc, row in zip(docs, rows):
+        assert row == (doc["vehicle_id"], doc["timestamp"], doc["location"]["lat"], doc["location"]["lng"],
+                       doc["speed_kmh"], doc["battery_level"], doc["temperature_celsius"], doc["system_status"])
+        assert doc["system_status"] in STATUS_TYPES
+        assert isinstance(doc["timestamp"], datetime) and isinstance(doc["speed_kmh"], float)
+
+
+def test_event_docs_and_rows_carry_valid_uuids_and_geohashes():
+    batch = generate_event_batch(20, np.random.default_rng(3), NOW)
+    rows = event_batch_to_rows(batch)
+    docs = event_batch_to_docs(batch)
+    assert len({row[0] for row in rows}) == 20
+    assert all(len(row[0]) == 36 and row[0][14] == "4" for row in rows)
+    assert all(len(row[8]) == 12 for row in rows)
+    for doc, row in zip(docs, rows):
+        assert (doc["event_id"], doc["geohash"], doc["severity"]) == (row[0], row[8], row[7])
+        assert doc["geo"] == {"type": "Point", "coordinates": [row[6], row[5]]}
+
+
+def test_materialize_handles_empty_batches():
+    batch = generate_vehicle_batch(0, np.random.default_rng(4), NOW)
+    assert materialize(batch, VEHICLE_FIELDS) == []
+    assert vehicle_batch_to_docs(batch) == []
+
+
+def test_latest_readings_break_timestamp_ties_like_reading_key():
+    batch = generate_vehicle_batch(2000, batch_rng(4, "vehicle_data"), NOW)
+    # Every reading again at the same instant, one status more severe (ERROR stays ERROR)
+    tied = dict(batch, status_idx=np.minimum(batch["status_idx"] + 1, len(STATUS_TYPES) - 1).astype(np.uint8))
+    both = {key: np.concatenate([batch[key], tied[key]]) for key in batch}
+    rows = vehicle_batch_to_rows(both)
+    latest = {}
+    for row in rows:
+        if row[0] not in latest or reading_key(row) > reading_key(latest[row[0]]):
+            latest[row[0]] = row
+    assert vehicle_batch_to_rows(latest_readings(both)) == [latest[vehicle_id] for vehicle_id in sorted(latest)]
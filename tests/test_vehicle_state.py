@@ -0,0 +1,138 @@
+import re
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from telemetry_batch import STATUS_TYPES, VEHICLE_IDS, generate_vehicle_batch, reading_key, vehicle_batch_to_rows
+from vehicle_state import state_operations
+from vehicle_state_mysql import (
+    NEWER,
+    STATE_COLUMNS,
+    UPSERT_ASSIGNMENTS,
+    latest_rows,
+    latest_state_sql,
+    state_rows,
+    upsert_state,
+)
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+ASSIGNED = re.compile(r"(\w+) = IF\(")
+
+
+def row(vehicle_id, hour, status, speed=50.0, battery=80.0):
+    return (vehicle_id, datetime(2025, 6, 1, hour), -23.55, -46.63, speed, battery, 30.0, status)
+
+
+def apply_upsert(table, new):
+    # ON DUPLICATE KEY UPDATE as MySQL runs it: assignments from left to right, each one seeing
+    # the columns already assigned before it
+    values = dict(zip(STATE_COLUMNS, new))
+    stored = table.get(values["vehicle_id"])
+    if stored is None:
+        table[values["vehicle_id"]] = values
+        return
+    for column in ASSIGNED.findall(UPSERT_ASSIGNMENTS):
+        if reading_key(new) > reading_key(tuple(stored[name] for name in STATE_COLUMNS)):
+            stored[column] = values[column]
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+
+
+def test_every_column_is_conditional_and_timestamp_goes_last():
+    columns = ASSIGNED.findall(UPSERT_ASSIGNMENTS)
+    assert UPSERT_ASSIGNMENTS == ", ".join(f"{column} = IF({NEWER}, VALUES({column}), {column})" for column in columns)
+    assert set(columns) == set(STATE_COLUMNS) - {"vehicle_id"}
+    assert columns[-2:] == ["system_status", "timestamp"]
+
+
+def test_the_state_does_not_depend_on_the_write_order():
+    # Minute-resolution readings: many vehicles have several readings at their latest timestamp
+    batches = [generate_vehicle_batch(300, np.random.default_rng(seed), NOW) for seed in range(6)]
+    rows = [row for batch in batches for row in vehicle_batch_to_rows(batch)]
+    expected = {row[0]: row for row in latest_rows(rows)}
+
+    for order in ([0, 1, 2, 3, 4, 5], [5, 3, 1, 0, 4, 2]):
+        table = {}
+        for index in order:
+            for latest in state_rows(batches[index]):
+                apply_upsert(table, latest)
+        assert {vehicle_id: tuple(values.values()) for vehicle_id, values in table.items()} == expected
+
+
+def test_same_timestamp_readings_resolve_to_the_most_severe_status_then_the_values():
+    # Regression: a strict timestamp comparison kept whichever tied reading was written first
+    tied = [row("V-2025-001", 9, "OK"), row("V-2025-001", 9, "ERROR"), row("V-2025-001", 9, "WARNING")]
+    for rows in (tied, tied[::-1]):
+        assert latest_rows(rows) == [tied[1]]
+        table = {}
+        for reading in rows:
+            apply_upsert(table, reading)
+        assert table["V-2025-001"]["system_status"] == "ERROR"
+    faster = [row("V-2025-002", 9, "OK", speed=40.0), row("V-2025-002", 9, "OK", speed=60.0)]
+    assert latest_rows(faster) == latest_rows(faster[::-1]) == [faster[1]]
+
+
+def test_latest_rows_orders_by_vehicle_and_upsert_sends_one_statement():
+    rows = [row("V-2025-002", 8, "OK"), row("V-2025-001", 9, "OK"), row("V-2025-002", 9, "ERROR")]
+    latest = latest_rows(rows)
+    assert latest == [rows[1], rows[2]]
+
+    cursor = RecordingCursor()
+    assert upsert_state(cursor, latest) == 2
+    assert upsert_state(cursor, []) == 0
+    [(sql, params)] = cursor.statements
+    assert sql.count("(%s, %s, %s, %s, %s, %s, %s, %s)") == 2
+    assert params == [value for row in latest for value in row]
+
+
+def test_rebuilt_state_takes_the_same_reading_as_the_upserts():
+    # latest_state_sql on SQLite, with MySQL's FIELD() registered
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("FIELD", -1, lambda value, *values: values.index(value) + 1 if value in values else 0)
+    conn.execute(f"CREATE TABLE vehicle_data (id INTEGER PRIMARY KEY, {', '.join(STATE_COLUMNS)})")
+    conn.execute(f"CREATE TABLE vehicle_state ({STATE_COLUMNS[0]} PRIMARY KEY, {', '.join(STATE_COLUMNS[1:])})")
+    rows = [(str(vehicle_id), str(timestamp), *values)
+            for vehicle_id, timestamp, *values in vehicle_batch_to_rows(
+                generate_vehicle_batch(2000, np.random.default_rng(3), NOW))]
+    # Readings tied on the latest timestamp of every vehicle, in every status
+    rows += [(vehicle_id, timestamp, lat, lng, speed, battery, temperature, status)
+             for vehicle_id, timestamp, lat, lng, speed, battery, temperature, _ in latest_rows(rows)
+             for status in STATUS_TYPES]
+    conn.executemany(f"INSERT INTO vehicle_data ({', '.join(STATE_COLUMNS)}) VALUES ({', '.join('?' * 8)})", rows)
+
+    conn.execute(latest_state_sql())
+    assert conn.execute(f"SELECT {', '.join(STATE_COLUMNS)} FROM vehicle_state ORDER BY vehicle_id").fetchall() \
+        == latest_rows(rows)
+
+    conn.execute("DELETE FROM vehicle_state")
+    conn.execute(latest_state_sql("WHERE vehicle_id IN (SELECT vehicle_id FROM vehicle_data WHERE id IN (?, ?))"),
+                 [1, 2])
+    touched = {rows[0][0], rows[1][0]}
+    assert conn.execute("SELECT vehicle_id FROM vehicle_state ORDER BY vehicle_id").fetchall() \
+        == [(vehicle_id,) for vehicle_id in sorted(touched)]
+
+
+def test_mongo_state_operations_compare_the_whole_reading_key():
+    batch = generate_vehicle_batch(500, np.random.default_rng(9), NOW)
+    operations = state_operations(batch)
+    latest = {row[0]: row for row in latest_rows(vehicle_batch_to_rows(batch))}
+    assert [op._filter["_id"] for op in operations] == sorted(latest)
+    for op in operations:
+        condition, replacement, kept = op._doc[0]["$replaceWith"]["$cond"]
+        doc = replacement["$literal"]
+        assert op._upsert and kept == "$$ROOT"
+        new_key, stored_key = condition["$gt"]
+        assert [part["$literal"] for part in new_key[:1] + new_key[2:]] \
+            == [doc["timestamp"], doc["speed_kmh"], doc["battery_level"], doc["temperature_celsius"],
+                doc["location"]["lat"], doc["location"]["lng"]]
+        assert new_key[1] == {"$indexOfArray": [STATUS_TYPES, {"$literal": doc["system_status"]}]}
+        assert stored_key[0] == "$timestamp" and stored_key[-1] == "$location.lng"
+        assert doc["_id"] == doc["vehicle_id"] in VEHICLE_IDS
+        assert (doc["timestamp"], doc["speed_kmh"]) == (latest[doc["_id"]][1], latest[doc["_id"]][4])
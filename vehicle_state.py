@@ -0,0 +1,153 @@
+import argparse
+from datetime import datetime, UTC
+from pymongo import ASCENDING, UpdateOne
+from dotenv import load_dotenv
+import time
+from telemetry_batch import STATUS_TYPES, TIE_FIELDS, latest_readings, vehicle_batch_to_docs
+from backends import MongoBackend
+
+# --- Latest state of each vehicle, kept next to vehicle_data ---
+# One document per vehicle ({_id: vehicle_id} + the fields of its newest reading), so "which
+# vehicles are in ERROR now" or "current battery of a vehicle" read at most one document per
+# vehicle, however much history vehicle_data keeps.
+STATE_COLLECTION = "vehicle_state"
+STATE_FIELDS = ["vehicle_id", "timestamp", "location", "speed_kmh", "battery_level",
+                "temperature_celsius", "system_status"]
+
+
+# Document paths of the TIE_FIELDS (telemetry_batch): lat/lng are nested under location
+TIE_PATHS = [f"location.{field}" if field in ("lat", "lng") else field for field in TIE_FIELDS]
+
+
+def ensure_state_indexes(db):
+    db[STATE_COLLECTION].create_index([("system_status", ASCENDING)], name="system_status")
+
+
+def reading_key(fields):
+    # telemetry_batch.reading_key as an aggregation array: `fields` maps a path of the document to
+    # its value (a literal or a "$path" expression). Arrays compare element by element.
+    return [fields("timestamp"), {"$indexOfArray": [STATUS_TYPES, fields("system_status")]}] \
+        + [fields(path) for path in TIE_PATHS]
+
+
+def _doc_value(doc, path):
+    for part in path.split("."):
+        doc = doc[part]
+    return doc
+
+
+def state_operations(batch):
+    # One conditional upsert per vehicle in a columnar telemetry batch: the stored state is
+    # replaced only when the batch's latest reading comes after it (telemetry_batch.reading_key),
+    # so out-of-order batches and concurrent writers never move a vehicle back in time. A vehicle
+    # without state has a key of nulls, which compares lower than any reading. Pipeline updates
+    # need MongoDB 4.2+.
+    operations = []
+    for doc in vehicle_batch_to_docs(latest_readings(batch)):
+        doc = {"_id": doc["vehicle_id"], **doc}
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            [{"$replaceWith": {"$cond": [
+                {"$gt": [reading_key(lambda path: {"$literal": _doc_value(doc, path)}),
+                         reading_key(lambda path: f"${path}")]},
+                {"$literal": doc},
+                "$$ROOT",
+            ]}}],
+            upsert=True
+        ))
+    return operations
+
+
+def rebuild_state(db, vehicle_ids=None):
+    # Recomputes the state from raw telemetry on the server: of every vehicle (e.g. after a load
+    # that bypassed the ingest path), or only of `vehicle_ids` (e.g. after some of their readings
+    # were rewritten). The latest timestamp of each vehicle comes from the vehicle_timestamp index
+    # walked backwards; the readings at that timestamp are then ordered by reading_key.
+    if vehicle_ids is None:
+        db.drop_collection(STATE_COLLECTION)
+        ensure_state_indexes(db)
+    match = [] if vehicle_ids is None else [{"$match": {"vehicle_id": {"$in": sorted(set(vehicle_ids))}}}]
+    db["vehicle_data"].aggregate(match + [
+        {"$sort": {"vehicle_id": 1, "timestamp": -1}},
+        {"$group": {"_id": "$vehicle_id", "timestamp": {"$first": "$timestamp"}}},
+        {"$lookup": {
+            "from": "vehicle_data",
+            "let": {"vehicle_id": "$_id", "timestamp": "$timestamp"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$vehicle_id", "$$vehicle_id"]},
+                    {"$eq": ["$timestamp", "$$timestamp"]},
+                ]}}},
+                {"$addFields": {"status_rank": {"$indexOfArray": [STATUS_TYPES, "$system_status"]}}},
+                {"$sort": {"status_rank": -1, **{path: -1 for path in TIE_PATHS}}},
+                {"$limit": 1},
+            ],
+            "as": "latest",
+        }},
+        {"$unwind": "$latest"},
+        {"$replaceWith": {"$mergeObjects": [
+            {field: f"$latest.{field}" for field in STATE_FIELDS}, {"_id": "$_id"}
+        ]}},
+        {"$merge": {"into": STATE_COLLECTION, "on": "_id", "whenMatched": "replace"}},
+    ])
+    return db[STATE_COLLECTION].estimated_document_count()
+
+
+# --- Reads (cost follows the fleet size, not the history) ---
+def current_state(db, vehicle_id):
+    return db[STATE_COLLECTION].find_one({"_id": vehicle_id}, {"_id": 0})
+
+
+def vehicles_in_status(db, status="ERROR"):
+    return list(db[STATE_COLLECTION].find({"system_status": status}, {"_id": 0}).sort("vehicle_id", ASCENDING))
+
+
+def status_counts(db):
+    counts = {status: 0 for status in STATUS_TYPES}
+    for row in db[STATE_COLLECTION].aggregate([{"$group": {"_id": "$system_status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Show the current state of the fleet from vehicle_state.")
+    parser.add_argument("--vehicle", default=None,
+                        help="print the current state of one vehicle (e.g. V-2025-017)")
+    parser.add_argument("--status", choices=STATUS_TYPES, default="ERROR",
+                        help="list the vehicles currently in this status (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute the state from vehicle_data first")
+    return parser.parse_args()
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+    db = MongoBackend().db
+
+    if args.rebuild:
+        print(f"📅 State rebuild started at: {datetime.now(UTC).isoformat()}")
+        start = time.time()
+        vehicles = rebuild_state(db)
+        print(f"✅ State of {vehicles} vehicles rebuilt in {time.time() - start:.2f} seconds.")
+
+    start = time.perf_counter()
+    if args.vehicle:
+        state = current_state(db, args.vehicle)
+        if state is None:
+            print(f"No state stored for {args.vehicle}.")
+        else:
+            print(f"🚗 {args.vehicle} at {state['timestamp'].isoformat()}: {state['system_status']} | "
+                  f"battery {state['battery_level']:.2f}% | {state['speed_kmh']:.2f} km/h | "
+                  f"{state['temperature_celsius']:.2f} °C | ({state['location']['lat']:.4f}, {state['location']['lng']:.4f})")
+    else:
+        counts = status_counts(db)
+        print("📊 Fleet now: " + " | ".join(f"{status} {count}" for status, count in counts.items()))
+        for state in vehicles_in_status(db, args.status):
+            print(f"  {state['vehicle_id']}: last reading {state['timestamp'].isoformat()} | "
+                  f"battery {state['battery_level']:.2f}% | {state['temperature_celsius']:.2f} °C")
+    print(f"⏱️ Read in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()